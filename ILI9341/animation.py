@@ -0,0 +1,298 @@
+# animation.py - sprites with save-under and a frame scheduler
+#
+# A sprite is a rect of `width` x `height` pixels showing one of its frames,
+# RGB565 big endian buffers (the format of lcd.readRect). It keeps what it
+# covers in a save-under buffer, so moving it or changing its frame repaints
+# only the old and new rects, each pixel once: no erase and redraw flicker.
+#
+#    from lcd import *
+#    from animation import Animator, Sprite
+#
+#    lcd = LCD()
+#    marker = Sprite([lcd.readRect(0, 0, 16, 16)], 16, 16, x=10, y=10)
+#    def walk(sprite, tick):
+#        sprite.move(10 + tick % 200, 10)
+#    marker.update = walk
+#    icon = Sprite([image, None], 24, 24, x=200, y=10, every=15)  # blinks
+#    anim = Animator(lcd, fps=30)
+#    anim.add(marker)
+#    anim.add(icon)
+#    anim.run(300)               # or: await anim.play() in a uasyncio task
+#    print(anim.stats())         # frames, dropped frames, frame times
+#
+# A None frame hides the sprite. Pixels of the `key` color (RGB565 tuple)
+# are transparent, at the cost of a per pixel composition. Sprites stay on
+# screen: positions are clamped to the display. Overlapping sprites are
+# repainted together (restored top down, drawn bottom up), which writes the
+# shared pixels twice.
+
+import pyb
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+class Sprite:
+
+    def __init__(self, frames, width, height, x=0, y=0, key=None, every=0,
+                 update=None):
+        self.frames = frames
+        self.width, self.height = width, height
+        self.x, self.y = x, y
+        self.frame = 0
+        self.key = key
+        self.every = every          # ticks per frame, 0: frames change by hand
+        self.update = update        # update(sprite, tick) before each repaint
+        self.visible = True
+        self._drawn = None          # (x, y) on screen, None: not drawn
+        self._shown = None          # frame on screen
+        self._under = bytearray(width * height * 2)
+        self._spare = bytearray(width * height * 2)
+
+    def move(self, x, y):
+        self.x, self.y = x, y
+
+    def setFrame(self, index):
+        self.frame = index % len(self.frames)
+
+    def show(self):
+        self.visible = True
+
+    def hide(self):
+        self.visible = False
+
+    def _target(self):
+        # (x, y) the sprite should be drawn at, None when hidden
+        if not self.visible or self.frames[self.frame] is None:
+            return None
+        return (self.x, self.y)
+
+    def _dirty(self):
+        target = self._target()
+        return target != self._drawn or (target is not None and self._shown != self.frame)
+
+# Parts of rect a outside rect b (up to 4 rects), rects as (x, y, w, h)
+def _subtract(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    x0, y0 = max(ax, bx), max(ay, by)
+    x1, y1 = min(ax + aw, bx + bw), min(ay + ah, by + bh)
+    if x0 >= x1 or y0 >= y1:
+        return (a,)
+    parts = list()
+    if y0 > ay:
+        parts.append((ax, ay, aw, y0 - ay))
+    if y1 < ay + ah:
+        parts.append((ax, y1, aw, ay + ah - y1))
+    if x0 > ax:
+        parts.append((ax, y0, x0 - ax, y1 - y0))
+    if x1 < ax + aw:
+        parts.append((x1, y0, ax + aw - x1, y1 - y0))
+    return parts
+
+def _overlap(a, b):
+    return (a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and
+            a[1] < b[1] + b[3] and b[1] < a[1] + a[3])
+
+# Copies a w x h block between RGB565 buffers of row widths sw and dw
+def _copy(src, sw, sx, sy, dst, dw, dx, dy, w, h):
+    n = w * 2
+    src, dst = memoryview(src), memoryview(dst)
+    for row in range(h):
+        s = ((sy + row) * sw + sx) * 2
+        d = ((dy + row) * dw + dx) * 2
+        dst[d:d+n] = src[s:s+n]
+
+
+class Animator:
+
+    def __init__(self, lcd, fps=30):
+        self.lcd = lcd
+        self.sprites = list()       # drawing order: the last one is on top
+        self.setFps(fps)
+        self._scratch = bytearray(0)
+        self.ticks = 0
+        self.dropped = 0            # frame slots missed by run() and play()
+        self.frametime = 0          # microseconds of the last repaint
+        self.maxframetime = 0
+        self._totaltime = 0
+
+    def setFps(self, fps):
+        self.fps = fps
+        self.period = 1000000 // fps
+
+    def add(self, sprite):
+        self.sprites.append(sprite)
+
+    def remove(self, sprite):
+        """ Removes sprite, restoring what it covered. """
+        if sprite._drawn is not None:
+            self.lcd.writeRect(sprite._drawn[0], sprite._drawn[1],
+                               sprite.width, sprite.height, sprite._under)
+            sprite._drawn = None
+        self.sprites.remove(sprite)
+
+    def _buffer(self, nbytes):
+        if len(self._scratch) < nbytes:
+            self._scratch = bytearray(nbytes)
+        return self._scratch
+
+    def _clamp(self, sprite):
+        lcd = self.lcd
+        sprite.x = max(0, min(sprite.x, lcd.TFTWIDTH - sprite.width))
+        sprite.y = max(0, min(sprite.y, lcd.TFTHEIGHT - sprite.height))
+
+    def _touch(self, a, b):
+        # a old or new rect of sprite a overlaps one of sprite b
+        return any(_overlap(r, o) for r in self._rects(a) if r
+                   for o in self._rects(b) if o)
+
+    def _rects(self, sprite):
+        w, h = sprite.width, sprite.height
+        old = sprite._drawn and (sprite._drawn[0], sprite._drawn[1], w, h)
+        new = sprite._target()
+        return old, new and (new[0], new[1], w, h)
+
+    # Frame composed over the save-under when it has transparent pixels
+    def _image(self, sprite, under):
+        frame = sprite.frames[sprite.frame]
+        if sprite.key is None:
+            return frame
+        out = self._buffer(len(frame))
+        out[:len(frame)] = frame
+        key = self.lcd._get_Npix_monoword(sprite.key)
+        hi, lo = key[0], key[1]
+        for i in range(0, len(frame), 2):
+            if frame[i] == hi and frame[i+1] == lo:
+                out[i] = under[i]
+                out[i+1] = under[i+1]
+        return out
+
+    def _write_part(self, buf, rect, part):
+        # writes the part (screen rect) of buf, a buffer covering rect
+        x, y, w, h = part
+        if w == rect[2]:
+            start = ((y - rect[1]) * rect[2]) * 2
+            self.lcd.writeRect(x, y, w, h, memoryview(buf)[start:start + w*h*2])
+        else:
+            out = self._buffer(w * h * 2)
+            _copy(buf, rect[2], x - rect[0], y - rect[1], out, w, 0, 0, w, h)
+            self.lcd.writeRect(x, y, w, h, out)
+
+    # One sprite alone: reads the newly covered pixels only, writes the old
+    # rect outside the new one and the new rect.
+    def _repaint(self, sprite):
+        lcd = self.lcd
+        old, new = self._rects(sprite)
+        w = sprite.width
+        if new:
+            spare = sprite._spare
+            for part in (_subtract(new, old) if old else (new,)):
+                x, y, pw, ph = part
+                buf = lcd.readRect(x, y, pw, ph, self._buffer(pw * ph * 2))
+                _copy(buf, pw, 0, 0, spare, w, x - new[0], y - new[1], pw, ph)
+            if old and _overlap(old, new):
+                x0, y0 = max(old[0], new[0]), max(old[1], new[1])
+                x1 = min(old[0], new[0]) + w
+                y1 = min(old[1], new[1]) + sprite.height
+                _copy(sprite._under, w, x0 - old[0], y0 - old[1],
+                      spare, w, x0 - new[0], y0 - new[1], x1 - x0, y1 - y0)
+        if old:
+            for part in (_subtract(old, new) if new else (old,)):
+                self._write_part(sprite._under, old, part)
+        if new:
+            sprite._under, sprite._spare = sprite._spare, sprite._under
+            lcd.writeRect(new[0], new[1], w, sprite.height,
+                          self._image(sprite, sprite._under))
+        self._done(sprite)
+
+    def _done(self, sprite):
+        target = sprite._target()
+        sprite._drawn = target
+        sprite._shown = sprite.frame if target else None
+
+    # Overlapping sprites: all of them are restored top down, then saved and
+    # drawn bottom up, so every save-under holds the pixels below it.
+    def _repaint_group(self, group):
+        lcd = self.lcd
+        for sprite in reversed(group):
+            if sprite._drawn is not None:
+                lcd.writeRect(sprite._drawn[0], sprite._drawn[1],
+                              sprite.width, sprite.height, sprite._under)
+        for sprite in group:
+            target = sprite._target()
+            if target is not None:
+                lcd.readRect(target[0], target[1], sprite.width, sprite.height, sprite._under)
+                lcd.writeRect(target[0], target[1], sprite.width, sprite.height,
+                              self._image(sprite, sprite._under))
+            self._done(sprite)
+
+    def tick(self):
+        """ Advances the sprites one frame and repaints the changed ones.
+        Returns the repaint time in microseconds. """
+        start = pyb.micros()
+        tick = self.ticks
+        for sprite in self.sprites:
+            if sprite.update:
+                sprite.update(sprite, tick)
+            if sprite.every and tick and not tick % sprite.every:
+                sprite.setFrame(sprite.frame + 1)
+            self._clamp(sprite)
+        dirty = [s for s in self.sprites if s._dirty()]
+        if dirty:
+            # dirty sprites touching another sprite are repainted with every
+            # sprite they touch, directly or through others
+            sprites = self.sprites
+            group = [s for s in dirty
+                     if any(self._touch(s, o) for o in sprites if o is not s)]
+            i = 0
+            while i < len(group):
+                for other in sprites:
+                    if other not in group and self._touch(group[i], other):
+                        group.append(other)
+                i += 1
+            for sprite in dirty:
+                if sprite not in group:
+                    self._repaint(sprite)
+            if group:
+                self._repaint_group([s for s in sprites if s in group])
+        self.ticks += 1
+        self.frametime = pyb.elapsed_micros(start)
+        self.maxframetime = max(self.maxframetime, self.frametime)
+        self._totaltime += self.frametime
+        return self.frametime
+
+    def _late(self, slot):
+        # microseconds left in the frame slot (< 0: late), counts missed slots
+        spent = pyb.elapsed_micros(slot)
+        if spent >= self.period:
+            self.dropped += spent // self.period
+        return self.period - spent
+
+    def run(self, frames=-1):
+        """ Repaints at the target fps, `frames` times (-1: for ever). """
+        i = 0
+        while i != frames:
+            slot = pyb.micros()
+            self.tick()
+            left = self._late(slot)
+            if left > 0:
+                pyb.udelay(left)
+            i += 1
+
+    async def play(self, frames=-1):
+        """ run() as a uasyncio task: the other tasks run between frames. """
+        i = 0
+        while i != frames:
+            slot = pyb.micros()
+            self.tick()
+            left = self._late(slot)
+            await asyncio.sleep(left / 1000000 if left > 0 else 0)
+            i += 1
+
+    def stats(self):
+        ticks = self.ticks
+        return dict(frames=ticks, dropped=self.dropped, fps=self.fps,
+                    frametime=self.frametime, maxframetime=self.maxframetime,
+                    avgframetime=self._totaltime // ticks if ticks else 0)
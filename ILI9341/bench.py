@@ -0,0 +1,120 @@
+# bench.py - display benchmark suite
+#
+# Runs the same cases on the pyboard and on the host stand-in (see host/):
+#
+#    import bench
+#    results = bench.run()                      # prints and saves bench.json
+#    bench.run(baseline='bench_base.json')      # also flags regressions
+#
+# On a PC, from the ILI9341 directory:
+#    PYTHONPATH=host python3 bench.py [baseline.json [threshold]]
+#
+# Every case repeats one operation `ops` times and reports microseconds per
+# operation, operations per second and bus bytes per operation (measured
+# once with the instrumentation on, see stats.py). A case is a
+# regression when its time per operation grows more than `threshold` (0.10:
+# 10 %) over the baseline.
+
+import json
+import pyb
+
+from lcd import *
+import lcd
+import stats
+from fonts.arial_14 import Arial_14
+
+resultfile = 'bench.json'
+
+def _text(scale):
+    chars = []                  # the BaseChars object, made on the first run
+    def case(d, i):
+        if not chars:
+            chars.append(d.initCh(color=BLACK, bgcolor=WHITE, font=Arial_14, scale=scale))
+        chars[0].printLn('Bench 0123', 10, 40 + (i % 4) * 20 * scale)
+    return case
+
+# (name, ops, function(lcd, i) doing operation i)
+cases = (
+    ('fill',          10, lambda d, i: d.fillMonocolor(GREEN if i % 2 else BLUE)),
+    ('hline',        200, lambda d, i: d.drawHline(10, i % 300, 200, RED)),
+    ('vline',        200, lambda d, i: d.drawVline(i % 230, 10, 280, RED)),
+    ('line',         100, lambda d, i: d.drawLine(0, i % 300, 239, 319 - i % 300, BLACK)),
+    ('line_thick',    50, lambda d, i: d.drawLine(0, i % 300, 239, 319 - i % 300, BLACK, width=5)),
+    ('rect_filled',   50, lambda d, i: d.drawRect(10, 10, 100 + i % 100, 100, BLUE, fillcolor=ORANGE)),
+    ('circle',        10, lambda d, i: d.drawCircle(120, 160, 40 + i % 40, RED)),
+    ('circle_filled', 10, lambda d, i: d.drawCircleFilled(120, 160, 40 + i % 40, RED)),
+    ('oval_filled',   10, lambda d, i: d.drawOvalFilled(120, 160, 60, 20 + i % 80, BLUE)),
+    ('text_x1',       20, _text(1)),
+    ('text_x2',       10, _text(2)),
+    ('text_x3',       10, _text(3)),
+    ('bmp_uncached',   5, lambda d, i: d.renderBmp('test.bmp', (0, 0), cached=False)),
+    ('bmp_cached',     5, lambda d, i: d.renderBmp('test.bmp', (0, 0))),
+    ('demo',           2, lambda d, i: lcd.demo(d)),
+)
+
+def _measure(d, ops, func):
+    d.setPortrait(True)
+    func(d, 0)                              # warm up (fonts, caches)
+    start = pyb.micros()
+    for i in range(ops):
+        func(d, i)
+    us = pyb.elapsed_micros(start)
+    d.setPortrait(True)
+    stats.enable()
+    func(d, 0)
+    counters = stats.disable()
+    nbytes = counters['cmds'] + counters['data'] + counters['read']
+    return dict(ops=ops, us_per_op=us // ops,
+                ops_per_s=round(ops * 1000000 / us, 2) if us else 0,
+                bytes_per_op=nbytes)
+
+def compare(results, baseline, threshold=0.10):
+    """ Prints results against baseline, returns the regressed case names. """
+    regressions = list()
+    print('{:<14}{:>10}{:>10}{:>8}'.format('case', 'us/op', 'base', 'delta'))
+    for name in sorted(results):
+        us = results[name]['us_per_op']
+        base = baseline.get(name)
+        if not base or not base['us_per_op']:
+            print('{:<14}{:>10}{:>10}{:>8}'.format(name, us, '-', '-'))
+            continue
+        delta = us / base['us_per_op'] - 1
+        flag = ''
+        if delta > threshold:
+            regressions.append(name)
+            flag = ' REGRESSION'
+        print('{:<14}{:>10}{:>10}{:>7.1f}%{}'.format(name, us, base['us_per_op'], delta * 100, flag))
+    return regressions
+
+def run(d=None, only=None, baseline=None, threshold=0.10, save=resultfile):
+    """ Runs the cases (all, or the names in only) and returns the results.
+    With a baseline (dict or JSON file name) the regressions are listed in
+    results['regressions']. """
+    d = d or LCD()
+    for image in d.warmCache():             # for bmp_cached
+        pass
+    results = dict()
+    print('{:<14}{:>6}{:>10}{:>10}{:>10}'.format('case', 'ops', 'us/op', 'ops/s', 'bytes/op'))
+    for name, ops, func in cases:
+        if only and name not in only:
+            continue
+        r = results[name] = _measure(d, ops, func)
+        print('{:<14}{:>6}{:>10}{:>10}{:>10}'.format(name, ops, r['us_per_op'], r['ops_per_s'], r['bytes_per_op']))
+    d.setPortrait(True)
+    if save:
+        with open(save, 'w') as f:
+            json.dump(results, f)
+    if baseline:
+        if isinstance(baseline, str):
+            with open(baseline) as f:
+                baseline = json.load(f)
+        results['regressions'] = compare(results, baseline, threshold)
+    return results
+
+if __name__ == '__main__':
+    import sys
+    base = sys.argv[1] if len(sys.argv) > 1 else None
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.10
+    results = run(baseline=base, threshold=threshold)
+    if results.get('regressions'):
+        sys.exit(1)
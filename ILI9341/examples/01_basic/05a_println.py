@@ -18,12 +18,12 @@ l.fillMonocolor( CYAN )
 #   * bgcolor, color: defines the background color and the text color
 #   * font : Arial_14 by default allows you to define the font to use
 #   * scale: scale the font (1, 2, 3)
-#   * bctimes: number of time to blink the cursor (when requested) 
+#   * bctimes: number of time to blink the cursor (see renderqueue.RenderQueue.blink)
 #
 c = l.initCh(font=Arial_14, color=RED, bgcolor=CYAN)
 
 # Print the string at position x=10, y=10
-#   bc: False by default, allows to show the blinking cursor when the string is printed
+#   bc: False by default, draws the cursor at the end of the string (renderqueue blinks it)
 #   scale: scale the font (1, 2, 3)
 #
 c.printLn( "Hello PyBoard", 10, 10 )
@@ -18,13 +18,13 @@ l.fillMonocolor( RED )
 #   * bgcolor, color: defines the background color and the text color
 #   * font : Arial_14 by default allows you to define the font to use
 #   * scale: scale the font (1, 2, 3)
-#   * bctimes: number of time to blink the cursor (when requested) 
+#   * bctimes: number of time to blink the cursor (see renderqueue.RenderQueue.blink)
 #
 c = l.initCh(font=Arial_14, color=BLACK, bgcolor=ORANGE)        # Background color different from screen color
 p = l.initCh(font=Arial_14, color=BLACK, bgcolor=RED, scale=2)  # Up scale and Background color the same as screen color
 
 # Print the strings 
-#   bc: False by default, allows to show the blinking cursor when the string is printed
+#   bc: False by default, draws the cursor at the end of the string (renderqueue blinks it)
 #   scale: scale the font (1, 2, 3)
 #
 c.printChar('@', 30, 30)
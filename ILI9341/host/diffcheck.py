@@ -0,0 +1,674 @@
+# diffcheck.py - differential check of the drawing primitives (host only)
+#
+# Every case draws the same random primitive twice: through the driver on
+# the panel model, and through a plain per-pixel reference rasterizer into a
+# list framebuffer. Both are compared in logical coordinates, in portrait
+# and landscape. Mismatches are written as PNG images (reference |
+# driver | differences in magenta) in the output directory.
+#
+# From the ILI9341 directory:
+#    python3 host/diffcheck.py [runs [seed [outdir]]]
+#
+# Cases with a tolerance compare shapes whose exact outline is not part of
+# the contract (thin lines, circles): a pixel only counts as a mismatch when
+# no pixel of the same color lies within `tol` pixels in the other image.
+# `ctol` is the allowed difference per color component (anti-aliasing).
+#
+# The references are written from the documented shapes, not from the
+# driver code: ideal geometry sampled at pixel centers, with a tolerance
+# where the driver rounds to the pixel grid its own way. The legacy
+# primitives keep their footprints: drawRect and fillMonocolor cover
+# width+1 x height+1 pixels, a drawCircle dot is a border+1 pixels square.
+
+import math
+import os
+import random
+import struct
+import sys
+import zlib
+
+# the host stand-in (pyb, micropython) and the driver, run from the ILI9341
+# directory (images and fonts paths are relative)
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(root, 'host'), root]
+os.chdir(root)
+
+import pyb
+import lcd
+from fonts.arial_14 import Arial_14
+from fonts.vera_14 import Vera_14
+
+GRAPH = {True: 0x48, False: 0x28}   # graph orientation MADCTL, see lcd.py
+
+
+def word(color):
+    R, G, B = color
+    return (R << 11) | (G << 5) | B
+
+def split(w):
+    return (w >> 11, (w >> 5) & 63, w & 31)
+
+
+class Frame:
+    """ Reference framebuffer in logical coordinates. """
+
+    def __init__(self, width, height, color):
+        self.width, self.height = width, height
+        self.pix = [word(color)] * (width * height)
+
+    def set(self, x, y, color):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.pix[y * self.width + x] = color if isinstance(color, int) else word(color)
+
+    def get(self, x, y):
+        return self.pix[y * self.width + x]
+
+    def rect(self, x, y, w, h, color):
+        for j in range(y, y + h):
+            for i in range(x, x + w):
+                self.set(i, j, color)
+
+
+def capture(panel, portrait):
+    """ Logical framebuffer of the panel, as the driver addresses it and as
+    it is shown (vertical scrolling applied). """
+    width, height = (240, 320) if portrait else (320, 240)
+    frame = Frame(width, height, lcd.BLACK)
+    madctl = panel.madctl
+    panel.madctl = GRAPH[portrait]
+    tfa, vsa, bfa = panel.scroll
+    start = panel.scrollstart
+    for y in range(height):
+        for x in range(width):
+            addr = panel._address(x, y)
+            row = addr // 240
+            if start != tfa and tfa <= row < tfa + vsa:
+                row = tfa + (row - tfa + start - tfa) % vsa
+            frame.pix[y * width + x] = panel.mem[row * 240 + addr % 240]
+    panel.madctl = madctl
+    return frame
+
+
+def compare(ref, got, tol=0, ctol=0):
+    def same(a, b):
+        if a == b:
+            return True
+        if not ctol:
+            return False
+        return all(abs(p - q) <= ctol for p, q in zip(split(a), split(b)))
+
+    def near(frame, x, y, value):
+        for j in range(max(0, y - tol), min(frame.height, y + tol + 1)):
+            for i in range(max(0, x - tol), min(frame.width, x + tol + 1)):
+                if same(frame.get(i, j), value):
+                    return True
+        return False
+
+    bad = list()
+    for y in range(ref.height):
+        for x in range(ref.width):
+            a, b = ref.get(x, y), got.get(x, y)
+            if same(a, b):
+                continue
+            if tol and near(ref, x, y, b) and near(got, x, y, a):
+                continue
+            bad.append((x, y))
+    return bad
+
+
+def png(path, frames, bad):
+    width, height = frames[0].width, frames[0].height
+    bad = set(bad)
+    rows = list()
+    for y in range(height):
+        row = bytearray(b'\0')
+        for n, frame in enumerate(frames + [frames[1]]):
+            for x in range(width):
+                w = 0xF81F if n == 2 and (x, y) in bad else frame.get(x, y)
+                if n == 2 and (x, y) not in bad:
+                    w = (w >> 2) & 0x39E7           # dimmed driver output
+                row += bytes(((w >> 11) << 3, ((w >> 5) & 63) << 2, (w & 31) << 3))
+        rows.append(bytes(row))
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data +
+                struct.pack('>I', zlib.crc32(tag + data) & 0xFFFFFFFF))
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width * 3, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(b''.join(rows))))
+        f.write(chunk(b'IEND', b''))
+
+
+# -- reference rasterizers ----------------------------------------------------
+
+def ref_polygon(frame, points, color):
+    # even-odd rule at pixel centers
+    n = len(points)
+    for y in range(frame.height):
+        cy = y + 0.5
+        xs = list()
+        for i in range(n):
+            (x0, y0), (x1, y1) = points[i], points[(i + 1) % n]
+            if (y0 <= cy) != (y1 <= cy):
+                xs.append(x0 + (cy - y0) * (x1 - x0) / (y1 - y0))
+        xs.sort()
+        for i in range(0, len(xs) - 1, 2):
+            for x in range(frame.width):
+                if xs[i] <= x + 0.5 < xs[i + 1]:
+                    frame.set(x, y, color)
+
+def ref_segment(frame, x0, y0, x1, y1, color):
+    steps = max(abs(x1 - x0), abs(y1 - y0), 1)
+    for i in range(steps + 1):
+        frame.set(round(x0 + (x1 - x0) * i / steps), round(y0 + (y1 - y0) * i / steps), color)
+
+def ref_thick_line(frame, x0, y0, x1, y1, width, cap, color):
+    # the ideal shape, tested at pixel centers: the band of width `width`
+    # along the segment, its ends extended by half a pixel (butt: the end
+    # pixels are included) or by half a pixel and width/2 (square); round
+    # caps are discs of diameter `width` on the end points. A zero length
+    # line is a width x width square (or a disc).
+    dx, dy = x1 - x0, y1 - y0
+    length = math.hypot(dx, dy)
+    half = width / 2
+    ext = {None: 0.5, 'square': half + 0.5, 'round': 0}[cap]
+    for y in range(min(y0, y1) - width - 1, max(y0, y1) + width + 2):
+        for x in range(min(x0, x1) - width - 1, max(x0, x1) + width + 2):
+            if length:
+                t = ((x - x0) * dx + (y - y0) * dy) / length
+                n = abs((x - x0) * dy - (y - y0) * dx) / length
+                inside = -ext <= t <= length + ext and n <= half
+            else:
+                inside = cap != 'round' and abs(x - x0 + 0.5) <= half and abs(y - y0 + 0.5) <= half
+            if cap == 'round' and not inside:
+                inside = min(math.hypot(x - x0, y - y0), math.hypot(x - x1, y - y1)) <= half
+            if inside:
+                frame.set(x, y, color)
+
+def ref_disc(frame, cx, cy, rx, ry, color):
+    for y in range(cy - ry, cy + ry + 1):
+        for x in range(cx - rx, cx + rx + 1):
+            if ((x - cx) / rx) ** 2 + ((y - cy) / ry) ** 2 <= 1:
+                frame.set(x, y, color)
+
+def ref_char(frame, font, char, x, y, scale, color, bgcolor):
+    scale = min(scale, 3)
+    height = font['height']
+    for c, column in enumerate(font[ord(char)]):
+        bits = bin(column)[3:]
+        for j, bit in enumerate(bits):
+            for r in range(scale):
+                frame.set(x + c, y - scale + (height - 1 - j) * scale + r,
+                          color if bit == '1' else bgcolor)
+
+def text_layout(font, text, x, y, scale, width):
+    # printLn layout, (char, x, y) of every glyph: glyphs 3 pixels apart
+    # (1 pixel glyphs get more room), a word starts a new line when it
+    # would pass width - 10
+    scale = min(scale, 3)
+    x0 = x
+    glyphs = list()
+    for word in text.split(' '):
+        if x + len(word) * 7 * scale >= width - 10:
+            x = x0
+            y += (font['height'] + 2) * scale
+        space = scale - scale // 2
+        for c in word:
+            glyphs.append((c, x, y))
+            w = len(font[ord(c)])
+            space = scale - scale // 2
+            if w == 1:
+                space = scale + 1 if scale > 2 else scale - 1
+            x += w * space + 3
+        x += len(font[32]) * space + 3
+    return glyphs
+
+def ref_bmp(frame, path, x, y):
+    with open(path, 'rb') as f:
+        data = f.read()
+    start, width, height = (struct.unpack('<H', data[pos:pos + 2])[0] for pos in (10, 18, 22))
+    for j in range(height):
+        row = start + (height - 1 - j) * width * 2       # bottom-up rows
+        for i in range(width):
+            frame.set(x + i, y + j, struct.unpack('<H', data[row + i*2:row + i*2 + 2])[0])
+
+def ref_wu(frame, x0, y0, x1, y1, color, background):
+    def blend(cov):
+        return tuple(int(b + (c - b) * cov) for c, b in zip(color, background))
+    steep = abs(y1 - y0) > abs(x1 - x0)
+    if steep:
+        x0, y0, x1, y1 = y0, x0, y1, x1
+    if x1 < x0:
+        x0, y0, x1, y1 = x1, y1, x0, y0
+    gradient = (y1 - y0) / (x1 - x0) if x1 != x0 else 0
+    for x in range(x0, x1 + 1):
+        y = y0 + gradient * (x - x0)
+        f = y - math.floor(y)
+        for yy, cov in ((math.floor(y), 1 - f), (math.floor(y) + 1, f)):
+            if steep:
+                frame.set(yy, x, blend(cov))
+            else:
+                frame.set(x, yy, blend(cov))
+
+
+# -- cases: (name, tol, ctol, make(rng, width, height) -> (draw, ref)) ------
+
+def rnd_color(rng):
+    return (rng.randrange(32), rng.randrange(64), rng.randrange(32))
+
+def case_polygon(rng, W, H):
+    n = rng.choice((3, 4, 5, 6, 8))
+    pts = [(rng.randint(-20, W + 20), rng.randint(-20, H + 20)) for _ in range(n)]
+    color = rnd_color(rng)
+    return (lambda d: d.fillPolygon(pts, color)), (lambda f: ref_polygon(f, pts, color))
+
+def case_triangle(rng, W, H):
+    pts = [(rng.randint(-10, W + 10), rng.randint(-10, H + 10)) for _ in range(3)]
+    color = rnd_color(rng)
+    flat = [v for p in pts for v in p]
+    return (lambda d: d.fillTriangle(*(flat + [color]))), (lambda f: ref_polygon(f, pts, color))
+
+def case_rects(rng, W, H):
+    coords, color = list(), rnd_color(rng)
+    for _ in range(rng.randint(1, 30)):
+        coords += [rng.randint(-20, W), rng.randint(-20, H), rng.randint(1, 80), rng.randint(1, 80)]
+    def ref(f):
+        for i in range(0, len(coords), 4):
+            f.rect(coords[i], coords[i+1], coords[i+2], coords[i+3], color)
+    return (lambda d: d.drawRects(coords, color)), ref
+
+def case_hlines(rng, W, H):
+    coords, color = list(), rnd_color(rng)
+    for _ in range(rng.randint(1, 60)):
+        coords += [rng.randint(-20, W), rng.randint(-5, H + 5), rng.randint(1, 100)]
+    def ref(f):
+        for i in range(0, len(coords), 3):
+            f.rect(coords[i], coords[i+1], coords[i+2], 1, color)
+    return (lambda d: d.drawHlines(coords, color)), ref
+
+def case_pixels(rng, W, H):
+    coords, color = list(), rnd_color(rng)
+    for _ in range(rng.randint(1, 500)):
+        coords += [rng.randint(-5, W + 5), rng.randint(-5, H + 5)]
+    pixels = rng.choice((1, 4))         # drawPixel points: 2x2, or single
+    side = 2 if pixels == 4 else 1
+    def ref(f):
+        for i in range(0, len(coords), 2):
+            f.rect(coords[i], coords[i+1], side, side, color)
+    return (lambda d: d.drawPixels(coords, color, pixels=pixels)), ref
+
+def case_gradient(rng, W, H):
+    x, y = rng.randrange(W - 10), rng.randrange(H - 10)
+    w, h = rng.randint(1, W - x), rng.randint(1, H - y)
+    c0, c1 = rnd_color(rng), rnd_color(rng)
+    direction = rng.choice(('vertical', 'horizontal'))
+    def ref(f):
+        n = h if direction == 'vertical' else w
+        for j in range(h):
+            for i in range(w):
+                k = j if direction == 'vertical' else i
+                f.set(x + i, y + j, tuple(a + (b - a) * k // (n - 1) if n > 1 else a
+                                          for a, b in zip(c0, c1)))
+    return (lambda d: d.fillGradient((x, y, w, h), c0, c1, direction)), ref
+
+def case_pattern(rng, W, H):
+    tw, th = rng.randint(1, 9), rng.randint(1, 9)
+    tile = [rng.getrandbits(16) for _ in range(tw * th)]
+    data = struct.pack('>%dH' % len(tile), *tile)
+    x, y = rng.randrange(W - 10), rng.randrange(H - 10)
+    w, h = rng.randint(1, W - x), rng.randint(1, H - y)
+    def ref(f):
+        for j in range(h):
+            for i in range(w):
+                f.set(x + i, y + j, tile[(j % th) * tw + i % tw])
+    return (lambda d: d.fillPattern((x, y, w, h), data, tw)), ref
+
+def case_write_rect(rng, W, H):
+    x, y = rng.randrange(W - 10), rng.randrange(H - 10)
+    w, h = rng.randint(1, min(60, W - x)), rng.randint(1, min(60, H - y))
+    pix = [rng.getrandbits(16) for _ in range(w * h)]
+    data = struct.pack('>%dH' % len(pix), *pix)
+    def ref(f):
+        for j in range(h):
+            for i in range(w):
+                f.set(x + i, y + j, pix[j * w + i])
+    return (lambda d: d.writeRect(x, y, w, h, data)), ref
+
+def case_chars(rng, W, H):
+    font = rng.choice((Arial_14, Vera_14))
+    scale = rng.randint(1, 3)
+    color, bgcolor = rnd_color(rng), rnd_color(rng)
+    chars = [chr(rng.randint(33, 126)) for _ in range(rng.randint(1, 6))]
+    # glyphs are not clipped: keep them on screen
+    x0, y = rng.randint(0, W - 60), rng.randint(scale + 1, H - font['height'] * scale - 2)
+    def draw(d):
+        ch = d.initCh(color=color, bgcolor=bgcolor, font=font, scale=scale)
+        x = x0
+        for c in chars:
+            ch.printChar(c, x, y)
+            x += len(font[ord(c)]) + 2
+    def ref(f):
+        x = x0
+        for c in chars:
+            ref_char(f, font, c, x, y, scale, color, bgcolor)
+            x += len(font[ord(c)]) + 2
+    return draw, ref
+
+def case_line(rng, W, H):
+    x0, y0, x1, y1 = rng.randrange(W), rng.randrange(H), rng.randrange(W), rng.randrange(H)
+    color = rnd_color(rng)
+    return (lambda d: d.drawLine(x0, y0, x1, y1, color)), (lambda f: ref_segment(f, x0, y0, x1, y1, color))
+
+def case_thick_line(rng, W, H):
+    x0, y0, x1, y1 = rng.randrange(W), rng.randrange(H), rng.randrange(W), rng.randrange(H)
+    if rng.random() < 0.3:                          # horizontal or vertical
+        if rng.random() < 0.5: y1 = y0
+        else: x1 = x0
+    width = rng.randint(2, 12)
+    cap = rng.choice((None, 'square', 'round'))
+    color = rnd_color(rng)
+    def ref(f):
+        ref_thick_line(f, x0, y0, x1, y1, width, cap, color)
+    return (lambda d: d.drawLine(x0, y0, x1, y1, color, width=width, cap=cap)), ref
+
+def case_ortho_lines(rng, W, H):
+    vertical = rng.random() < 0.5
+    width = rng.randint(1, 6)
+    if vertical:
+        length = rng.randint(1, H - 1)
+        x, y = rng.randrange(W - width), rng.randrange(H - length)
+    else:
+        length = rng.randint(1, W - 1)
+        x, y = rng.randrange(W - length), rng.randrange(H - width)
+    color = rnd_color(rng)
+    def draw(d):
+        if vertical:
+            d.drawVline(x, y, length, color, width=width)
+        else:
+            d.drawHline(x, y, length, color, width=width)
+    def ref(f):
+        if vertical:
+            f.rect(x, y, width, length, color)
+        else:
+            f.rect(x, y, length, width, color)
+    return draw, ref
+
+def case_rect(rng, W, H):
+    x, y = rng.randrange(W - 12), rng.randrange(H - 12)
+    w, h = rng.randint(8, W - 1 - x), rng.randint(8, H - 1 - y)
+    border = rng.randint(0, 10)
+    color = rnd_color(rng)
+    fill = rnd_color(rng) if rng.random() < 0.5 else None
+    def ref(f):
+        b = w // 2 - 1 if border > w // 2 else border
+        if not b:
+            f.rect(x, y, w + 1, h + 1, color)
+            return
+        inner = (x + b, y + b, w - 2*b + 1, h - 2*b + 1)
+        for j in range(y, y + h + 1):
+            for i in range(x, x + w + 1):
+                if not (inner[0] <= i < inner[0] + inner[2] and inner[1] <= j < inner[1] + inner[3]):
+                    f.set(i, j, color)
+        if fill:
+            f.rect(*inner, color=fill)
+    return (lambda d: d.drawRect(x, y, w, h, color, border=border, fillcolor=fill)), ref
+
+def case_fill(rng, W, H):
+    margin = rng.randint(0, 100)
+    color = rnd_color(rng)
+    def ref(f):
+        m = min(margin, 80)
+        f.rect(m, m, W - 2*m + 1, H - 2*m + 1, color)
+    return (lambda d: d.fillMonocolor(color, margin=margin)), ref
+
+def case_circle_outline(rng, W, H):
+    border = rng.randint(1, 12)
+    r = rng.randint(border + 4, 60)
+    x, y = rng.randint(r + 8, W - r - 8), rng.randint(r + 8, H - r - 8)
+    start = rng.choice((0, rng.randrange(360)))
+    degrees = rng.choice((360, rng.randint(1, 360)))
+    color = rnd_color(rng)
+    def ref(f):
+        # one dot per degree from startangle (0 is up, clockwise): a square
+        # of border+1 pixels on the circle, the border growing inwards
+        radius = r - border // 2
+        for i in range(start, degrees + start):
+            a = math.radians(i)
+            X = round(x + radius * math.sin(a)) - border // 2
+            Y = round(y - radius * math.cos(a)) - border // 2
+            f.rect(X, Y, border + 1, border + 1, color)
+    return (lambda d: d.drawCircle(x, y, r, color, border=border, degrees=degrees,
+                                   startangle=start)), ref
+
+def case_print_ln(rng, W, H):
+    font = rng.choice((Arial_14, Vera_14))
+    scale = rng.randint(1, 3)
+    color, bgcolor = rnd_color(rng), rnd_color(rng)
+    words = [''.join(chr(rng.randint(33, 126)) for _ in range(rng.randint(1, 5)))
+             for _ in range(rng.randint(1, 4))]
+    text = ' '.join(words)
+    # glyphs are not clipped: keep the lines on screen
+    while True:
+        x, y = rng.randint(0, W // 2), rng.randint(scale + 1, H - 4 * (font['height'] + 2) * scale)
+        glyphs = text_layout(font, text, x, y, scale, W)
+        if all(gx + len(font[ord(c)]) * scale <= W for c, gx, gy in glyphs):
+            break
+    def draw(d):
+        d.initCh(color=color, bgcolor=bgcolor, font=font, scale=scale).printLn(text, x, y)
+    def ref(f):
+        for c, gx, gy in glyphs:
+            ref_char(f, font, c, gx, gy, scale, color, bgcolor)
+    return draw, ref
+
+def case_render_bmp(rng, W, H):
+    images = list()
+    for name in sorted(os.listdir('images')):
+        if name.endswith('.bmp'):
+            with open('images/' + name, 'rb') as f:
+                head = f.read(26)
+            width, height = struct.unpack('<H', head[18:20])[0], struct.unpack('<H', head[22:24])[0]
+            if width < W and height < H:
+                images.append((name, width, height))
+    name, width, height = rng.choice(images)
+    # positions count from the bottom left corner (image orientation),
+    # without one the image is centered
+    pos = (rng.randrange(W - width), rng.randrange(H - height)) if rng.random() < 0.8 else None
+    x, y = pos or ((W - width + 1) // 2, (H - height) // 2)
+    left, top = x, H - y - height
+    source = rng.choice(('bmp', '.cache', '.rle'))
+    def draw(d):
+        if source == 'bmp':
+            d.renderBmp(name, pos, cached=False)
+            return
+        for progress in d._convert_image(name, compress=source == '.rle'):
+            pass
+        d.renderBmp(name, pos)
+        os.remove(lcd._cache_dir() + '/' + name + source)
+    return draw, (lambda f: ref_bmp(f, 'images/' + name, left, top))
+
+def random_block(rng, W, H):
+    x, y = rng.randrange(W - 10), rng.randrange(H - 10)
+    w, h = rng.randint(1, min(60, W - x)), rng.randint(1, min(60, H - y))
+    return x, y, w, h, [rng.getrandbits(16) for _ in range(w * h)]
+
+def put_block(f, block):
+    x, y, w, h, pix = block
+    for j in range(h):
+        for i in range(w):
+            f.set(x + i, y + j, pix[j * w + i])
+
+def write_block(d, block):
+    x, y, w, h, pix = block
+    d.writeRect(x, y, w, h, struct.pack('>%dH' % len(pix), *pix))
+
+def case_copy_rect(rng, W, H):
+    block = random_block(rng, W, H)
+    w, h = rng.randint(1, 80), rng.randint(1, 80)
+    sx, sy = rng.randrange(W - w), rng.randrange(H - h)
+    dx, dy = rng.randrange(W - w), rng.randrange(H - h)
+    if rng.random() < 0.5:                          # overlapping copy
+        dx = max(0, min(W - w, sx + rng.randint(-10, 10)))
+        dy = max(0, min(H - h, sy + rng.randint(-10, 10)))
+    def draw(d):
+        write_block(d, block)
+        d.copyRect((sx, sy, w, h), (dx, dy))
+    def ref(f):
+        put_block(f, block)
+        src = [f.get(sx + i, sy + j) for j in range(h) for i in range(w)]
+        for j in range(h):
+            for i in range(w):
+                f.set(dx + i, dy + j, src[j * w + i])
+    return draw, ref
+
+def case_scroll_rect(rng, W, H):
+    block = random_block(rng, W, H)
+    x, y, w, h = block[:4]
+    sx, sy = rng.randint(-w - 2, w + 2), rng.randint(-h - 2, h + 2)
+    fill = rnd_color(rng) if rng.random() < 0.5 else None
+    def draw(d):
+        write_block(d, block)
+        d.scrollRect((x, y, w, h), sx, sy, fillcolor=fill)
+    def ref(f):
+        put_block(f, block)
+        old = [f.get(x + i, y + j) for j in range(h) for i in range(w)]
+        for j in range(h):
+            for i in range(w):
+                i0, j0 = i - sx, j - sy
+                if 0 <= i0 < w and 0 <= j0 < h:
+                    f.set(x + i, y + j, old[j0 * w + i0])
+                elif fill:
+                    f.set(x + i, y + j, fill)
+    return draw, ref
+
+def case_console(rng, W, H):
+    if W > H:
+        return None                                 # portrait only
+    font = rng.choice((Arial_14, Vera_14))
+    scale = rng.randint(1, 2)
+    color, bgcolor = rnd_color(rng), rnd_color(rng)
+    top, bottom = rng.choice((0, rng.randint(1, 40))), rng.choice((0, rng.randint(1, 40)))
+    lines = [''.join(chr(rng.randint(32, 126)) for _ in range(rng.randint(0, 40)))
+             for _ in range(rng.randint(1, 30))]
+    def draw(d):
+        console = d.initConsole(color=color, bgcolor=bgcolor, font=font, scale=scale,
+                                top=top, bottom=bottom)
+        console.write('\n'.join(lines))
+        draw.console = console
+    def ref(f):
+        height = (font['height'] + 2) * scale
+        rows = (H - top - bottom) // height
+        f.rect(0, top, W, rows * height, bgcolor)
+        for n, line in enumerate(lines[-rows:]):
+            x, y = 2, top + n * height + scale
+            for c in line:
+                width = len(font[ord(c)])
+                if x + width * scale >= W:
+                    break
+                space = scale - scale // 2
+                if width == 1:
+                    space = scale + 1 if scale > 2 else scale - 1
+                if width:
+                    ref_char(f, font, c, x, y, scale, color, bgcolor)
+                x += width * space + 3
+    def after():
+        draw.console.close()
+    return draw, ref, after
+
+def case_line_aa(rng, W, H):
+    x0, y0, x1, y1 = rng.randrange(W), rng.randrange(H), rng.randrange(W), rng.randrange(H)
+    color, bg = rnd_color(rng), rnd_color(rng)
+    def draw(d):
+        d.fillMonocolor(bg)
+        d.drawLineAA(x0, y0, x1, y1, color, background=bg)
+    def ref(f):
+        f.rect(0, 0, W, H, bg)
+        ref_wu(f, x0, y0, x1, y1, color, bg)
+    return draw, ref
+
+def case_circle(rng, W, H):
+    r = rng.randint(4, 60)
+    x, y = rng.randint(r + 3, W - r - 3), rng.randint(r + 3, H - r - 3)
+    color = rnd_color(rng)
+    return (lambda d: d.drawCircleFilled(x, y, r, color)), (lambda f: ref_disc(f, x, y, r, r, color))
+
+def case_oval(rng, W, H):
+    rx, ry = rng.randint(4, 60), rng.randint(4, 60)
+    # the legacy circles do not clip: keep them off the edges
+    x, y = rng.randint(rx + 3, W - rx - 3), rng.randint(ry + 3, H - ry - 3)
+    color = rnd_color(rng)
+    return (lambda d: d.drawOvalFilled(x, y, rx, ry, color)), (lambda f: ref_disc(f, x, y, rx, ry, color))
+
+cases = (
+    ('fillPolygon',      0, 0, case_polygon),
+    ('fillTriangle',     0, 0, case_triangle),
+    ('drawRects',        0, 0, case_rects),
+    ('drawHlines',       0, 0, case_hlines),
+    ('drawPixels',       0, 0, case_pixels),
+    ('fillGradient',     0, 0, case_gradient),
+    ('fillPattern',      0, 0, case_pattern),
+    ('writeRect',        0, 0, case_write_rect),
+    ('printChar',        0, 0, case_chars),
+    ('printLn',          0, 0, case_print_ln),
+    ('drawHVline',       0, 0, case_ortho_lines),
+    ('drawRect',         0, 0, case_rect),
+    ('fillMonocolor',    0, 0, case_fill),
+    ('renderBmp',        0, 0, case_render_bmp),
+    ('copyRect',         0, 0, case_copy_rect),
+    ('scrollRect',       0, 0, case_scroll_rect),
+    ('Console',          0, 0, case_console),
+    # ideal shapes: the driver snaps their edges to the pixel grid
+    ('drawLineThick',    1, 0, case_thick_line),
+    ('drawCircle',       1, 0, case_circle_outline),
+    ('drawLineAA',       1, 4, case_line_aa),
+    # the legacy line and filled circles are within 2-3 pixels of the ideal
+    ('drawLine',         2, 0, case_line),
+    ('drawCircleFilled', 3, 0, case_circle),
+    ('drawOvalFilled',   3, 0, case_oval),
+)
+
+
+def run(runs=5, seed=1, outdir='diffcheck', only=None):
+    """ Returns the number of failed runs. """
+    rng = random.Random(seed)
+    d = lcd.LCD()
+    panel = pyb.SPI.devices(1)[0]
+    failed = 0
+    for name, tol, ctol, make in cases:
+        if only and name not in only:
+            continue
+        bad_runs = 0
+        for portrait in (True, False):
+            d.setPortrait(portrait)
+            W, H = d.TFTWIDTH, d.TFTHEIGHT
+            for n in range(runs):
+                bg = rnd_color(rng)
+                made = make(rng, W, H)
+                if made is None:
+                    continue
+                draw, ref = made[:2]
+                d.fillMonocolor(bg)
+                draw(d)
+                frame = Frame(W, H, bg)
+                ref(frame)
+                got = capture(panel, portrait)
+                if len(made) > 2:
+                    made[2]()
+                bad = compare(frame, got, tol, ctol)
+                if bad:
+                    bad_runs += 1
+                    if not os.path.isdir(outdir):
+                        os.mkdir(outdir)
+                    path = '%s/%s_%s_%d.png' % (outdir, name, 'p' if portrait else 'l', n)
+                    png(path, [frame, got], bad)
+                    print('  %s: %d pixels differ, see %s' % (name, len(bad), path))
+        print('%-18s %s' % (name, 'FAIL (%d runs)' % bad_runs if bad_runs else 'ok'))
+        failed += bad_runs
+    d.setPortrait(True)
+    return failed
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    failed = run(int(args[0]) if args else 5,
+                 int(args[1]) if len(args) > 1 else 1,
+                 args[2] if len(args) > 2 else 'diffcheck')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,41 @@
+# micropython.py - host stand-in for the MicroPython `micropython` module
+#
+# Inline assembler functions can not run under CPython: asm_thumb swaps each
+# decorated function for a Python emulation registered below by name.
+
+def const(value):
+    return value
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+def schedule(func, arg):
+    func(arg)
+    return True
+
+def native(func):
+    return func
+
+def viper(func):
+    return func
+
+def _reverse(buf, length):
+    # swap every byte pair in place (little <-> big endian RGB565)
+    length -= length % 2
+    even, odd = bytes(buf[0:length:2]), bytes(buf[1:length:2])
+    buf[0:length:2], buf[1:length:2] = odd, even
+
+def _asm_get_charpos(r0, r1, r2):
+    return r0 * r1 + r2
+
+_thumb = dict(
+    _reverse         = _reverse,
+    _asm_get_charpos = _asm_get_charpos,
+)
+
+def asm_thumb(func):
+    try:
+        return _thumb[func.__name__]
+    except KeyError:
+        raise NotImplementedError('No host emulation for asm_thumb function: '
+                                  + func.__name__)
@@ -0,0 +1,185 @@
+# panel.py - ILI9341 model for the host stand-in
+#
+# Decodes the command/data stream sent over the simulated SPI bus into a
+# 240x320 RGB565 framebuffer. MADCTL (MY, MX, MV), CASET/PASET windows and
+# RAMWR/RAMRD are modelled; other commands are accepted and ignored.
+#
+# pixel(x, y) returns what a viewer sees in portrait orientation, with the
+# vertical scrolling (VSCRDEF/VSCRSADD) applied.
+
+import array
+
+WIDTH  = 240
+HEIGHT = 320
+
+# command codes, see registers.py
+CASET  = 0x2A
+PASET  = 0x2B
+RAMWR  = 0x2C
+RAMRD  = 0x2E
+MADCTL = 0x36
+VSCRDEF  = 0x33
+VSCRSADD = 0x37
+RDDPM  = 0x0A
+SWRESET = 0x01
+SLPIN  = 0x10
+SLPOUT = 0x11
+LCDOFF = 0x28
+LCDON  = 0x29
+
+MY = 0x80
+MX = 0x40
+MV = 0x20
+
+
+class Panel:
+
+    def __init__(self, cs='X4', dc='X5', rst='X3'):
+        self.cs  = cs
+        self.dc  = dc
+        self.rst = rst
+        self.maxrate = None     # fastest reliable SPI baudrate, None: no limit
+        self.mem = array.array('H', bytes(WIDTH * HEIGHT * 2))
+        self.reset()
+
+    def reset(self):
+        self.madctl = 0
+        self.cols = (0, WIDTH-1)
+        self.pages = (0, HEIGHT-1)
+        self.cmd = None
+        self.params = bytearray()
+        self.pending = bytearray()
+        self.col = self.page = 0
+        self.ends = self._ends()
+        self.sleeping = True
+        self.displayon = False
+        self.readout = bytearray()
+        self.scroll = (0, HEIGHT, 0)    # top fixed, scrolled, bottom fixed rows
+        self.scrollstart = 0
+
+    # -- bus side --------------------------------------------------------
+
+    def write(self, dc, data):
+        if not dc:
+            for cmd in data:
+                self._command(cmd)
+            return
+        if self.cmd == RAMWR:
+            self._pixels(data)
+        else:
+            self.params += data
+            self._parameters()
+
+    def read(self, nbytes):
+        data = self.readout[:nbytes]
+        self.readout = self.readout[nbytes:]
+        if len(data) < nbytes and self.cmd == RAMRD:
+            data += self._read_pixels(nbytes - len(data))
+        return bytes(data) + bytes(nbytes - len(data))
+
+    # -- command decoding -----------------------------------------------
+
+    def _command(self, cmd):
+        self.cmd = cmd
+        self.params = bytearray()
+        self.pending = bytearray()
+        self.readout = bytearray()
+        if cmd in (RAMWR, RAMRD):
+            self.col, self.page = self.cols[0], self.pages[0]
+            self.ends = self._ends()
+            if cmd == RAMRD:
+                self.readout = bytearray(1)             # dummy read
+        elif cmd == SWRESET:
+            self.reset()
+        elif cmd == SLPOUT:
+            self.sleeping = False
+        elif cmd == SLPIN:
+            self.sleeping = True
+        elif cmd == LCDON:
+            self.displayon = True
+        elif cmd == LCDOFF:
+            self.displayon = False
+        elif cmd == RDDPM:
+            mode = 0x80 | (0 if self.sleeping else 0x10) | 0x08
+            mode |= 0x04 if self.displayon else 0
+            self.readout = bytearray((0, mode))
+
+    def _parameters(self):
+        p = self.params
+        if self.cmd == CASET and len(p) >= 4:
+            self.cols = ((p[0] << 8) | p[1], (p[2] << 8) | p[3])
+        elif self.cmd == PASET and len(p) >= 4:
+            self.pages = ((p[0] << 8) | p[1], (p[2] << 8) | p[3])
+        elif self.cmd == MADCTL and len(p) >= 1:
+            self.madctl = p[0]
+        elif self.cmd == VSCRDEF and len(p) >= 6:
+            self.scroll = ((p[0] << 8) | p[1], (p[2] << 8) | p[3], (p[4] << 8) | p[5])
+        elif self.cmd == VSCRSADD and len(p) >= 2:
+            self.scrollstart = (p[0] << 8) | p[1]
+
+    # -- memory access ---------------------------------------------------
+
+    def _address(self, col, page):
+        if self.madctl & MV:
+            row, x = col, page
+        else:
+            row, x = page, col
+        if self.madctl & MX:
+            x = WIDTH - 1 - x
+        if self.madctl & MY:
+            row = HEIGHT - 1 - row
+        if 0 <= x < WIDTH and 0 <= row < HEIGHT:
+            return row * WIDTH + x
+        return -1
+
+    def _ends(self):
+        # window ends out of the panel are clamped to its last column/page
+        if self.madctl & MV:
+            return min(self.cols[1], HEIGHT-1), min(self.pages[1], WIDTH-1)
+        return min(self.cols[1], WIDTH-1), min(self.pages[1], HEIGHT-1)
+
+    def _step(self):
+        colend, pageend = self.ends
+        if self.col < colend:
+            self.col += 1
+        else:
+            self.col = self.cols[0]
+            self.page = self.page + 1 if self.page < pageend else self.pages[0]
+
+    def _pixels(self, data):
+        if self.pending:
+            data = bytes(self.pending) + bytes(data)
+            self.pending = bytearray()
+        end = len(data) - len(data) % 2
+        mem = self.mem
+        for i in range(0, end, 2):
+            addr = self._address(self.col, self.page)
+            if addr >= 0:
+                mem[addr] = (data[i] << 8) | data[i+1]
+            self._step()
+        if end < len(data):
+            self.pending = bytearray(data[end:])
+
+    def _read_pixels(self, nbytes):
+        # RAMRD always returns 18-bit colour: one byte per R, G, B component
+        out = bytearray()
+        while len(out) < nbytes:
+            addr = self._address(self.col, self.page)
+            word = self.mem[addr] if addr >= 0 else 0
+            out += bytes(((word >> 8) & 0xF8, (word >> 3) & 0xFC, (word << 3) & 0xF8))
+            self._step()
+        self.readout = out[nbytes:]
+        return out[:nbytes]
+
+    # -- viewer side -----------------------------------------------------
+
+    def pixel(self, x, y):
+        tfa, vsa, bfa = self.scroll
+        if tfa <= y < tfa + vsa:
+            y = tfa + (y - tfa + self.scrollstart - tfa) % vsa
+        # portrait view: graph orientation mirrors the panel on X
+        return self.mem[y * WIDTH + (WIDTH - 1 - x)]
+
+    def fill(self, word=0):
+        for i in range(len(self.mem)):
+            self.mem[i] = word
@@ -0,0 +1,260 @@
+# pyb.py - host stand-in for the pyboard `pyb` module
+#
+# Lets the driver run under CPython on a PC. Pins and SPI buses are
+# simulated and a model of the ILI9341 (see panel.py) listens on SPI(1), so
+# every drawing call ends up in a virtual framebuffer. A model of the STMPE610
+# touch controller (see touchpanel.py) shares the bus.
+#
+# Usage, from the ILI9341 directory:
+#    PYTHONPATH=host python3 lcd.py
+#
+# Time is virtual: micros() counts the host time spent in the driver itself
+# (the panel model is excluded) plus the simulated cost of delays and SPI
+# transfers, so timings stay comparable with the pyboard.
+#
+# Bus cost model: a transfer costs SPI.overhead microseconds plus 8 bits per
+# byte at the baudrate the pyboard would really use (its peripheral clock
+# divided by a power of two). A device with a `maxrate` attribute receives
+# corrupted data when the bus runs faster, like a panel on long wires.
+
+import time
+
+from panel import Panel
+from touchpanel import STMPE610
+
+_t0 = time.perf_counter()
+_virtual  = 0.0    # simulated microseconds (delays and bus transfers)
+_excluded = 0.0    # host seconds spent in the simulation itself
+
+def _now():
+    return (time.perf_counter() - _t0 - _excluded) * 1000000 + _virtual
+
+def _advance(us):
+    global _virtual
+    _virtual += us
+
+def micros():
+    return int(_now())
+
+def millis():
+    return int(_now()) // 1000
+
+def elapsed_micros(start):
+    return micros() - start
+
+def elapsed_millis(start):
+    return millis() - start
+
+def delay(ms):
+    _advance(ms * 1000)
+
+def udelay(us):
+    _advance(us)
+
+def freq(*args):
+    return (168000000, 168000000, 42000000, 84000000)
+
+
+class Pin:
+    IN        = 0
+    OUT_PP    = 1
+    OUT_OD    = 17
+    PULL_NONE = 0
+    PULL_UP   = 1
+    PULL_DOWN = 2
+
+    _pins = dict()
+
+    def __init__(self, name, mode=IN, pull=PULL_NONE, value=None):
+        self._name = name
+        self._mode = mode
+        self._value = 1 if pull == Pin.PULL_UP else 0
+        if value is not None:
+            self._value = 1 if value else 0
+        Pin._pins[name] = self
+
+    def init(self, mode=IN, pull=PULL_NONE, value=None):
+        self.__init__(self._name, mode, pull, value)
+
+    def name(self):
+        return self._name
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        # a chip select going high ends the transaction: let it finish first
+        if value and self._name in SPI._cspins:
+            SPI._cspins[self._name].wait()
+        self._value = 1 if value else 0
+
+    def high(self):
+        self.value(1)
+
+    def low(self):
+        self.value(0)
+
+    on  = high
+    off = low
+
+    @staticmethod
+    def level(name, default=1):
+        pin = Pin._pins.get(name)
+        return default if pin is None else pin._value
+
+
+class ExtInt:
+    IRQ_RISING         = 269549568
+    IRQ_FALLING        = 270598144
+    IRQ_RISING_FALLING = 271646720
+
+    _lines = dict()     # pin name -> ExtInt
+
+    def __init__(self, pin, mode, pull, callback):
+        self._pin = pin if isinstance(pin, str) else pin.name()
+        self._mode = mode
+        self._callback = callback
+        self._enabled = True
+        ExtInt._lines[self._pin] = self
+
+    def line(self):
+        return sorted(ExtInt._lines).index(self._pin)
+
+    def enable(self):
+        self._enabled = True
+
+    def disable(self):
+        self._enabled = False
+
+    @staticmethod
+    def _edge(name, rising=True):
+        # called by the device models when their interrupt pin changes
+        ext = ExtInt._lines.get(name)
+        if ext is None or not ext._enabled:
+            return
+        if ext._mode == ExtInt.IRQ_RISING_FALLING or \
+                (ext._mode == ExtInt.IRQ_RISING) == rising:
+            ext._callback(ext.line())
+
+
+class SPI:
+    MASTER = 260
+    SLAVE  = 0
+    MSB    = 0
+    LSB    = 128
+
+    _buses  = dict()    # port -> devices listening on that bus
+    _cspins = dict()    # chip select pin name -> SPI driving it
+
+    overhead = 4        # microseconds per transfer (call and DMA setup)
+
+    def __init__(self, port, mode=MASTER, baudrate=328125, polarity=1, phase=0,
+                 **kwargs):
+        self._port = port
+        self._busy_until = 0.0
+        if port not in SPI._buses:
+            SPI._buses[port] = [Panel(), STMPE610()] if port == 1 else []
+        for dev in SPI._buses[port]:
+            SPI._cspins[dev.cs] = self
+        self.init(mode, baudrate, polarity, phase)
+
+    def init(self, mode=MASTER, baudrate=328125, polarity=1, phase=0, **kwargs):
+        self.wait()
+        # SPI1 runs from the 84 MHz APB2 clock, SPI2 from the 42 MHz APB1
+        clock = 42000000 if self._port == 2 else 84000000
+        prescaler = 2
+        while prescaler < 256 and clock // prescaler > baudrate:
+            prescaler *= 2
+        self._mode = mode
+        self._baudrate = clock // prescaler
+        self._polarity = polarity
+        self._phase = phase
+
+    def deinit(self):
+        self.wait()
+
+    @staticmethod
+    def devices(port=1):
+        return SPI._buses.setdefault(port, [])
+
+    @staticmethod
+    def attach(port, device):
+        SPI.devices(port).append(device)
+        for spi in list(SPI._cspins.values()):
+            if spi._port == port:
+                SPI._cspins[device.cs] = spi
+                break
+
+    def _selected(self):
+        for dev in SPI._buses[self._port]:
+            if not Pin.level(dev.cs):
+                return dev
+        return None
+
+    def baudrate(self):
+        return self._baudrate
+
+    def _cost(self, nbytes):
+        return SPI.overhead + nbytes * 8000000.0 / self._baudrate
+
+    def _transfer(self, data):
+        global _excluded
+        dev = self._selected()
+        if dev is not None:
+            start = time.perf_counter()
+            data = bytes(data)
+            maxrate = getattr(dev, 'maxrate', None)
+            if maxrate and self._baudrate > maxrate:
+                data = bytes(b ^ 0x21 if i % 7 == 3 else b for i, b in enumerate(data))
+            dev.write(Pin.level(dev.dc), data)
+            _excluded += time.perf_counter() - start
+
+    def _read(self, nbytes):
+        global _excluded
+        dev = self._selected()
+        if dev is None:
+            return bytes(nbytes)
+        start = time.perf_counter()
+        data = dev.read(nbytes)
+        _excluded += time.perf_counter() - start
+        return data
+
+    @staticmethod
+    def _buffer(data):
+        if isinstance(data, int):
+            return bytes((data & 0xFF,))
+        if not len(data):
+            # the pyboard HAL refuses empty transfers
+            raise OSError(5)
+        return data
+
+    def send(self, send, timeout=5000):
+        self.send_async(send)
+        self.wait()
+
+    def send_async(self, send):
+        # Starts a DMA-style transfer and returns at once; the bus stays busy
+        # for the transfer time and the next transfer waits for it.
+        data = self._buffer(send)
+        self.wait()
+        self._transfer(data)
+        self._busy_until = _now() + self._cost(len(data))
+
+    def wait(self):
+        now = _now()
+        if now < self._busy_until:
+            _advance(self._busy_until - now)
+
+    def recv(self, recv, timeout=5000):
+        self.wait()
+        if isinstance(recv, int):
+            recv = bytearray(recv)
+        recv[:] = self._read(len(recv))
+        _advance(self._cost(len(recv)))
+        return recv
+
+    def send_recv(self, send, recv=None, timeout=5000):
+        data = self._buffer(send)
+        if recv is None:
+            recv = bytearray(len(data))
+        self.send(data)
+        return self.recv(recv)
@@ -0,0 +1,145 @@
+# touchpanel.py - host model of the STMPE610 resistive touch controller
+#
+# Listens on SPI(1) next to the ILI9341 model (CS X2, interrupt on X1, the
+# Adafruit TFT Touch Shield wiring) and answers register accesses the way
+# the controller does: a byte with the read bit set asks for a register,
+# which comes out during the next byte; TSC_DATA (0x57) pops the FIFO.
+#
+# Touches are made up by the caller, in portrait screen coordinates:
+#
+#    tp = SPI.devices(1)[1]
+#    tp.press(120, 160, samples=3, noise=20)   # raises the interrupt
+#    tp.release()
+#
+# Every sample costs `sampletime` microseconds of virtual time before it
+# reaches the FIFO, like the controller averaging and settling.
+
+import random
+
+INT_CTRL  = 0x09
+INT_EN    = 0x0A
+INT_STA   = 0x0B
+TSC_CTRL  = 0x40
+FIFO_TH   = 0x4A
+FIFO_STA  = 0x4B
+FIFO_SIZE = 0x4C
+TSC_DATA  = 0x57
+
+FIFO_DEPTH = 128
+
+
+class STMPE610:
+
+    def __init__(self, cs='X2', irq='X1'):
+        self.cs  = cs
+        self.dc  = None         # no D/C line: Pin.level() gives 1
+        self.irq = irq
+        self.maxrate = 1000000
+        self.sampletime = 1300  # microseconds per sample (4 averaged)
+        self.calibration = (150, 3800, 130, 4000)   # raw at the screen edges
+        self.random = random.Random(0)
+        self.reset()
+
+    def reset(self):
+        self.regs = bytearray(256)
+        self.regs[0], self.regs[1] = 0x08, 0x11     # chip id
+        self.fifo = bytearray()
+        self.intsta = 0
+        self.level = False
+        self.touched = False
+        self.readout = bytearray()
+
+    # -- bus side --------------------------------------------------------
+
+    def write(self, dc, data):
+        # one call per transaction: the read/write sequence restarts at CS
+        out = bytearray()
+        addr = None             # register asked by the byte before
+        i = 0
+        while i < len(data):
+            out.append(self._get(addr) if addr is not None else 0)
+            addr = None
+            b = data[i]
+            if b & 0x80:
+                addr = b & 0x7F
+            elif i + 1 < len(data):
+                out.append(0)
+                self._set(b, data[i + 1])
+                i += 1
+            i += 1
+        self.readout = out
+
+    def read(self, nbytes):
+        data = self.readout[:nbytes]
+        self.readout = self.readout[nbytes:]
+        return bytes(data) + bytes(nbytes - len(data))
+
+    def _get(self, reg):
+        if reg == INT_STA:
+            return self.intsta
+        if reg == FIFO_SIZE:
+            return len(self.fifo) // 4
+        if reg == FIFO_STA:
+            return (0x20 if not self.fifo else 0) | \
+                   (0x40 if len(self.fifo) == FIFO_DEPTH * 4 else 0)
+        if reg == TSC_CTRL:
+            return self.regs[reg] | (0x80 if self.touched else 0)
+        if reg == TSC_DATA:
+            if not self.fifo:
+                return 0
+            value = self.fifo[0]
+            del self.fifo[0]
+            return value
+        return self.regs[reg]
+
+    def _set(self, reg, value):
+        if reg == 0x03 and value & 0x02:        # SYS_CTRL1 soft reset
+            self.reset()
+            return
+        if reg == INT_STA:
+            self.intsta &= ~value
+        elif reg == FIFO_STA:
+            if value & 0x01:
+                self.fifo = bytearray()
+        else:
+            self.regs[reg] = value
+        self._interrupt()
+
+    def _interrupt(self):
+        import pyb
+        level = bool(self.regs[INT_CTRL] & 0x01 and self.intsta & self.regs[INT_EN])
+        if level != self.level:
+            self.level = level
+            pyb.ExtInt._edge(self.irq, level)
+
+    # -- touches ---------------------------------------------------------
+
+    def raw(self, x, y):
+        xmin, xmax, ymin, ymax = self.calibration
+        return (xmin + x * (xmax - xmin) // 239,
+                ymin + y * (ymax - ymin) // 319)
+
+    def press(self, x, y, z=32, samples=1, noise=0):
+        import pyb
+        if not self.regs[TSC_CTRL] & 0x01:
+            return
+        if not self.touched:
+            self.touched = True
+            self.intsta |= 0x01                 # touch detected
+        for i in range(samples):
+            pyb._advance(self.sampletime)
+            rx, ry = self.raw(x, y)
+            rx += self.random.randint(-noise, noise)
+            ry += self.random.randint(-noise, noise)
+            rx, ry = max(0, min(rx, 4095)), max(0, min(ry, 4095))
+            if len(self.fifo) < FIFO_DEPTH * 4:
+                self.fifo += bytes((rx >> 4, (rx & 0x0F) << 4 | ry >> 8, ry & 0xFF, z))
+            if len(self.fifo) // 4 >= max(self.regs[FIFO_TH], 1):
+                self.intsta |= 0x02             # FIFO threshold
+            self._interrupt()
+
+    def release(self):
+        if self.touched:
+            self.touched = False
+            self.intsta |= 0x01
+            self._interrupt()
@@ -24,6 +24,7 @@ import os
 import struct
 import math
 import array
+import json
 
 import pyb, micropython
 from pyb import SPI, Pin
@@ -31,100 +32,239 @@ from pyb import SPI, Pin
 from decorators import dimensions
 from registers import regs
 from colors import *
+from spibus import Bus, Device
+import rle, trig
+from widgets import Widgets
 
 micropython.alloc_emergency_exception_buf(100)
 
 imgcachedir = 'images/cache'
-if 'cache' not in os.listdir('images'):
-    try:
-        os.mkdir(imgcachedir)
-    except OSError: pass
+_cachedir_ready = False
+
+# The image cache directory is created on first use: importing lcd touches
+# no file
+def _cache_dir():
+    global _cachedir_ready
+    if not _cachedir_ready:
+        try:
+            os.mkdir(imgcachedir)
+        except OSError: pass
+        _cachedir_ready = True
+    return imgcachedir
 
 rate = 42000000
+fillchunk = 1920    # pixels per SPI write in fills
+imgchunk = 512      # bytes per SPI write in image streams
+
+# Start up sequence: (register, parameters, delay in ms after the command).
+# Commands between delays go out in a single CS cycle. No SWRESET: reset()
+# pulses the RST pin just before. MADCTL is set by setPortrait().
+init_table = (
+    ('LCDOFF',   b'',     0),   # Display OFF
+    ('PTLON',    b'',     0),   # Partial mode ON
+    ('PIXFMT',   b'\x55', 0),   # Pixel format set: 16-bit/pixel (0x66: 18-bit)
+    ('GAMMASET', b'\x01', 0),
+    ('ETMOD',    b'\x07', 0),   # Entry mode set
+)
+wake_table = (
+    ('SLPOUT',   b'',     5),   # sleep mode OFF, 5 ms before the next command
+    ('LCDON',    b'',     0),
+)
+
+tunefile = 'lcdtune.json'   # written by lcd.calibrate(), loaded at start up
+
+# State of one panel, shared by every object drawing on it (LCD, text
+# contexts, consoles). The window and MADCTL caches skip commands that would
+# not change anything; they are reset when the panel is reset.
+class Display(Device):
+    __slots__ = ('rst', 'dc', 'rate', 'regs', 'fillchunk', 'imgchunk',
+                 'recording', 'portrait', 'width', 'height',
+                 'madctl', 'cols', 'pages')
+
+    def __init__(self, bus, rst, cs, dc, rate, regs, fillchunk, imgchunk):
+        super(Display, self).__init__(bus, cs, rate, polarity=1, phase=1)
+        self.rst  = rst
+        self.dc   = dc
+        self.rate = rate        # write baudrate, reads go slower
+        self.regs = regs        # command codes of the chip
+        self.fillchunk = fillchunk
+        self.imgchunk  = imgchunk
+        self.recording = None   # recording in progress, see recorder.py
+        self.portrait = True
+        self.width  = ILI._tftwidth
+        self.height = ILI._tftheight
+        self.invalidate()
+
+    def invalidate(self):
+        self.madctl = None
+        self.cols = self.pages = None
 
 class ILI:
-    _cnt  = 0
-    _regs = dict()
-    _spi  = object()
-    _rst  = object()
-    _csx  = object()
-    _dcx  = object()
-    _portrait  = True
+    _devices = dict()   # (port, CS pin) -> Display
 
     _tftwidth  = 240    # TFT width Constant
     _tftheight = 320    # TFT height Constant
 
-    _curwidth  = 240   # Current TFT width
-    _curheight = 320   # Current TFT height
-
-    def __init__(self, rstPin='X3', csxPin='X4', dcxPin='X5', port=1, rate=rate,
-                chip='ILI9341', portrait=True):
-        if ILI._cnt == 0:
-            ILI._regs = regs[chip]
-            ILI._spi  = SPI(port, SPI.MASTER, baudrate=rate, polarity=1, phase=1)
-            ILI._rst  = Pin(rstPin, Pin.OUT_PP)    # Reset Pin
-            ILI._csx  = Pin(csxPin, Pin.OUT_PP)    # CSX Pin
-            ILI._dcx  = Pin(dcxPin, Pin.OUT_PP)    # D/Cx Pin
-            self.reset()
-            self._initILI()
+    _readrate  = 5250000   # RAMRD is not reliable above 6.6 MHz
+
+    # Panels are told apart by their SPI port and CS pin: LCD() twice with
+    # the same pins, or with device=, draws on the same panel. Several
+    # panels (and other devices, see spibus.py) can share one SPI port.
+    # A new panel starts in portrait mode unless portrait=False; an object
+    # made for a panel already running keeps its orientation unless portrait
+    # is given.
+    def __init__(self, rstPin='X3', csxPin='X4', dcxPin='X5', port=1, rate=None,
+                chip='ILI9341', portrait=None, warm=True, device=None):
+        dev = device or ILI._devices.get((port, csxPin))
+        if dev is None:
+            tuning = self._load_tuning()
+            dev = Display(Bus.get(port),
+                          Pin(rstPin, Pin.OUT_PP),    # Reset Pin
+                          Pin(csxPin, Pin.OUT_PP),    # CSX Pin
+                          Pin(dcxPin, Pin.OUT_PP),    # D/Cx Pin
+                          rate if rate else tuning['rate'], regs[chip],
+                          tuning['fillchunk'], tuning['imgchunk'])
+            ILI._devices[(port, csxPin)] = dev
+            self._dev = dev
+            # warm start: a panel still configured (e.g. after a soft reboot
+            # of the pyboard) is not reset
+            mode = self._read_mode()
+            if not (warm and mode != 0xFF and mode & 0x94 == 0x94):
+                self.reset()
+                self._initILI(awake=mode == 0xFF or mode & 0x10)
+            self.setPortrait(portrait is not False)
+        else:
+            # other instances (text contexts, consoles) share the device: no
+            # MADCTL write when the orientation does not change
+            self._dev = dev
+            if portrait is not None and portrait != dev.portrait:
+                self.setPortrait(portrait)
+
+    # Display geometry of the current orientation, shared by all instances
+    @property
+    def TFTWIDTH(self):
+        return self._dev.width
+
+    @property
+    def TFTHEIGHT(self):
+        return self._dev.height
+
+    # Settings saved by calibrate(), defaults when there is no tuning file
+    @staticmethod
+    def _load_tuning():
+        tuning = dict(rate=rate, fillchunk=fillchunk, imgchunk=imgchunk)
+        try:
+            with open(tunefile) as f:
+                tuning.update(json.load(f))
+        except (OSError, ValueError): pass
+        return tuning
 
-        self.setPortrait(portrait)
-        ILI._cnt += 1
+    def _set_rate(self, baudrate):
+        self._dev.set_rate(baudrate)
 
     def reset(self):
-        ILI._rst.low()                #
+        self._dev.rst.low()           #
         pyb.delay(1)                  #    RESET LCD SCREEN
-        ILI._rst.high()               #
+        self._dev.rst.high()          #
+        pyb.delay(5)                  # before the first command
+        self._dev.invalidate()
 
     def setPortrait(self, portrait):
-        if ILI._portrait != portrait:
-            ILI._portrait = portrait
+        if self._dev.portrait != portrait:
+            self._dev.portrait = portrait
         self._setWH()
 
     def _setWH(self):
-        if ILI._portrait:
-            ILI._curheight = self.TFTHEIGHT = ILI._tftheight
-            ILI._curwidth  = self.TFTWIDTH  = ILI._tftwidth
+        dev = self._dev
+        if dev.portrait:
+            dev.height = ILI._tftheight
+            dev.width  = ILI._tftwidth
         else:
-            ILI._curheight = self.TFTHEIGHT = ILI._tftwidth
-            ILI._curwidth  = self.TFTWIDTH  = ILI._tftheight
+            dev.height = ILI._tftwidth
+            dev.width  = ILI._tftheight
         self._graph_orientation()
 
-    def _initILI(self):
-        self._write_cmd(ILI._regs['LCDOFF'])   # Display OFF
-        pyb.delay(10)
-        self._write_cmd(ILI._regs['SWRESET'])  # Reset SW
-        pyb.delay(50)
-        self._graph_orientation()
-        self._write_cmd(ILI._regs['PTLON'])    # Partial mode ON
-        self._write_cmd(ILI._regs['PIXFMT'])   # Pixel format set
-        #self._write_data(0x66)    # 18-bit/pixel
-        self._write_data(0x55)    # 16-bit/pixel
-        self._write_cmd(ILI._regs['GAMMASET'])
-        self._write_data(0x01)
-        self._write_cmd(ILI._regs['ETMOD'])    # Entry mode set
-        self._write_data(0x07)
-        self._write_cmd(ILI._regs['SLPOUT'])   # sleep mode OFF
-        pyb.delay(10)
-        self._write_cmd(ILI._regs['LCDON'])
-        pyb.delay(10)
-        self._write_cmd(ILI._regs['RAMWR'])
+    # After a reset in sleep out mode SLPOUT has to wait 120 ms (datasheet,
+    # page 90); the configuration goes out meanwhile. A panel reset in sleep
+    # in mode (power on) takes SLPOUT right away.
+    def _initILI(self, awake=True):
+        start = pyb.millis()
+        self._write_table(init_table)
+        if awake:
+            left = 115 - pyb.elapsed_millis(start)  # reset() waited 5 ms
+            if left > 0:
+                pyb.delay(left)
+        self._write_table(wake_table)
+        self._dev.invalidate()
+
+    # Sends (register, parameters, delay) commands, one CS cycle per batch of
+    # commands without delay
+    def _write_table(self, table):
+        dev = self._dev
+        dev.begin()
+        try:
+            for reg, params, ms in table:
+                dev.dc.value(0)
+                dev.bus.spi.send(dev.regs[reg])
+                if params:
+                    dev.dc.value(1)
+                    dev.bus.spi.send(params)
+                if ms:
+                    dev.end()
+                    try:
+                        pyb.delay(ms)
+                    finally:
+                        dev.begin()
+        finally:
+            dev.end()
+
+    # Power mode says booster on, sleep out and display on
+    # RDDPM: 0x80 booster on, 0x10 sleep out, 0x04 display on (0xFF: no
+    # answer on MISO)
+    def _read_mode(self):
+        return self._read(self._dev.regs['RDDPM'], 1)[0]
 
     def _write(self, word, dc, recv, recvsize=2):
         dcs = ['cmd', 'data']
 
         DCX = dcs.index(dc) if dc in dcs else None
-        ILI._csx.low()
-        ILI._dcx.value(DCX)
         if recv:
-            fmt = '>B{0}'.format('B' * recvsize)
-            recv = bytearray(1+recvsize)
-            data = self.spi.send_recv(struct.pack(fmt, word), recv=recv)
-            ILI._csx.high()
-            return data
-
-        ILI._spi.send(word)
-        ILI._csx.high()
+            return self._read(word, recvsize)
+        dev = self._dev
+        dev.begin()
+        try:
+            dev.dc.value(DCX)
+            dev.bus.spi.send(word)
+        finally:
+            dev.end()
+
+    # Read commands: the command goes at the (slower) read baudrate with CS
+    # held low until _end_read(), answer bytes come after a dummy byte.
+    # Callers end the read in a finally clause: a failed read must not leave
+    # the bus held at the read baudrate.
+    def _begin_read(self, cmd):
+        dev = self._dev
+        dev.set_rate(ILI._readrate)
+        dev.begin()
+        try:
+            dev.dc.value(0)
+            dev.bus.spi.send(cmd)
+            dev.dc.value(1)
+            dev.bus.spi.recv(1)
+        except Exception:
+            self._end_read()
+            raise
+
+    def _end_read(self):
+        self._dev.end()
+        self._dev.set_rate(self._dev.rate)
+
+    def _read(self, cmd, nbytes):
+        self._begin_read(cmd)
+        try:
+            return self._dev.bus.spi.recv(nbytes)
+        finally:
+            self._end_read()
 
     def _write_cmd(self, word, recv=None):
         data = self._write(word, 'cmd', recv)
@@ -140,42 +280,59 @@ class ILI:
         words = struct.pack(fmt, *words)
         self._write_data(words)
 
+    # MADCTL is only sent when it changes (cached per panel)
+    def _set_madctl(self, data):
+        dev = self._dev
+        if dev.madctl != data:
+            dev.begin()
+            try:
+                self._write_cmd(self._dev.regs['MADCTL'])   # Memory Access Control
+                self._write_data(data)
+            finally:
+                dev.end()
+            dev.madctl = data
+
     def _graph_orientation(self):
-        self._write_cmd(ILI._regs['MADCTL'])   # Memory Access Control
         # Portrait:
         # | MY=0 | MX=1 | MV=0 | ML=0 | BGR=1 | MH=0 | 0 | 0 |
         # OR Landscape:
         # | MY=0 | MX=0 | MV=1 | ML=0 | BGR=1 | MH=0 | 0 | 0 |
-        data = 0x48 if ILI._portrait else 0x28
-        self._write_data(data)
+        self._set_madctl(0x48 if self._dev.portrait else 0x28)
 
     def _char_orientation(self):
-        self._write_cmd(ILI._regs['MADCTL'])   # Memory Access Control
         # Portrait:
         # | MY=1 | MX=1 | MV=1 | ML=0 | BGR=1 | MH=0 | 0 | 0 |
         # OR Landscape:
         # | MY=0 | MX=1 | MV=1 | ML=0 | BGR=1 | MH=0 | 0 | 0 |
-        data = 0xE8 if ILI._portrait else 0x58
-        self._write_data(data)
+        self._set_madctl(0xE8 if self._dev.portrait else 0x58)
 
     def _image_orientation(self):
-        self._write_cmd(ILI._regs['MADCTL'])   # Memory Access Control
         # Portrait:
         # | MY=0 | MX=1 | MV=0 | ML=0 | BGR=1 | MH=0 | 0 | 0 |
         # OR Landscape:
         # | MY=0 | MX=1 | MV=0 | ML=1 | BGR=1 | MH=0 | 0 | 0 |
-        data = 0xC8 if ILI._portrait else 0x68
-        self._write_data(data)
+        self._set_madctl(0xC8 if self._dev.portrait else 0x68)
 
+    # One CS cycle for the whole window set; column and page ranges already
+    # set on the panel are not sent again
     def _set_window(self, x0, y0, x1, y1):
-        # Column Address Set
-        self._write_cmd(ILI._regs['CASET'])
-        self._write_words(((x0>>8) & 0xFF, x0 & 0xFF, (y0>>8) & 0xFF, y0 & 0xFF))
-        # Page Address Set
-        self._write_cmd(ILI._regs['PASET'])
-        self._write_words(((x1>>8) & 0xFF, x1 & 0xFF, (y1>>8) & 0xFF, y1 & 0xFF))
-        # Memory Write
-        self._write_cmd(ILI._regs['RAMWR'])
+        dev = self._dev
+        dev.begin()
+        try:
+            if dev.cols != (x0, y0):
+                # Column Address Set
+                self._write_cmd(self._dev.regs['CASET'])
+                self._write_words(((x0>>8) & 0xFF, x0 & 0xFF, (y0>>8) & 0xFF, y0 & 0xFF))
+                dev.cols = (x0, y0)
+            if dev.pages != (x1, y1):
+                # Page Address Set
+                self._write_cmd(self._dev.regs['PASET'])
+                self._write_words(((x1>>8) & 0xFF, x1 & 0xFF, (y1>>8) & 0xFF, y1 & 0xFF))
+                dev.pages = (x1, y1)
+            # Memory Write
+            self._write_cmd(self._dev.regs['RAMWR'])
+        finally:
+            dev.end()
 
     def _get_Npix_monoword(self, color):
         if color == WHITE:
@@ -188,14 +345,30 @@ class ILI:
         word = struct.pack('>H', word)
         return word
 
+    # Fill engine: streams the packed word `pixels` times into the current window
+    def _fill_pixels(self, word, pixels, chunk=None):
+        if pixels <= 0:
+            return
+        chunk = chunk or self._dev.fillchunk
+        n = chunk if pixels > chunk else pixels
+        data = word * n
+        self._dev.begin()
+        try:
+            while pixels >= n:
+                self._write_data(data)
+                pixels -= n
+            if pixels:
+                self._write_data(data[:pixels*2])
+        finally:
+            self._dev.end()
+
 class BaseDraw(ILI):
+    _copybuf = None
     def __init__(self, **kwargs):
         super(BaseDraw, self).__init__(**kwargs)
 
     def _set_ortho_line(self, width, length, color):
-        pixels = width * length
-        word = self._get_Npix_monoword(color) * pixels
-        self._write_data(word)
+        self._fill_pixels(self._get_Npix_monoword(color), width * length)
 
     def drawPixel(self, x, y, color, pixels=4):
         if pixels not in [1, 4]:
@@ -206,21 +379,20 @@ class BaseDraw(ILI):
 
     def drawVline(self, x, y, length, color, width=1):
         if length > self.TFTHEIGHT: length = self.TFTHEIGHT
-        if width > 10: width = 10
-        self._set_window(x, x+(width-1), y, y+length)
+        self._set_window(x, x+(width-1), y, y+(length-1))
         self._set_ortho_line(width, length, color)
 
     def drawHline(self, x, y, length, color, width=1):
         if length > self.TFTWIDTH: length = self.TFTWIDTH
-        if width > 10: width = 10
-        self._set_window(x, x+length, y, y+(width-1))
+        self._set_window(x, x+(length-1), y, y+(width-1))
         self._set_ortho_line(width, length, color)
 
     # Method writed by MCHobby https://github.com/mchobby
-    # TODO:
-    # 1. support border > 1
-    def drawLine(self, x, y, x1, y1, color):
-        if x==x1:
+    # width > 1 draws a filled quad, see _draw_thick_line
+    def drawLine(self, x, y, x1, y1, color, width=1, cap=None):
+        if width > 1:
+            self._draw_thick_line(x, y, x1, y1, self._get_Npix_monoword(color), width, cap)
+        elif x==x1:
             self.drawVline( x, y if y<=y1 else y1, abs(y1-y), color )
         elif y==y1:
             self.drawHline( x if x<=x1 else x1, y, abs(x-x1), color )
@@ -262,7 +434,7 @@ class BaseDraw(ILI):
             X, Y = x, y
             for i in range(2):
                 Y = y+height-(border-1) if i == 1 else y
-                self.drawHline(X, Y, width, color, border)
+                self.drawHline(X, Y, width+1, color, border)
 
                 if border > 1:
                     Y = y+1
@@ -280,14 +452,106 @@ class BaseDraw(ILI):
             ysum = y+border
             dborder = border*2
             self._set_window(xsum, xsum+width-dborder, ysum, ysum+height-dborder)
-            pixels = width * 8
+            pixels = (width-dborder+1) * (height-dborder+1)
+            self._fill_pixels(self._get_Npix_monoword(fillcolor), pixels)
+
+    # Reads display memory into buf as RGB565 big endian words, the format
+    # drawing methods send. RAMRD answers 3 bytes (R, G, B) per pixel, read
+    # and converted a few pixels at a time.
+    def readRect(self, x, y, width, height, buf=None, chunk=64):
+        pixels = width * height
+        if buf is None:
+            buf = bytearray(pixels * 2)
+        raw = bytearray(chunk * 3)
+        rawmv = memoryview(raw)
+        self._set_window(x, x+width-1, y, y+height-1)
+        self._begin_read(self._dev.regs['RAMRD'])
+        try:
+            i = 0
+            while i < pixels:
+                n = chunk if pixels - i > chunk else pixels - i
+                self._dev.bus.spi.recv(rawmv[:n*3])
+                for j in range(n):
+                    g = raw[j*3+1]
+                    buf[i*2] = (raw[j*3] & 0xF8) | (g >> 5)
+                    buf[i*2+1] = ((g << 3) & 0xE0) | (raw[j*3+2] >> 3)
+                    i += 1
+        finally:
+            self._end_read()
+        return buf
+
+    # Writes RGB565 big endian words (readRect format) to a region
+    def writeRect(self, x, y, width, height, buf):
+        self._set_window(x, x+width-1, y, y+height-1)
+        self._write_data(memoryview(buf)[:width*height*2])
+
+    # Exact fill of a width x height region with a packed word
+    def _fill_rect(self, x, y, width, height, word):
+        if width > 0 and height > 0:
+            self._set_window(x, x+width-1, y, y+height-1)
+            self._fill_pixels(word, width * height)
+
+    # Band buffer reused by copyRect, allocated at each copy when None
+    def setCopyBuffer(self, buf):
+        BaseDraw._copybuf = buf
+
+    # Copies the src (x, y, width, height) region to dst (x, y) in bands of
+    # rows: RAMRD to a RAM buffer, then RAMWR. Bands are walked bottom up
+    # when moving down, so overlapping regions are copied right.
+    # There is no shadow buffer (a whole screen is 150 KB of RGB565), every
+    # pixel is read back at _readrate: 24 bits at 5.25 MHz plus the RGB565
+    # conversion, about 5 us per pixel against 0.4 us to write it, i.e.
+    # some 100 ms for a 200 x 100 region. Keep copied regions small.
+    def copyRect(self, src, dst):
+        x, y, width, height = src
+        X, Y = dst
+        if width <= 0 or height <= 0:
+            return
+        buf = BaseDraw._copybuf
+        if buf is None or len(buf) < width * 2:
+            buf = bytearray(max(1, 2048 // (width*2)) * width * 2)
+        rows = len(buf) // (width*2)
+        if rows > height:
+            rows = height
+        bands = range(0, height, rows)
+        if Y > y:
+            bands = reversed(bands)
+        for top in bands:
+            n = rows if top + rows <= height else height - top
+            self.readRect(x, y+top, width, n, buf)
+            self.writeRect(X, Y+top, width, n, buf)
+
+    # Scrolls the content of rect (x, y, width, height) by dx, dy pixels.
+    # Only the moved pixels are copied; the exposed strips are filled with
+    # fillcolor (if any) and returned as a list of rects to be drawn.
+    def scrollRect(self, rect, dx, dy, fillcolor=None):
+        x, y, width, height = rect
+        adx, ady = abs(dx), abs(dy)
+        if adx < width and ady < height:
+            self.copyRect((x + (adx if dx < 0 else 0), y + (ady if dy < 0 else 0),
+                           width - adx, height - ady),
+                          (x + (dx if dx > 0 else 0), y + (dy if dy > 0 else 0)))
+        else:
+            adx, ady = min(adx, width), min(ady, height)
+        exposed = list()
+        if ady:
+            exposed.append((x, y if dy > 0 else y + height - ady, width, ady))
+        if adx:
+            Y = y + ady if dy > 0 else y
+            exposed.append((x if dx > 0 else x + width - adx, Y, adx, height - ady))
+        if fillcolor:
+            word = self._get_Npix_monoword(fillcolor)
+            for area in exposed:
+                self._fill_rect(area[0], area[1], area[2], area[3], word)
+        return exposed
 
-            word = self._get_Npix_monoword(fillcolor) * pixels
-            part = 1 if height < 20 else 7
-            i=0
-            while i < (height//part):
-                self._write_data(word)
-                i+=1
+    # Save-under for popups and cursors: keeps the pixels behind a region
+    # before drawing over it, restoreUnder puts them back in one transfer
+    def saveUnder(self, x, y, width, height, buf=None):
+        return (x, y, width, height, self.readRect(x, y, width, height, buf))
+
+    def restoreUnder(self, saved):
+        self.writeRect(*saved)
 
     def fillMonocolor(self, color, margin=0):
         margin = 80 if margin > 80 else margin
@@ -295,15 +559,12 @@ class BaseDraw(ILI):
         height = self.TFTHEIGHT-margin*2
         self.drawRect(margin, margin, width, height, color, border=0)
 
+    # integer trig (see trig.py): no float allocated per degree
     def _get_x_perimeter_point(self, x, degrees, radius):
-        sin = math.sin(math.radians(degrees))
-        x = int(x+(radius*sin))
-        return x
+        return x + (radius * trig.isin(degrees) >> trig.SHIFT)
 
     def _get_y_perimeter_point(self, y, degrees, radius):
-        cos = math.cos(math.radians(degrees))
-        y = int(y-(radius*cos))
-        return y
+        return y - (radius * trig.icos(degrees) >> trig.SHIFT)
 
     def drawCircleFilled(self, x, y, radius, color):
         tempY = 0
@@ -321,7 +582,6 @@ class BaseDraw(ILI):
             tempY = Y
 
     def drawCircle(self, x, y, radius, color, border=1, degrees=360, startangle=0):
-        border = 5 if border > 5 else border
         # adding startangle to degrees
         if startangle > 0:
             degrees += startangle
@@ -330,8 +590,7 @@ class BaseDraw(ILI):
             y = y - border//2
             radius = radius-border//2
         for i in range(startangle, degrees):
-            X = self._get_x_perimeter_point(x, i, radius)
-            Y = self._get_y_perimeter_point(y, i, radius)
+            X, Y = trig.arcPoint(x, y, radius, i)
             if   i == 90:  X = X-1
             elif i == 180: Y = Y-1
             self.drawRect(X, Y, border, border, color, border=0)
@@ -349,24 +608,416 @@ class BaseDraw(ILI):
                 self.drawHline(xNeg, Y, length-xNeg, color, width=4)
             tempY = Y
 
-class BaseChars(ILI, BaseDraw):
+    # One scanline span, x0..x1 included, clipped to the screen
+    def _fill_span(self, x0, x1, y, word):
+        if y < 0 or y >= self.TFTHEIGHT:
+            return
+        if x0 < 0: x0 = 0
+        if x1 >= self.TFTWIDTH: x1 = self.TFTWIDTH-1
+        if x1 >= x0:
+            self._set_window(x0, x1, y, y)
+            self._fill_pixels(word, x1-x0+1)
+
+    # Polygons are filled by pixel centers: a pixel is drawn when its center
+    # is inside, so adjacent polygons sharing an edge never overlap. Edges are
+    # exact integer DDAs sampled at y + 0.5: the first column right of the
+    # edge is ceil(x - 0.5) = -(-num // den), and num steps by 4*dx per row.
+    @staticmethod
+    def _edge(x0, y0, x1, y1):
+        dy = y1 - y0
+        return [y1, 4*x0*dy + 2*(x1 - x0) - 2*dy, 4*(x1 - x0), 4*dy]
+
+    @staticmethod
+    def _is_convex(points):
+        # same turn at every vertex and x, y each change direction only twice
+        # (the latter rules out self-intersecting stars)
+        sign = 0
+        xflips = yflips = 0
+        xdir = ydir = 0
+        n = len(points)
+        for i in range(n):
+            x0, y0 = points[i]
+            x1, y1 = points[(i+1) % n]
+            x2, y2 = points[(i+2) % n]
+            cross = (x1-x0)*(y2-y1) - (y1-y0)*(x2-x1)
+            if cross:
+                if sign and (cross > 0) != (sign > 0):
+                    return False
+                sign = cross
+            dx, dy = x1 - x0, y1 - y0
+            if dx:
+                if xdir and (dx > 0) != (xdir > 0): xflips += 1
+                xdir = dx
+            if dy:
+                if ydir and (dy > 0) != (ydir > 0): yflips += 1
+                ydir = dy
+        return xflips <= 2 and yflips <= 2
+
+    # Convex fast path: one span per scanline between the two chains of
+    # edges going down from the top vertex, no edge table and no sorting
+    def _fill_convex(self, points, word):
+        n = len(points)
+        top = bottom = 0
+        for i in range(n):
+            if points[i][1] < points[top][1]: top = i
+            if points[i][1] > points[bottom][1]: bottom = i
+        ytop, ybottom = points[top][1], points[bottom][1]
+        chains = list()
+        for step in (1, -1):
+            edges = list()
+            i = top
+            while i != bottom:
+                j = (i + step) % n
+                x0, y0 = points[i]
+                x1, y1 = points[j]
+                if y1 > y0:
+                    edges.append(self._edge(x0, y0, x1, y1))
+                i = j
+            chains.append(edges)
+        a, b = chains
+        ea = eb = 0
+        for y in range(ytop, ybottom):
+            while a[ea][0] <= y: ea += 1
+            while b[eb][0] <= y: eb += 1
+            e, f = a[ea], b[eb]
+            xa, xb = -(-e[1] // e[3]), -(-f[1] // f[3])
+            if xa > xb: xa, xb = xb, xa
+            self._fill_span(xa, xb - 1, y, word)
+            e[1] += e[2]
+            f[1] += f[2]
+
+    # Active edge table scanline fill (even-odd rule): one span per pair of
+    # edges crossing each scanline
+    def _fill_edges(self, points, word):
+        n = len(points)
+        table = list()
+        for i in range(n):
+            x0, y0 = points[i]
+            x1, y1 = points[(i+1) % n]
+            if y0 == y1:
+                continue
+            if y0 > y1:
+                x0, y0, x1, y1 = x1, y1, x0, y0
+            table.append((y0, self._edge(x0, y0, x1, y1)))
+        if not table:
+            return
+        table.sort(key=lambda e: e[0])
+        active = list()
+        y = table[0][0]
+        i = 0
+        while i < len(table) or active:
+            while i < len(table) and table[i][0] == y:
+                active.append(table[i][1])
+                i += 1
+            active = [e for e in active if e[0] > y]
+            xs = sorted(-(-e[1] // e[3]) for e in active)
+            for j in range(0, len(xs)-1, 2):
+                self._fill_span(xs[j], xs[j+1] - 1, y, word)
+            for e in active:
+                e[1] += e[2]
+            y += 1
+            if not active and i < len(table):
+                y = table[i][0]
+
+    def fillPolygon(self, points, color):
+        if len(points) < 3:
+            return
+        word = self._get_Npix_monoword(color)
+        if self._is_convex(points):
+            self._fill_convex(points, word)
+        else:
+            self._fill_edges(points, word)
+
+    def fillTriangle(self, x0, y0, x1, y1, x2, y2, color):
+        self._fill_convex(((x0, y0), (x1, y1), (x2, y2)), self._get_Npix_monoword(color))
+
+    def drawPolygon(self, points, color):
+        n = len(points)
+        for i in range(n):
+            x0, y0 = points[i]
+            x1, y1 = points[(i+1) % n]
+            self.drawLine(x0, y0, x1, y1, color)
+
+    # One scanline span of ready-made pixels (big endian RGB565) from x0
+    def _write_span(self, x0, y, data):
+        if y < 0 or y >= self.TFTHEIGHT:
+            return
+        x1 = x0 + len(data)//2 - 1
+        if x0 < 0:
+            data = data[-x0*2:]
+            x0 = 0
+        if x1 >= self.TFTWIDTH:
+            data = data[:(self.TFTWIDTH-x0)*2]
+            x1 = self.TFTWIDTH-1
+        if x1 >= x0:
+            self._set_window(x0, x1, y, y)
+            self._write_data(data)
+
+    # Half width of row dy: round(sqrt(r*r - dy*dy)), the largest dx with
+    # dx*dx - dx < r*r - dy*dy, followed down from r with integers only
+    def _fill_disc(self, x, y, radius, word):
+        dx = radius
+        for dy in range(radius+1):
+            m = radius*radius - dy*dy
+            while dx > 0 and dx*dx - dx >= m:
+                dx -= 1
+            self._fill_span(x-dx, x+dx, y+dy, word)
+            if dy:
+                self._fill_span(x-dx, x+dx, y-dy, word)
+
+    # Thick line: the rectangle around the segment is a convex quad, filled
+    # one span per scanline. cap: None (butt, both end pixels included, as
+    # in drawHline), 'square' (extends the ends by width/2) or 'round'.
+    # Corners are computed in 1/64 pixels: integers only, small enough to
+    # stay MicroPython small ints on screen.
+    def _draw_thick_line(self, x, y, x1, y1, word, width, cap):
+        dx, dy = x1 - x, y1 - y
+        if not (dx or dy):
+            if cap == 'round':
+                self._fill_disc(x, y, width//2, word)
+            else:
+                self._fill_rect(x - width//2, y - width//2, width, width, word)
+            return
+        length = trig.isqrt((dx*dx + dy*dy) << 12)     # in 1/64 pixels
+        X, Y, X1, Y1 = x << 6, y << 6, x1 << 6, y1 << 6
+        if cap != 'round':
+            # half a pixel more at each end: the end pixel centers are inside
+            ext = 32*(width + 1) if cap == 'square' else 32    # width/2 + 0.5, 0.5
+            ex, ey = (dx*ext << 6) // length, (dy*ext << 6) // length
+            X, Y, X1, Y1 = X - ex, Y - ey, X1 + ex, Y1 + ey
+        # half width offset perpendicular to the line, measured to pixel
+        # centers (hence the + 32, half a pixel)
+        ox, oy = (-dy*width << 11) // length, (dx*width << 11) // length
+        quad = list()
+        for px, py, sx, sy in ((X, Y, 1, 1), (X1, Y1, 1, 1), (X1, Y1, -1, -1), (X, Y, -1, -1)):
+            quad.append(((px + 32 + sx*ox) >> 6, (py + 32 + sy*oy) >> 6))
+        self._fill_convex(quad, word)
+        if cap == 'round':
+            self._fill_disc(int(x), int(y), width//2, word)
+            self._fill_disc(int(x1), int(y1), width//2, word)
+
+    # Wu line blend tables: 16 coverage levels from background to color,
+    # packed words ready for the bus, built once per color pair
+    _blendtables = dict()
+
+    def _blend_table(self, color, background):
+        key = (color, background)
+        table = BaseDraw._blendtables.get(key)
+        if table is None:
+            if len(BaseDraw._blendtables) >= 8:
+                BaseDraw._blendtables.clear()
+            table = list()
+            for level in range(16):
+                mix = tuple(b + (c - b)*level//15 for c, b in zip(color, background))
+                table.append(self._get_Npix_monoword(mix))
+            BaseDraw._blendtables[key] = table
+        return table
+
+    # Anti-aliased thin line (Xiaolin Wu). Coverage is blended against the
+    # given background color. Each pixel pair goes out as a span: along x,
+    # columns sharing a row are merged into one span per row.
+    def drawLineAA(self, x, y, x1, y1, color, background=BLACK):
+        table = self._blend_table(color, background)
+        steep = abs(y1 - y) > abs(x1 - x)
+        if steep:
+            x, y, x1, y1 = y, x, y1, x1
+        if x1 < x:
+            x, y, x1, y1 = x1, y1, x, y
+        dx, dy = x1 - x, y1 - y
+        gradient = (dy << 16) // dx if dx else 0
+        inter = (y << 16) + 0x8000      # y + 0.5: rows are split at centers
+        if steep:
+            for row in range(x, x1+1):
+                pos = inter - 0x8000
+                f = (pos >> 12) & 0xF
+                self._write_span(pos >> 16, row, table[15-f] + table[f])
+                inter += gradient
+            return
+        start = x
+        upper, lower = bytearray(), bytearray()
+        current = (inter - 0x8000) >> 16
+        for col in range(x, x1+1):
+            pos = inter - 0x8000
+            if pos >> 16 != current:
+                self._write_span(start, current, upper)
+                self._write_span(start, current+1, lower)
+                upper, lower = bytearray(), bytearray()
+                start, current = col, pos >> 16
+            f = (pos >> 12) & 0xF
+            upper += table[15-f]
+            lower += table[f]
+            inter += gradient
+        self._write_span(start, current, upper)
+        self._write_span(start, current+1, lower)
+
+    # Batch primitives: coordinates come as flat sequences (lists, tuples or
+    # array('h')), are clipped, sorted by row and merged into spans. Rows
+    # repeating the same span are sent as one window.
+    def _fill_spans(self, spans, word):
+        # spans: sorted (y, x0, x1) tuples, x1 included
+        run = None
+        for y, x0, x1 in spans:
+            if run and run[0] + run[3] == y and run[1] == x0 and run[2] == x1:
+                run[3] += 1
+                continue
+            if run:
+                self._fill_rect(run[1], run[0], run[2]-run[1]+1, run[3], word)
+            run = [y, x0, x1, 1]
+        if run:
+            self._fill_rect(run[1], run[0], run[2]-run[1]+1, run[3], word)
+
+    @staticmethod
+    def _merge_spans(spans):
+        spans.sort()
+        merged = list()
+        for y, x0, x1 in spans:
+            if merged:
+                Y, X0, X1 = merged[-1]
+                if Y == y and x0 <= X1 + 1:
+                    if x1 > X1:
+                        merged[-1] = (y, X0, x1)
+                    continue
+            merged.append((y, x0, x1))
+        return merged
+
+    def drawPixels(self, coords, color, pixels=4):
+        # coords: x0, y0, x1, y1, ... points of drawPixel: 2x2 pixels, or a
+        # single one with pixels=1
+        if pixels not in [1, 4]:
+            raise ValueError("Pixels count must be 1 or 4")
+        side = 2 if pixels == 4 else 1
+        W, H = self.TFTWIDTH, self.TFTHEIGHT
+        keys = list()
+        for i in range(0, len(coords)-1, 2):
+            x, y = coords[i], coords[i+1]
+            for Y in range(y, y+side):
+                for X in range(x, x+side):
+                    if 0 <= X < W and 0 <= Y < H:
+                        keys.append((Y << 9) | X)
+        keys.sort()
+        spans = list()
+        last = -2
+        for key in keys:
+            if key == last + 1 and key & 0x1FF:
+                spans[-1][2] = key & 0x1FF
+            elif key != last:
+                spans.append([key >> 9, key & 0x1FF, key & 0x1FF])
+            last = key
+        self._fill_spans([tuple(s) for s in spans], self._get_Npix_monoword(color))
+
+    def drawHlines(self, coords, color):
+        # coords: x, y, length, ... for each line
+        W, H = self.TFTWIDTH, self.TFTHEIGHT
+        spans = list()
+        for i in range(0, len(coords)-2, 3):
+            x, y, length = coords[i], coords[i+1], coords[i+2]
+            x0, x1 = max(x, 0), min(x + length - 1, W-1)
+            if 0 <= y < H and x1 >= x0:
+                spans.append((y, x0, x1))
+        self._fill_spans(self._merge_spans(spans), self._get_Npix_monoword(color))
+
+    def drawRects(self, coords, color):
+        # coords: x, y, width, height, ... for each filled rectangle. Each
+        # one is a single window; rectangles side by side on the same rows
+        # (bars of a chart) are merged.
+        W, H = self.TFTWIDTH, self.TFTHEIGHT
+        rects = list()
+        for i in range(0, len(coords)-3, 4):
+            x, y, width, height = coords[i], coords[i+1], coords[i+2], coords[i+3]
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + width, W), min(y + height, H)
+            if x1 > x0 and y1 > y0:
+                rects.append((y0, y1, x0, x1))
+        rects.sort()
+        word = self._get_Npix_monoword(color)
+        run = None
+        for y0, y1, x0, x1 in rects:
+            if run and run[0] == y0 and run[1] == y1 and x0 <= run[3]:
+                if x1 > run[3]: run[3] = x1
+                continue
+            if run:
+                self._fill_rect(run[2], run[0], run[3]-run[2], run[1]-run[0], word)
+            run = [y0, y1, x0, x1]
+        if run:
+            self._fill_rect(run[2], run[0], run[3]-run[2], run[1]-run[0], word)
+
+    @staticmethod
+    def _mix(c0, c1, i, n):
+        # color i of n steps from c0 to c1 (RGB565 tuples)
+        if n < 2:
+            return c0
+        return tuple(a + (b - a)*i//(n - 1) for a, b in zip(c0, c1))
+
+    # Vertical gradients (color changing with y) go out as solid bands, one
+    # window per distinct color. Horizontal ones compute a single row and
+    # send it for every line of one window.
+    def fillGradient(self, rect, c0, c1, direction='vertical'):
+        x, y, width, height = rect
+        if width <= 0 or height <= 0:
+            return
+        if direction == 'vertical':
+            start, word = 0, None
+            for i in range(height + 1):
+                w = self._get_Npix_monoword(self._mix(c0, c1, i, height)) if i < height else None
+                if w != word:
+                    if word is not None:
+                        self._fill_rect(x, y+start, width, i-start, word)
+                    start, word = i, w
+        elif direction == 'horizontal':
+            row = bytearray()
+            for i in range(width):
+                row += self._get_Npix_monoword(self._mix(c0, c1, i, width))
+            # several rows per transfer, as many as the fill chunk holds
+            k = max(1, self._dev.fillchunk // width)
+            block = row * min(k, height)
+            self._set_window(x, x+width-1, y, y+height-1)
+            while height >= k:
+                self._write_data(block)
+                height -= k
+            if height:
+                self._write_data(block[:height*width*2])
+        else:
+            raise ValueError("direction must be 'vertical' or 'horizontal'")
+
+    # Tiles the rect with tile, tilewidth pixels wide (RGB565 big endian, as
+    # returned by readRect). Each tile row is expanded once to the rect width.
+    def fillPattern(self, rect, tile, tilewidth):
+        x, y, width, height = rect
+        tileheight = len(tile) // (tilewidth*2)
+        if width <= 0 or height <= 0 or not tileheight:
+            return
+        reps = width // tilewidth + 1
+        rows = list()
+        for r in range(tileheight):
+            line = bytes(tile[r*tilewidth*2:(r+1)*tilewidth*2]) * reps
+            rows.append(line[:width*2])
+        self._set_window(x, x+width-1, y, y+height-1)
+        for i in range(height):
+            self._write_data(rows[i % tileheight])
+
+class BaseChars(BaseDraw):
     def __init__(self, color=BLACK, font=None, bgcolor=WHITE, scale=1,
                 bctimes=7, **kwargs):
         super(BaseChars, self).__init__(**kwargs)
         self._fontColor = color
-        if font:
-            self._font = font
-        else:
-            raise ValueError("""Font not defined. Define font using argument:
-                lcd.initCh(font=fontname, **kwargs)""")
+        self._font = font
         self._bgcolor = bgcolor
         self._fontscale = scale
-        self._bctimes = bctimes    # blink carriage times
+        self._bctimes = bctimes    # blink carriage times, see renderqueue.blink
 
     def initCh(self, **kwargs):
-        ch = BaseChars(portrait=ILI._portrait, **kwargs)
+        if not kwargs.get('font'):
+            raise ValueError("""Font not defined. Define font using argument:
+                lcd.initCh(font=fontname, **kwargs)""")
+        ch = BaseChars(device=self._dev, **kwargs)
         return ch
 
+    def initConsole(self, **kwargs):
+        if not kwargs.get('font'):
+            raise ValueError("""Font not defined. Define font using argument:
+                lcd.initConsole(font=fontname, **kwargs)""")
+        return Console(device=self._dev, **kwargs)
+
     @staticmethod
     @micropython.asm_thumb
     def _asm_get_charpos(r0, r1, r2):
@@ -384,14 +1035,18 @@ class BaseChars(ILI, BaseDraw):
         self._set_window(x, x+(height*scale)-1, y, y+(width*scale)-1)
         bgpixel = self._get_Npix_monoword(bgcolor) * scale
         pixel = self._get_Npix_monoword(color) * scale
-        words = ''.join(map(self._set_word_length, data))
-        words = bytes(words, 'ascii').replace(b'0', bgpixel).replace(b'1', pixel)
+        words = bytes(''.join(map(self._set_word_length, data)), 'ascii')
+        # runs of background between the set bits: the pixel bytes are never
+        # scanned again, whatever the colors are
+        words = pixel.join([bgpixel * len(run) for run in words.split(b'1')])
         self._write_data(words)
 
     def printChar(self, char, x, y, cont=False, scale=None):
         if not scale:
             scale = self._fontscale
         font = self._font
+        if self._dev.recording is not None:
+            self._dev.recording.font(font)
         scale = 3 if scale > 3 else scale
         index = ord(char)
         chrwidth = len(font[index])
@@ -424,37 +1079,119 @@ class BaseChars(ILI, BaseDraw):
                     chpos = scale+1 if scale > 2 else scale-1
                 x += self._asm_get_charpos(chrwidth, chpos, 3)
             x += self._asm_get_charpos(len(font[32]), chpos, 3)
-        if bc:                                                    # blink carriage
-            if (x + 2 * scale) >= (self.TFTWIDTH - 10):
-                x = X
-                y += (font['height']+2) * scale
-            else:
-                x -= 4 * scale//2
-            self._blinkCarriage(x, y, scale=scale)
+        if (x + 2 * scale) >= (self.TFTWIDTH - 10):
+            x = X
+            y += (font['height']+2) * scale
+        else:
+            x -= 4 * scale//2
+        if bc:                                                    # carriage
+            self._drawCarriage(x, y, scale=scale)
+        return x, y     # carriage position, see renderqueue.RenderQueue.blink
 
-    # Blinking rectangular carriage on the end of line
-    def _blinkCarriage(self, x, y, scale=None):
+    def _carriage_size(self, scale=None):
         if not scale:
             scale = self._fontscale
+        scale = 3 if scale > 3 else scale
+        return 2 * scale, self._font['height'] * scale
+
+    # Rectangular carriage on the end of line: it blinks as a cooperative
+    # task, see renderqueue.RenderQueue.blink
+    def _drawCarriage(self, x, y, scale=None):
+        width, height = self._carriage_size(scale)
+        self.drawVline(x, y, height, self._fontColor, width=width)
+
+# Text console scrolled by the ILI9341 itself (portrait mode only).
+# Lines are written at the frame memory rows of the oldest line, then the
+# vertical scrolling start address moves one line forward: a new line costs
+# one line of bus traffic whatever the console height.
+#    top, bottom: rows of the fixed (not scrolled) areas
+class Console(BaseChars):
+    def __init__(self, top=0, bottom=0, margin=2, **kwargs):
+        super(Console, self).__init__(**kwargs)
+        if not self._dev.portrait:
+            raise ValueError('Hardware vertical scrolling needs portrait mode')
+        scale = 3 if self._fontscale > 3 else self._fontscale
+        self._scale = scale
+        self._lineheight = (self._font['height']+2) * scale
+        self._lines = (self.TFTHEIGHT - top - bottom) // self._lineheight
+        self._top = top
+        self._vsa = self._lines * self._lineheight
+        self._margin = margin
+        self._count = 0     # lines written
+        self._offset = 0    # scroll offset in the scrolled area (rows)
+        self._set_scroll_area(top, self._vsa, self.TFTHEIGHT - top - self._vsa)
+        self.clear()
+
+    def _set_scroll_area(self, tfa, vsa, bfa):
+        self._write_cmd(self._dev.regs['VSCRDEF'])
+        self._write_words((tfa >> 8, tfa & 0xFF, vsa >> 8, vsa & 0xFF, bfa >> 8, bfa & 0xFF))
+
+    def _set_scroll_start(self, row):
+        self._write_cmd(self._dev.regs['VSCRSADD'])
+        self._write_words((row >> 8, row & 0xFF))
+
+    def _clear_rows(self, y, height):
+        self._set_window(0, self.TFTWIDTH-1, y, y+height-1)
+        self._fill_pixels(self._get_Npix_monoword(self._bgcolor), self.TFTWIDTH * height)
+
+    def clear(self):
+        self._count = 0
+        self._offset = 0
+        self._set_scroll_start(self._top)
+        self._clear_rows(self._top, self._vsa)
+
+    # Restores the whole screen as scrolled area, without offset
+    def close(self):
+        self._set_scroll_area(0, self.TFTHEIGHT, 0)
+        self._set_scroll_start(0)
+
+    def _print_line(self, line, y):
         font = self._font
-        bgcolor = self._bgcolor
-        color = self._fontColor
-        times = self._bctimes
-        height = font['height'] * scale
-        width = 2 * scale
-        i = 0
-        while i != times:
-            self.drawVline(x, y, height, color, width=width)
-            pyb.delay(500)
-            self.drawVline(x, y, height, bgcolor, width=width)
-            pyb.delay(500)
-            i+=1
+        scale = self._scale
+        x = self._margin
+        for char in line:
+            chrwidth = len(font[ord(char)])
+            if x + chrwidth * scale >= self.TFTWIDTH:
+                break
+            chpos = scale-(scale//2)
+            if chrwidth == 1:
+                chpos = scale+1 if scale > 2 else scale-1
+            if chrwidth:
+                self.printChar(char, x, y + scale, cont=True, scale=scale)
+            x += self._asm_get_charpos(chrwidth, chpos, 3)
+        self._graph_orientation()
 
+    # Appends text lines ('\n' separated) at the bottom of the console,
+    # text longer than the screen width is cut
+    def write(self, text):
+        for line in text.split('\n'):
+            if self._count < self._lines:
+                y = self._top + self._count * self._lineheight
+                self._count += 1
+            else:
+                y = self._top + self._offset
+                self._offset = (self._offset + self._lineheight) % self._vsa
+                self._clear_rows(y, self._lineheight)
+            self._print_line(line, y)
+            if self._count == self._lines:
+                self._set_scroll_start(self._top + self._offset)
 
-class BaseImages(ILI):
 
+class BaseImages(ILI):
     def __init__(self, **kwargs):
         super(BaseImages, self).__init__(**kwargs)
+        self._atlas = None          # [file, index] of the open sprite atlas
+        self._pipebufs = None
+        # RAM cache of decoded images:
+        # filename -> [buffer, width, height, last use, pinned, source stamp]
+        self._ramcache = dict()
+        self._ramcache_budget  = 0  # bytes, 0 disables the RAM cache
+        self._ramcache_maxsize = 0  # larger images are never kept in RAM
+        self._ramcache_used = 0
+        self._ramcache_tick = 0
+        self._ramcache_hits = 0
+        self._ramcache_misses = 0
+        self._ramcache_sizes = dict()   # filename -> (bytes, stamp) of the images too large
 
     # solution from forum.micropython.org
     # Need to be understandet
@@ -481,6 +1218,11 @@ class BaseImages(ILI):
             headers.append(struct.unpack('<H', f.read(2))[0])    # read double byte
         return headers
 
+    # .cache and .rle header: width and height, each one followed by b'\n'
+    def _set_cache_headers(self, f):
+        head = f.read(6)
+        return struct.unpack('<H', head[0:2])[0], struct.unpack('<H', head[3:5])[0]
+
     def _get_image_points(self, pos, width, height):
         if isinstance(pos, (list, tuple)):
             x, y = pos
@@ -489,91 +1231,421 @@ class BaseImages(ILI):
             y = 0 if height == self.TFTHEIGHT else (self.TFTHEIGHT-height)//2
         return x, y
 
+    def _set_image_window(self, pos, width, height):
+        if width < self.TFTWIDTH:
+            width -= 1
+        x, y = self._get_image_points(pos, width, height)
+        self._set_window(x, (width)+x, y, (height)+y)
+
     # Using in renderBmp method
     def _render_bmp_image(self, filename, pos):
         path = 'images/'
-        memread = 480
+        memread = self._dev.imgchunk
         with open(path + filename, 'rb') as f:
             startbit, width, height = self._set_image_headers(f)
-            if width < self.TFTWIDTH:
-                width -= 1
-            x, y = self._get_image_points(pos, width, height)
-            self._set_window(x, (width)+x, y, (height)+y)
+            self._set_image_window(pos, width, height)
             f.seek(startbit)
-            while True:
-                try:
-                    data = bytearray(f.read(memread))
-                    self._reverse(data, len(data))
-                    self._write_data(data)
-                except OSError: break
+            self._stream_file(f, swap=True, memread=memread)
 
     # Using in renderBmp method
     def _render_bmp_cache(self, filename, pos):
         filename = filename + '.cache'
-        startbit = 8
-        memread = 512
-        with open(imgcachedir + '/' + filename, 'rb') as f:
-            width = struct.unpack('H', f.readline())[0]
-            height = struct.unpack('H', f.readline())[0]
-            if width < self.TFTWIDTH:
-                width -= 1
-            x, y = self._get_image_points(pos, width, height)
-            self._set_window(x, (width)+x, y, (height)+y)
+        startbit = 6                    # after the cache header
+        memread = self._dev.imgchunk
+        with open(_cache_dir() + '/' + filename, 'rb') as f:
+            width, height = self._set_cache_headers(f)
+            self._set_image_window(pos, width, height)
             f.seek(startbit)
-            while True:
-                try:
-                    self._write_data(f.read(memread))
-                except OSError: break
+            self._stream_file(f, memread=memread)
+
+    # Using in renderBmp method
+    # long runs go to the fill engine, literals are streamed as they are
+    def _render_bmp_rle(self, filename, pos):
+        with open(_cache_dir() + '/' + filename + '.rle', 'rb') as f:
+            width, height = self._set_cache_headers(f)
+            self._set_image_window(pos, width, height)
+            rle.expand(f, self._fill_pixels, self._write_data, self._dev.imgchunk)
+
+    # Decodes an image to a RAM buffer from the best available source
+    def _load_image(self, filename, maxsize, stamp=None):
+        cache = os.listdir(_cache_dir())
+        if filename + '.rle' in cache:
+            f = open(_cache_dir() + '/' + filename + '.rle', 'rb')
+            width, height = self._set_cache_headers(f)
+            startbit = None
+        elif filename + '.cache' in cache:
+            f = open(_cache_dir() + '/' + filename + '.cache', 'rb')
+            width, height = self._set_cache_headers(f)
+            startbit = 6                    # after the cache header
+        else:
+            f = open('images/' + filename, 'rb')
+            startbit, width, height = self._set_image_headers(f)
+        with f:
+            size = width * height * 2
+            if size > maxsize:
+                self._ramcache_sizes[filename] = (size, stamp)
+                return None
+            buf = bytearray(size)
+            mv = memoryview(buf)
+            if startbit is None:
+                pos = [0]
+                def fill(word, pixels):
+                    mv[pos[0]:pos[0]+pixels*2] = word * pixels
+                    pos[0] += pixels*2
+                def data(chunk):
+                    n = min(len(chunk), size-pos[0])
+                    mv[pos[0]:pos[0]+n] = chunk[:n]
+                    pos[0] += n
+                rle.expand(f, fill, data)
+            else:
+                f.seek(startbit)
+                f.readinto(buf)
+                if filename + '.cache' not in cache:
+                    self._reverse(buf, size)
+        return [buf, width, height, 0, False, stamp]
+
+    # (size, mtime) of the source image: its RAM copy (and the size noted
+    # when too large) is stale once it changes
+    @staticmethod
+    def _image_stamp(filename):
+        try:
+            st = os.stat('images/' + filename)
+        except OSError:
+            return None
+        return (st[6], st[8])
+
+    # Frees unpinned images, least recently used first, until size bytes fit
+    def _ramcache_evict(self, size):
+        cache = self._ramcache
+        while self._ramcache_used + size > self._ramcache_budget:
+            lru = None
+            for name, entry in cache.items():
+                if not entry[4] and (lru is None or entry[3] < cache[lru][3]):
+                    lru = name
+            if lru is None:
+                return False
+            self._ramcache_used -= len(cache.pop(lru)[0])
+        return True
+
+    # Returns the RAM entry of an image, loading it on a miss when it fits
+    def _ramcache_get(self, filename, load=True):
+        cache = self._ramcache
+        self._ramcache_tick += 1
+        stamp = self._image_stamp(filename)
+        entry = cache.get(filename)
+        if entry and entry[5] != stamp:
+            self._ramcache_drop(filename)   # the image file changed
+            entry = None
+        if entry:
+            self._ramcache_hits += 1
+        else:
+            self._ramcache_misses += 1
+            if not load:
+                return None
+            known = self._ramcache_sizes.get(filename)
+            if known and known[1] == stamp and known[0] > self._ramcache_maxsize:
+                return None         # known too large: not opened again
+            try:
+                entry = self._load_image(filename, self._ramcache_maxsize, stamp)
+            except MemoryError:
+                entry = None
+            if not entry or not self._ramcache_evict(len(entry[0])):
+                return None
+            cache[filename] = entry
+            self._ramcache_used += len(entry[0])
+        entry[3] = self._ramcache_tick
+        return entry
+
+    # Forgets the RAM copy of an image whose cache file is rewritten or removed
+    def _ramcache_drop(self, filename):
+        entry = self._ramcache.pop(filename, None)
+        if entry:
+            self._ramcache_used -= len(entry[0])
+        self._ramcache_sizes.pop(filename, None)
+
+    # Keeps decoded images up to maxsize bytes (default: budget/4) in RAM,
+    # using at most budget bytes. setRamCache(0) frees the whole cache.
+    def setRamCache(self, budget, maxsize=None):
+        self._ramcache_budget = budget
+        self._ramcache_maxsize = budget//4 if maxsize is None else maxsize
+        if not budget:
+            self._ramcache.clear()
+            self._ramcache_sizes.clear()
+            self._ramcache_used = 0
+        else:
+            self._ramcache_evict(0)
+
+    # Pinned images stay in RAM whatever the LRU order is
+    def pinImage(self, filename, pinned=True):
+        if pinned:
+            maxsize = self._ramcache_maxsize
+            self._ramcache_maxsize = self._ramcache_budget
+            entry = self._ramcache_get(filename)
+            self._ramcache_maxsize = maxsize
+            if not entry:
+                raise MemoryError('Image does not fit in RAM cache: ' + filename)
+            entry[4] = True
+        elif filename in self._ramcache:
+            self._ramcache[filename][4] = False
+
+    def ramCacheStats(self):
+        hits = self._ramcache_hits
+        lookups = hits + self._ramcache_misses
+        return dict(hits=hits, misses=self._ramcache_misses,
+                    hitrate=hits/lookups if lookups else 0,
+                    used=self._ramcache_used,
+                    budget=self._ramcache_budget,
+                    images=len(self._ramcache))
 
     # TODO:
     # 1. resize large images to screen resolution
     # 2. if part of image goes out of the screen, must to be rendered
     # only displayed part
     def renderBmp(self, filename, pos=None, cached=True, bgcolor=None):
+        if self._dev.recording is not None:
+            self._dev.recording.depend('images/' + filename)
         self._image_orientation()
         if bgcolor:
             self.fillMonocolor(bgcolor)
-        if filename + '.cache' not in os.listdir('images/cache'):
-            cached = False
-        if cached:
-            self._render_bmp_cache(filename, pos)
-        else:
+        entry = None
+        if cached and self._ramcache_budget:
+            entry = self._ramcache_get(filename)
+        if entry:
+            buf, width, height = entry[:3]
+            self._set_image_window(pos, width, height)
+            self._write_data(buf)
+        elif cached:
+            cache = os.listdir(_cache_dir())
+            if filename + '.rle' in cache:
+                self._render_bmp_rle(filename, pos)
+            elif filename + '.cache' in cache:
+                self._render_bmp_cache(filename, pos)
+            else:
+                cached = False
+        if not cached:
             self._render_bmp_image(filename, pos)
         self._graph_orientation()
 
     def clearImageCache(self, path):
+        self.closeAtlas()
         for obj in os.listdir(path):
-            if obj.endswith('.cache'):
+            if obj.endswith('.cache') or obj.endswith('.rle') or obj.endswith('.atlas') \
+                    or obj.endswith('.rec'):
                 os.remove(path + '/' + obj)
+                self._ramcache_drop(obj.rsplit('.', 1)[0])
+
+    # Two reusable buffers for _stream_file, only one when RAM is short
+    def _pipe_buffers(self, size):
+        bufs = self._pipebufs
+        if not bufs or len(bufs[0]) < size:
+            self._pipebufs = None
+            bufs = [memoryview(bytearray(size))]
+            try:
+                bufs.append(memoryview(bytearray(size)))
+            except MemoryError: pass
+            self._pipebufs = bufs
+        return bufs
+
+    # Streams pixels from the current file position to RAMWR, up to nbytes
+    # or to the end of file, swapping bytes of BMP data when swap is set.
+    # Double buffered: when the SPI object can send without blocking
+    # (send_async + wait, modelled by the host stand-in) the next buffer is
+    # read while the previous one is on the bus. pyb.SPI.send blocks, and
+    # with a single buffer the transfers are sequential.
+    def _stream_file(self, f, nbytes=None, swap=False, memread=None):
+        memread = memread or self._dev.imgchunk
+        bufs = self._pipe_buffers(memread)
+        dev = self._dev
+        spi = dev.bus.spi
+        send = getattr(spi, 'send_async', None) if len(bufs) > 1 else None
+        dev.begin()
+        try:
+            dev.dc.value(1)
+            i = 0
+            while nbytes is None or nbytes > 0:
+                buf = bufs[i][:memread if nbytes is None or nbytes >= memread else nbytes]
+                n = f.readinto(buf)
+                if not n: break
+                if swap:
+                    self._reverse(buf, n)
+                if send:
+                    send(buf[:n])
+                else:
+                    spi.send(buf[:n])
+                if nbytes is not None:
+                    nbytes -= n
+                i = (i + 1) % len(bufs)
+            if send:
+                spi.wait()
+        finally:
+            dev.end()
+
+    # Atlas file (images/cache/<name>.atlas):
+    #    sprites count ('<H'), then for every sprite its name length ('B'),
+    #    name, pixels offset ('<I'), width and height ('<H'),
+    #    then the pixels of all sprites (RGB565 big endian, BMP rows order).
+    # Sprite name is the image file name without the '.bmp' extension.
+    def buildAtlas(self, name, images, path='images'):
+        sprites = list()
+        for image in images:
+            with open(path + '/' + image, 'rb') as f:
+                startbit, width, height = self._set_image_headers(f)
+            sprite = image[:-4] if image.endswith('.bmp') else image
+            sprites.append((sprite, image, startbit, width, height))
+        offset = 2
+        for sprite in sprites:
+            offset += 1 + len(sprite[0]) + 8
+        self.closeAtlas()
+        with open(_cache_dir() + '/' + name + '.atlas', 'wb') as c:
+            c.write(struct.pack('<H', len(sprites)))
+            for sprite, image, startbit, width, height in sprites:
+                c.write(struct.pack('<B', len(sprite)) + sprite.encode())
+                c.write(struct.pack('<IHH', offset, width, height))
+                offset += width * height * 2
+            for sprite, image, startbit, width, height in sprites:
+                rowsize = width * 2
+                row = bytearray(rowsize)
+                with open(path + '/' + image, 'rb') as f:
+                    for i in range(height):
+                        # BMP rows are padded to 4 bytes
+                        f.seek(startbit + i * ((rowsize + 3) & ~3))
+                        f.readinto(row)
+                        self._reverse(row, rowsize)
+                        c.write(row)
+
+    # Loads the atlas index and keeps the file open for blitSprite
+    def openAtlas(self, name):
+        self.closeAtlas()
+        f = open(_cache_dir() + '/' + name + '.atlas', 'rb')
+        index = dict()
+        count = struct.unpack('<H', f.read(2))[0]
+        for i in range(count):
+            sprite = f.read(f.read(1)[0]).decode()
+            index[sprite] = struct.unpack('<IHH', f.read(8))
+        self._atlas = [f, index]
+        return list(index)
+
+    def closeAtlas(self):
+        if self._atlas:
+            self._atlas[0].close()
+        self._atlas = None
+
+    # Draws a sprite of the open atlas with its top left corner at x, y
+    def blitSprite(self, name, x, y):
+        if not self._atlas:
+            raise OSError('No sprite atlas opened. See: lcd.openAtlas()')
+        f, index = self._atlas
+        offset, width, height = index[name]
+        # image orientation mirrors rows: BMP bottom row comes first
+        Y = self.TFTHEIGHT - y - height
+        self._image_orientation()
+        self._set_window(x, x+width-1, Y, Y+height-1)
+        f.seek(offset)
+        self._stream_file(f, width * height * 2)
+        self._graph_orientation()
+
+    # Saves what the display shows as a 16-bit (RGB565) BMP in path, so it
+    # can be rendered again with renderBmp(filename). The display is read
+    # bottom row first, one row at a time: memory use is one row buffer.
+    def screenshot(self, filename, path='images'):
+        width, height = self.TFTWIDTH, self.TFTHEIGHT
+        rowsize = (width * 2 + 3) & ~3
+        startbit = 14 + 40 + 12
+        row = bytearray(rowsize)
+        with open(path + '/' + filename, 'wb') as f:
+            f.write(b'BM' + struct.pack('<IHHI', startbit + rowsize * height, 0, 0, startbit))
+            f.write(struct.pack('<IiiHHIIiiII', 40, width, height, 1, 16, 3,
+                                rowsize * height, 2835, 2835, 0, 0))
+            f.write(struct.pack('<III', 0xF800, 0x07E0, 0x001F))   # BI_BITFIELDS
+            for y in range(height-1, -1, -1):
+                self.readRect(0, y, width, 1, row)
+                self._reverse(row, width * 2)
+                f.write(row)
+
+    # Returns raw size / RLE size of a cached image, None if not RLE cached
+    def _rle_ratio(self, image):
+        try:
+            with open(_cache_dir() + '/' + image + '.rle', 'rb') as f:
+                width, height = self._set_cache_headers(f)
+                size = os.stat(_cache_dir() + '/' + image + '.rle')[6]
+        except OSError:
+            return None
+        return width * height * 2 / max(size - 6, 1)
+
+    # Converts an image to the cache, yielding (rows done, rows total) after
+    # every batch of rows. Data goes to a .tmp file renamed at the end, so a
+    # half converted image is never rendered.
+    def _convert_image(self, image, path='images', compress=False, rows=8):
+        tmp = _cache_dir() + '/' + image + '.tmp'
+        try:
+            with open(path + '/' + image, 'rb') as f:
+                startbit, width, height = self._set_image_headers(f)
+                with open(tmp, 'wb') as c:
+                    for val in [width, height]:
+                        c.write(bytes(array.array('H', [val])) + b"\n")
+                    out = rle.Encoder(c) if compress else c
+                    f.seek(startbit)
+                    data = bytearray(width * 2 * rows)
+                    mv = memoryview(data)
+                    done = 0
+                    while done < height:
+                        n = f.readinto(data)
+                        if not n: break
+                        self._reverse(data, n)
+                        out.write(mv[:n])
+                        done = min(done + rows, height)
+                        yield done, height
+                    if compress:
+                        out.close()
+        except Exception:
+            # an unfinished conversion leaves no file behind
+            try:
+                os.remove(tmp)
+            except OSError: pass
+            raise
+        target = _cache_dir() + '/' + image + ('.rle' if compress else '.cache')
+        try:
+            os.remove(target)
+        except OSError: pass
+        os.rename(tmp, target)
+        self._ramcache_drop(image)
+
+    # True when the cache file is not older than the image
+    def _cache_fresh(self, path, image, compress=False):
+        target = _cache_dir() + '/' + image + ('.rle' if compress else '.cache')
+        try:
+            return os.stat(target)[8] >= os.stat(path + '/' + image)[8]
+        except OSError:
+            return False
+
+    # Generator caching every BMP of path which has no fresh cache yet,
+    # without drawing anything. It yields the image name after every batch
+    # of rows, so it can run from a main loop or a uasyncio task:
+    #    for image in lcd.warmCache(callback=progress):
+    #        await asyncio.sleep_ms(0)
+    # callback(image, rows done, rows total) reports the progress.
+    def warmCache(self, path='images', callback=None, compress=False, rows=8):
+        for image in os.listdir(path):
+            if not image.endswith('.bmp') or self._cache_fresh(path, image, compress):
+                continue
+            for done, total in self._convert_image(image, path, compress, rows):
+                if callback:
+                    callback(image, done, total)
+                yield image
 
     # TODO:
     # 1. resize large images to screen resolution
-    def cacheImage(self, image):
+    def cacheImage(self, image, compress=False):
+        from fonts.arial_14 import Arial_14
         self.fillMonocolor(BLACK)
-        strings = self.initCh(DARKGREY, bgcolor=BLACK)
+        strings = self.initCh(color=DARKGREY, bgcolor=BLACK, font=Arial_14)
         strings.printLn("Caching:", 25, 25)
         strings.printLn(image + '...', 45, 45)
-        memread = 480
-        path = 'images/cache/'
-        with open('images/' + image, 'rb') as f:
-            startbit, width, height = self._set_image_headers(f)
-
-            c = open(path + image + '.cache', 'ab')
-            for val in [width, height]:
-                c.write(bytes(array.array('H', [val])) + b"\n")
-
-            f.seek(startbit)
-            data = '1'
-            while len(data) != 0:
-                try:
-                    data = bytearray(f.read(memread))
-                    self._reverse(data, len(data))
-                    c.write(data)
-                except OSError: break
-            c.close()
+        for progress in self._convert_image(image, compress=compress):
+            pass
         print('Cached:', image)
 
-class BaseTests(BaseDraw, BaseChars, BaseImages):
+class BaseTests(BaseChars, BaseImages):
 
     def __init__(self, **kwargs):
         super(BaseTests, self).__init__(**kwargs)
@@ -596,9 +1668,88 @@ class BaseTests(BaseDraw, BaseChars, BaseImages):
         starttime = pyb.micros()//1000
         for image in os.listdir(path):
             if image != cpath and image.endswith('bmp'):
+                imgtime = pyb.micros()
                 self.renderBmp(image, cached=cached, bgcolor=BLACK)
+                imgtime = (pyb.micros()-imgtime)/1000000
+                ratio = self._rle_ratio(image) if cached else None
+                if ratio is None:
+                    print(image, 'rendered in:', imgtime, 'seconds')
+                else:
+                    print(image, 'rendered in:', imgtime, 'seconds, RLE ratio: {:.2f}'.format(ratio))
         return (pyb.micros()//1000-starttime)/1000
 
+    # Writes a pattern and reads it back through RAMRD
+    def _check_bus(self, pixels=64):
+        self._dev.invalidate()      # commands may have been garbled
+        words = [(i * 0x9E37 + 0x1234) & 0xFFFF for i in range(pixels)]
+        self._set_window(0, 7, 0, pixels//8-1)
+        self._write_data(struct.pack('>{}H'.format(pixels), *words))
+        data = self._read(self._dev.regs['RAMRD'], pixels*3)
+        for i in range(pixels):
+            word = words[i]
+            if (data[i*3] != (word >> 8) & 0xF8 or data[i*3+1] != (word >> 3) & 0xFC
+                or data[i*3+2] != (word << 3) & 0xF8):
+                return False
+        return True
+
+    def _time_fill(self, chunk):
+        self._dev.fillchunk = chunk
+        starttime = pyb.micros()
+        for color in (BLACK, WHITE):
+            self.fillMonocolor(color)
+        return pyb.elapsed_micros(starttime)
+
+    def _time_image(self, image, chunk):
+        self._dev.imgchunk = chunk
+        starttime = pyb.micros()
+        self._image_orientation()
+        self._render_bmp_image(image, None)
+        self._graph_orientation()
+        return pyb.elapsed_micros(starttime)
+
+    # Times fills and image streams for every baudrate and chunk size, keeps
+    # the fastest baudrate whose writes read back unchanged through RAMRD and
+    # saves the setting in tunefile, loaded by the next LCD() at start up.
+    # image: BMP of the images directory used for streams (default: first one)
+    def calibrate(self, rates=(42000000, 21000000, 10500000),
+                  fillchunks=(480, 960, 1920, 3840), imgchunks=(256, 512, 1024, 2048),
+                  image=None, save=True):
+        if image is None:
+            for obj in os.listdir('images'):
+                if obj.endswith('.bmp'):
+                    image = obj
+                    break
+        best = None
+        for baudrate in rates:
+            self._dev.rate = baudrate
+            self._set_rate(baudrate)
+            if not self._check_bus():
+                print('SPI baudrate', baudrate, 'is not stable')
+                continue
+            fill = min([(self._time_fill(chunk), chunk) for chunk in fillchunks])
+            if image:
+                img = min([(self._time_image(image, chunk), chunk) for chunk in imgchunks])
+            else:
+                img = (0, self._dev.imgchunk)
+            print('SPI baudrate', baudrate, 'fill:', fill[0], 'us, image:', img[0], 'us')
+            if best is None or fill[0] + img[0] < best[0]:
+                best = (fill[0] + img[0], baudrate, fill[1], img[1])
+        self._pipebufs = None
+        self._dev.invalidate()
+        tuning = self._load_tuning()
+        if best:
+            tuning = dict(rate=best[1], fillchunk=best[2], imgchunk=best[3])
+        self._dev.rate = tuning['rate']
+        self._dev.fillchunk = tuning['fillchunk']
+        self._dev.imgchunk = tuning['imgchunk']
+        self._set_rate(self._dev.rate)
+        if not best:
+            raise OSError('No stable SPI baudrate found')
+        if save:
+            with open(tunefile, 'w') as f:
+                json.dump(tuning, f)
+        return tuning
+
 class BaseWidgets(BaseTests):
 
     def __init__(self, **kwargs):
@@ -607,8 +1758,14 @@ class BaseWidgets(BaseTests):
 class BaseObjects(BaseWidgets):
 
     def __init__(self, **kwargs):
+        self.widgets = Widgets(self)    # touch targets, see widgets.py
         super(BaseObjects, self).__init__(**kwargs)
 
+    # the hit test grid is built for one orientation
+    def setPortrait(self, portrait):
+        super(BaseObjects, self).setPortrait(portrait)
+        self.widgets.invalidate()
+
 class LCD(BaseObjects):
 
     def __init__(self, **kwargs):
@@ -630,14 +1787,107 @@ class LCD(BaseObjects):
         super(LCD, self).drawHline(*args, **kwargs)
 
     def drawLine(self, *args, **kwargs):
+        """
+    Usage:
+        obj.drawLine(x, y, x1, y1, color, [width=1, cap=None])
+        cap: None, 'square' or 'round' (only used when width > 1)
+        """
         super(LCD, self).drawLine(*args, **kwargs)
 
+    def drawLineAA(self, *args, **kwargs):
+        """
+    Usage:
+        obj.drawLineAA(x, y, x1, y1, color, [background=BLACK])
+        Anti-aliased thin line, blended against background
+        """
+        super(LCD, self).drawLineAA(*args, **kwargs)
+
     def drawRect(self, *args, **kwargs):
         super(LCD, self).drawRect(*args, **kwargs)
 
+    def drawPixels(self, *args, **kwargs):
+        """
+    Usage:
+        obj.drawPixels(array('h', [x0, y0, x1, y1, ...]), color, [pixels=4])
+        Batch versions, one call for many primitives (points of drawPixel:
+        2x2, or single pixels with pixels=1):
+        obj.drawHlines([x, y, length, ...], color)
+        obj.drawRects([x, y, width, height, ...], color)  (filled)
+        """
+        super(LCD, self).drawPixels(*args, **kwargs)
+
+    def drawHlines(self, *args, **kwargs):
+        super(LCD, self).drawHlines(*args, **kwargs)
+
+    def fillGradient(self, *args, **kwargs):
+        """
+    Usage:
+        obj.fillGradient((x, y, width, height), color0, color1, [direction='vertical'])
+        direction: 'vertical' (color0 at the top) or 'horizontal' (color0 at left)
+        """
+        super(LCD, self).fillGradient(*args, **kwargs)
+
+    def fillPattern(self, *args, **kwargs):
+        """
+    Usage:
+        obj.fillPattern((x, y, width, height), tile, tilewidth)
+        tile: RGB565 big endian pixels, e.g. from obj.readRect()
+        """
+        super(LCD, self).fillPattern(*args, **kwargs)
+
+    def drawRects(self, *args, **kwargs):
+        super(LCD, self).drawRects(*args, **kwargs)
+
     def fillMonocolor(self, *args, **kwargs):
         super(LCD, self).fillMonocolor(*args, **kwargs)
 
+    def readRect(self, *args, **kwargs):
+        """
+    Usage:
+        buf = obj.readRect(x, y, width, height, [buf=None])
+        Reads display memory to buf (width*height*2 bytes, RGB565 big
+        endian). Use obj.writeRect(x, y, width, height, buf) to draw it.
+        """
+        return super(LCD, self).readRect(*args, **kwargs)
+
+    def writeRect(self, *args, **kwargs):
+        super(LCD, self).writeRect(*args, **kwargs)
+
+    def saveUnder(self, *args, **kwargs):
+        """
+    Usage:
+        saved = obj.saveUnder(x, y, width, height, [buf=None])
+        ... draw a popup or a cursor over the region ...
+        obj.restoreUnder(saved)
+        """
+        return super(LCD, self).saveUnder(*args, **kwargs)
+
+    def restoreUnder(self, *args, **kwargs):
+        super(LCD, self).restoreUnder(*args, **kwargs)
+
+    def setCopyBuffer(self, *args, **kwargs):
+        super(LCD, self).setCopyBuffer(*args, **kwargs)
+
+    def copyRect(self, *args, **kwargs):
+        """
+    Usage:
+        obj.copyRect((x, y, width, height), (x, y))
+        Copies a region of the screen to another place, in bands of rows
+        (see obj.setCopyBuffer(buf) to reuse a band buffer). The pixels are
+        read back from the display at the slow read clock (5.25 MHz, about
+        5 us per pixel): copy small regions, e.g. a strip chart band.
+        """
+        super(LCD, self).copyRect(*args, **kwargs)
+
+    def scrollRect(self, *args, **kwargs):
+        """
+    Usage:
+        exposed = obj.scrollRect((x, y, width, height), dx, dy, [fillcolor=None])
+        Moves the region content by dx, dy. exposed is the list of the
+        (x, y, width, height) strips left to draw by the caller.
+        """
+        return super(LCD, self).scrollRect(*args, **kwargs)
+
     def drawCircleFilled(self, *args, **kwargs):
         super(LCD, self).drawCircleFilled(*args, **kwargs)
 
@@ -647,14 +1897,40 @@ class LCD(BaseObjects):
     def drawOvalFilled(self, *args, **kwargs):
         super(LCD, self).drawOvalFilled(*args, **kwargs)
 
+    def drawPolygon(self, *args, **kwargs):
+        super(LCD, self).drawPolygon(*args, **kwargs)
+
+    def fillPolygon(self, *args, **kwargs):
+        """
+    Usage:
+        obj.fillPolygon([(x, y), (x, y), (x, y), ...], color)
+        Scanline fill (even-odd rule), with a faster path for convex
+        polygons. See also: obj.fillTriangle(x0, y0, x1, y1, x2, y2, color)
+        """
+        super(LCD, self).fillPolygon(*args, **kwargs)
+
+    def fillTriangle(self, *args, **kwargs):
+        super(LCD, self).fillTriangle(*args, **kwargs)
+
     def initCh(self, **kwargs):
         return super(LCD, self).initCh(**kwargs)
 
+    def initConsole(self, **kwargs):
+        """
+    Usage:
+        con = obj.initConsole(font=fontname, [color, bgcolor, scale, top=0, bottom=0])
+        con.write('a new line')
+        Scrolling text console using the hardware vertical scrolling of
+        the ILI9341 (portrait mode only). top and bottom rows are not
+        scrolled. con.close() ends the scrolling.
+        """
+        return super(LCD, self).initConsole(**kwargs)
+
     def printChar(self, *args, **kwargs):
         super(LCD, self).printChar(*args, **kwargs)
 
     def printLn(self, *args, **kwargs):
-        super(LCD, self).printLn(*args, **kwargs)
+        return super(LCD, self).printLn(*args, **kwargs)
 
     def renderBmp(self, *args, **kwargs):
         """
@@ -671,22 +1947,84 @@ class LCD(BaseObjects):
     def clearImageCache(self, *args, **kwargs):
         super(LCD, self).clearImageCache(*args, **kwargs)
 
+    def setRamCache(self, *args, **kwargs):
+        """
+    Usage:
+        obj.setRamCache(budget, [maxsize=budget/4])
+        renderBmp keeps images of up to maxsize bytes (width*height*2)
+        decoded in RAM, least recently used images are freed to stay in
+        budget bytes. See also: obj.pinImage() and obj.ramCacheStats()
+        """
+        super(LCD, self).setRamCache(*args, **kwargs)
+
+    def pinImage(self, *args, **kwargs):
+        super(LCD, self).pinImage(*args, **kwargs)
+
+    def ramCacheStats(self):
+        return super(LCD, self).ramCacheStats()
+
+    def screenshot(self, *args, **kwargs):
+        """
+    Usage:
+        obj.screenshot(filename, [path='images'])
+        Saves the screen content as a 16-bit BMP, use obj.renderBmp(filename)
+        to display it again.
+        """
+        super(LCD, self).screenshot(*args, **kwargs)
+
+    def buildAtlas(self, *args, **kwargs):
+        """
+    Usage:
+        obj.buildAtlas(name, [list of BMP file names], [path='images'])
+        Packs the images in one images/cache/<name>.atlas file. Sprites are
+        named after their file without the '.bmp' extension.
+        """
+        super(LCD, self).buildAtlas(*args, **kwargs)
+
+    def openAtlas(self, *args, **kwargs):
+        return super(LCD, self).openAtlas(*args, **kwargs)
+
+    def closeAtlas(self):
+        super(LCD, self).closeAtlas()
+
+    def blitSprite(self, *args, **kwargs):
+        super(LCD, self).blitSprite(*args, **kwargs)
+
     def cacheImage(self, *args, **kwargs):
         super(LCD, self).cacheImage(*args, **kwargs)
 
+    def warmCache(self, *args, **kwargs):
+        """
+    Usage:
+        for image in obj.warmCache([path='images', callback=None, compress=False, rows=8]):
+            pass    # or: await asyncio.sleep_ms(0)
+        Caches every image of path without a fresh cache, a batch of rows
+        at a time, without touching the screen.
+        callback(image, rows done, rows total) is called after each batch.
+        """
+        return super(LCD, self).warmCache(*args, **kwargs)
+
     def charsTest(self, *args, **kwargs):
         super(LCD, self).charsTest(*args, **kwargs)
 
     def renderImageTest(self, *args, **kwargs):
         return super(LCD, self).renderImageTest(*args, **kwargs)
 
-if __name__ == '__main__':
+    def calibrate(self, *args, **kwargs):
+        """
+    Usage:
+        obj.calibrate([rates=(...), fillchunks=(...), imgchunks=(...), image=None, save=True])
+        Finds the fastest stable SPI baudrate and chunk sizes and saves them
+        in lcdtune.json, loaded by LCD() when no rate is given.
+        """
+        return super(LCD, self).calibrate(*args, **kwargs)
+
+# Demo scene, also timed by bench.py
+def demo(d):
     from fonts.arial_14 import Arial_14
     from fonts.vera_14  import Vera_14
-    
-    starttime = pyb.micros()//1000
 
-    d = LCD() # or d = LCD(portrait=False) for landscape
+    d.setPortrait(True)
     d.fillMonocolor(GREEN)
     d.drawRect(5, 5, 230, 310, BLUE, border=10, fillcolor=ORANGE)
     d.drawOvalFilled(120, 160, 60, 120, BLUE)
@@ -702,7 +2040,11 @@ if __name__ == '__main__':
     d.setPortrait(False)    # Changing mode to landscape
     d.renderBmp("test.bmp", (0, 0))
 
+if __name__ == '__main__':
+    starttime = pyb.micros()//1000
 
+    d = LCD() # or d = LCD(portrait=False) for landscape
+    demo(d)
 
     # last time executed in: 1.379 seconds
     print('executed in:', (pyb.micros()//1000-starttime)/1000, 'seconds')
@@ -0,0 +1,265 @@
+# recorder.py - recorded drawing streams
+#
+# A recording (images/cache/<name>.rec) holds the command and data bytes sent
+# to a panel between start() and stop(), with the files they were drawn from
+# (fonts, images, depends). replay() streams them back without running the
+# drawing code; a recording is stale once one of its files changed.
+#
+#    from lcd import *
+#    import recorder
+#
+#    lcd = LCD()
+#    recorder.start(lcd, 'dial', depends=('dial.py',))
+#    ... drawing ...
+#    size = recorder.stop(lcd)       # saved in images/cache/dial.rec
+#    recorder.replay(lcd, 'dial')    # True, or False when missing or stale
+#
+#    def dial(lcd):
+#        ... drawing ...
+#    recorder.drawRecorded(lcd, 'dial', dial)   # replays or draws and records
+#
+# compress=False keeps the fills as plain data instead of runs. Reading the
+# panel (readRect, ...) is not possible while recording. The recorder stacks
+# its SPI proxy on the bus (see spibus.py): with the instrumentation of
+# stats.py also on, the last one turned on has to go off first.
+
+import os
+import sys
+import struct
+import json
+
+from lcd import _cache_dir
+
+# .rec file: b'REC', version, orientation at the end (1: portrait), length
+# ('>H') of the JSON list of [path, size, mtime] of the files drawn from
+# that follows, then the records:
+#    | _REC_CMD  | n ('>H') | n bytes |       command bytes (D/C low)
+#    | _REC_DATA | n ('>H') | n bytes |       data bytes (D/C high)
+#    | _REC_RUN  | n ('>I') | word |          n pixels of one RGB565 word
+_REC_CMD, _REC_DATA, _REC_RUN = 1, 2, 3
+_REC_VERSION = 1
+_REC_BLOCK = 4096   # data bytes gathered in one record
+
+class _Recording:
+    def __init__(self, dev, name, depends, compress):
+        self._dev = dev
+        self.path = _cache_dir() + '/' + name + '.rec'
+        self._f = open(self.path + '.tmp', 'wb')
+        self._compress = compress
+        self._deps = list(depends)
+        self._fonts = dict()
+        self._data = bytearray()
+        self._run = None            # [word, pixels] not written yet
+        self._bus = dev.bus
+        self._proxy = _RecordSPI(self, dev.bus.spi)
+        dev.bus.wrap(self._proxy)
+
+    def depend(self, path):
+        if path not in self._deps:
+            self._deps.append(path)
+
+    # Fonts are dicts: their file is the one of the fonts package module
+    # holding them (other fonts go in depends)
+    def font(self, font):
+        if id(font) in self._fonts:
+            return
+        self._fonts[id(font)] = font
+        for name, module in list(sys.modules.items()):
+            if name.startswith('fonts.') and getattr(module, '__file__', None) and \
+                    any(getattr(module, a, None) is font for a in dir(module)):
+                self.depend(module.__file__)
+                return
+
+    def _flush(self):
+        if self._run:
+            word, pixels = self._run
+            self._f.write(struct.pack('>BI', _REC_RUN, pixels) + word)
+            self._run = None
+        if self._data:
+            self._f.write(struct.pack('>BH', _REC_DATA, len(self._data)))
+            self._f.write(self._data)
+            self._data = bytearray()
+
+    def add(self, dc, data):
+        data = bytes((data,)) if isinstance(data, int) else bytes(data)
+        if not dc:
+            self._flush()
+            self._f.write(struct.pack('>BH', _REC_CMD, len(data)) + data)
+            return
+        n = len(data)
+        if self._compress and n >= 4 and not n % 2 and data == data[:2] * (n // 2):
+            word = data[:2]
+            if self._run and self._run[0] == word:
+                self._run[1] += n // 2
+                return
+            self._flush()
+            self._run = [word, n // 2]
+            return
+        if self._run:
+            self._flush()
+        while data:
+            k = _REC_BLOCK - len(self._data)
+            self._data += data[:k]
+            data = data[k:]
+            if len(self._data) == _REC_BLOCK:
+                self._flush()
+
+    # raises OSError, the recording going on, when a proxy is wrapped over it
+    def _unhook(self):
+        self._bus.unwrap(self._proxy)
+
+    def close(self):
+        self._unhook()
+        self._flush()
+        self._f.close()
+        deps = list()
+        for path in self._deps:
+            st = os.stat(path)
+            deps.append([path, st[6], st[8]])
+        deps = json.dumps(deps).encode()
+        size = 0
+        with open(self.path, 'wb') as out, open(self.path + '.tmp', 'rb') as f:
+            out.write(b'REC' + bytes((_REC_VERSION, 1 if self._dev.portrait else 0)))
+            out.write(struct.pack('>H', len(deps)) + deps)
+            buf = bytearray(_REC_BLOCK)
+            n = f.readinto(buf)
+            while n:
+                out.write(buf[:n])
+                size += n
+                n = f.readinto(buf)
+        os.remove(self.path + '.tmp')
+        return size
+
+    def discard(self):
+        self._unhook()
+        self._f.close()
+        os.remove(self.path + '.tmp')
+
+    # Reads the header of an open .rec file, leaves f at the first record.
+    # Returns the orientation at the end, None when the file is stale.
+    @staticmethod
+    def header(f):
+        head = f.read(7)
+        if len(head) < 7 or head[:3] != b'REC' or head[3] != _REC_VERSION:
+            return None
+        for path, size, mtime in json.loads(f.read(head[5] << 8 | head[6])):
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            if st[6] != size or st[8] != mtime:
+                return None
+        return head[4] == 1
+
+class _RecordSPI:
+    def __init__(self, rec, spi):
+        self._rec = rec
+        self._spi = spi
+        if hasattr(spi, 'send_async'):
+            self.send_async = self._send_async
+
+    def __getattr__(self, name):
+        return getattr(self._spi, name)
+
+    def _mine(self):
+        return self._rec._bus.owner is self._rec._dev
+
+    def send(self, data, *args, **kwargs):
+        if self._mine():
+            self._rec.add(self._rec._dev.dc.value(), data)
+        return self._spi.send(data, *args, **kwargs)
+
+    def _send_async(self, data):
+        if self._mine():
+            self._rec.add(self._rec._dev.dc.value(), data)
+        return self._spi.send_async(data)
+
+    def recv(self, recv, *args, **kwargs):
+        if self._mine():
+            raise OSError('Panel reads can not be recorded')
+        return self._spi.recv(recv, *args, **kwargs)
+
+# One recording per panel at a time, made of everything drawn on the panel
+# (by lcd, its text contexts and consoles)
+def start(lcd, name, depends=(), compress=True):
+    dev = lcd._dev
+    if dev.recording is not None:
+        raise OSError('Already recording')
+    dev.invalidate()            # the stream sets MADCTL and windows itself
+    dev.recording = _Recording(dev, name, depends, compress)
+    lcd._graph_orientation()
+
+def stop(lcd):
+    """ Saves the recording, returns its size (None when not recording). """
+    rec = lcd._dev.recording
+    if rec is None:
+        return None
+    size = rec.close()          # still recording when it raises
+    lcd._dev.recording = None
+    return size
+
+def replay(lcd, name, memread=4096):
+    path = _cache_dir() + '/' + name + '.rec'
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return False
+    with f:
+        portrait = _Recording.header(f)
+        if portrait is None:
+            return False
+        _replay_stream(lcd, f, memread)
+    lcd._dev.invalidate()       # panel state is the recorded one
+    lcd.setPortrait(portrait)   # orientation the drawing ended in
+    return True
+
+def drawRecorded(lcd, name, draw, depends=(), compress=True):
+    """ Replays name, or calls draw(lcd) and records it for the next time.
+    Returns True when replayed. """
+    if replay(lcd, name):
+        return True
+    start(lcd, name, depends, compress)
+    try:
+        draw(lcd)
+    except Exception:
+        lcd._dev.recording.discard()
+        lcd._dev.recording = None
+        raise
+    stop(lcd)
+    return False
+
+# Reads the records in memread blocks: a partial record at the end of a
+# block is moved to the front and completed by the next read.
+def _replay_stream(lcd, f, memread):
+    buf = bytearray(max(memread, _REC_BLOCK + 3))
+    mv = memoryview(buf)
+    dev = lcd._dev
+    spi = dev.bus.spi
+    start = end = 0
+    dev.begin()
+    try:
+        while True:
+            avail = end - start
+            need = 3
+            if avail and buf[start] == _REC_RUN:
+                need = 7
+            elif avail >= 3:
+                need = 3 + (buf[start+1] << 8 | buf[start+2])
+            if avail < need:
+                mv[:avail] = mv[start:end]
+                start, end = 0, avail
+                n = f.readinto(mv[end:])
+                if not n:
+                    break
+                end += n
+                continue
+            tag = buf[start]
+            if tag == _REC_RUN:
+                count = struct.unpack_from('>I', buf, start+1)[0]
+                lcd._fill_pixels(bytes(mv[start+5:start+7]), count)
+            else:
+                dev.dc.value(tag == _REC_DATA)
+                spi.send(mv[start+3:start+need])
+            start += need
+    finally:
+        dev.end()
@@ -37,7 +37,9 @@ regs = dict(
         RAMRD      = 0x2E,
 
         PTLAR      = 0x30,
+        VSCRDEF    = 0x33,    # Vertical Scrolling Definition: TFA, VSA, BFA
         MADCTL     = 0x36,
+        VSCRSADD   = 0x37,    # Vertical Scrolling Start Address
         PIXFMT     = 0x3A,    # Pixel Format Set
 
         IFMODE     = 0xB0,    # RGB Interface control (page 154)
@@ -0,0 +1,132 @@
+# renderqueue.py - non-blocking drawing with uasyncio
+#
+# Drawing calls are queued as (method, args, kwargs) tuples (kwargs None when
+# there are none) in a preallocated ring and a single display task runs them
+# in slices of at most `budget` milliseconds, yielding to the other tasks
+# (sensor polling, input handling) between slices.
+#
+#    import uasyncio as asyncio
+#    from lcd import *
+#    from fonts.arial_14 import Arial_14
+#    from renderqueue import RenderQueue
+#
+#    lcd = LCD()
+#    rq = RenderQueue(lcd)
+#    rq.fillMonocolor(GREEN)            # queued, returns at once
+#    rq.drawRect(5, 5, 230, 310, BLUE)
+#
+#    async def main():
+#        asyncio.create_task(rq.run())
+#        ch = lcd.initCh(color=RED, font=Arial_14)
+#        x, y = ch.printLn('Hello', 10, 10)   # or rq.post(ch.printLn, ...)
+#        cursor = rq.blink(ch, x, y, times=-1)  # cooperative blinking carriage
+#        ...
+#        cursor.cancel()
+#
+# A record runs as a whole: split long drawings (or use a smaller budget)
+# when a slice must stay short.
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+import pyb
+
+class RenderQueue:
+
+    def __init__(self, lcd, budget=10, size=64):
+        self._lcd = lcd
+        self._budget = budget               # milliseconds per slice
+        self._ring = [None] * size
+        self._head = 0                      # next record to run
+        self._count = 0
+        self._ready = asyncio.Event()       # set when records are queued
+        self._room = asyncio.Event()        # set when records are run
+        self.dropped = 0                    # records refused, queue full
+
+    def __len__(self):
+        return self._count
+
+    def post(self, method, *args, **kwargs):
+        """ Queues method(*args, **kwargs). Returns False when full. """
+        size = len(self._ring)
+        if self._count == size:
+            self.dropped += 1
+            return False
+        self._ring[(self._head + self._count) % size] = (method, args, kwargs or None)
+        self._count += 1
+        self._ready.set()
+        return True
+
+    async def put(self, method, *args, **kwargs):
+        """ Like post(), waiting for room instead of dropping. """
+        while self._count == len(self._ring):
+            self._room.clear()
+            await self._room.wait()
+        self.post(method, *args, **kwargs)
+
+    def __getattr__(self, name):
+        # rq.drawRect(...) queues lcd.drawRect(...). The queuing function is
+        # made once per name and kept on the instance, where the next
+        # lookups find it without coming here.
+        method = getattr(self._lcd, name)
+        def queued(*args, **kwargs):
+            return self.post(method, *args, **kwargs)
+        setattr(self, name, queued)
+        return queued
+
+    def _slice(self):
+        ring = self._ring
+        size = len(ring)
+        start = pyb.millis()
+        while self._count:
+            method, args, kwargs = ring[self._head]
+            ring[self._head] = None
+            self._head = (self._head + 1) % size
+            self._count -= 1
+            if kwargs:
+                method(*args, **kwargs)
+            else:
+                method(*args)
+            if pyb.elapsed_millis(start) >= self._budget:
+                break
+        self._room.set()
+
+    def flush(self):
+        """ Runs every queued record now (blocking). """
+        while self._count:
+            self._slice()
+
+    async def run(self):
+        """ The display task: drains the queue slice by slice. """
+        while True:
+            if not self._count:
+                self._ready.clear()
+                await self._ready.wait()
+            self._slice()
+            await asyncio.sleep(0)
+
+    async def _blink(self, x, y, width, height, color, bgcolor, times, period):
+        lcd = self._lcd
+        i = 0
+        try:
+            while i != times:
+                self.post(lcd.drawVline, x, y, height, color, width=width)
+                await asyncio.sleep(period / 1000)
+                self.post(lcd.drawVline, x, y, height, bgcolor, width=width)
+                await asyncio.sleep(period / 1000)
+                i += 1
+        except asyncio.CancelledError:
+            self.post(lcd.drawVline, x, y, height, bgcolor, width=width)
+            raise
+
+    def blink(self, chars, x, y, scale=None, times=None, period=500):
+        """ Blinking carriage of chars (see initCh) at (x, y), as returned
+        by printLn. Runs `times` times (default: the bctimes of chars, -1:
+        until cancelled); returns the task. """
+        if times is None:
+            times = chars._bctimes
+        width, height = chars._carriage_size(scale)
+        return asyncio.create_task(self._blink(x, y, width, height,
+                chars._fontColor, chars._bgcolor, times, period))
@@ -0,0 +1,114 @@
+# rle.py - run-length encoding for the image cache (images/cache/*.rle)
+#
+# An .rle file starts with the same header as a .cache file (width and
+# height as 'H', each one followed by b'\n'). The body is a list of packets
+# of RGB565 words, big endian and ready to be sent to RAMWR:
+#
+#    | 0x8000 | n | word |          n identical pixels (a run)
+#    | n | word * n |                 n literal pixels
+#
+# n is a big endian 'H' in 1..0x7FFF.
+
+import struct
+
+MINRUN  = 3         # shorter runs are cheaper as literals
+FILLRUN = 32        # expand() hands runs this long to the fill engine
+MAXLEN  = 0x7FFF    # pixels per packet
+LITERALS = 256      # literal pixels buffered by the encoder
+
+
+class Encoder:
+    """ Streams big endian RGB565 pixels into RLE packets. Feed it with
+    write() in chunks of any even size, then call close(). """
+
+    def __init__(self, f):
+        self._f = f
+        self._lit = bytearray()
+        self._word = -1
+        self._count = 0
+        self.written = 0
+
+    def _put(self, data):
+        self._f.write(data)
+        self.written += len(data)
+
+    def _flush_literals(self):
+        lit = self._lit
+        start = 0
+        while start < len(lit):
+            n = min((len(lit)-start)//2, MAXLEN)
+            self._put(struct.pack('>H', n))
+            self._put(lit[start:start+n*2])
+            start += n*2
+        self._lit = bytearray()
+
+    def _flush_run(self):
+        count = self._count
+        if count >= MINRUN:
+            self._flush_literals()
+            self._put(struct.pack('>HH', 0x8000 | count, self._word))
+        elif count:
+            self._lit += struct.pack('>H', self._word) * count
+            if len(self._lit) >= LITERALS*2:
+                self._flush_literals()
+        self._count = 0
+
+    def write(self, data):
+        for i in range(0, len(data)-1, 2):
+            word = (data[i] << 8) | data[i+1]
+            if word == self._word and self._count < MAXLEN:
+                self._count += 1
+            else:
+                self._flush_run()
+                self._word = word
+                self._count = 1
+
+    def close(self):
+        self._flush_run()
+        self._flush_literals()
+
+
+def expand(f, fill, data, chunk=512):
+    """ Decodes the RLE body read from file f. Runs of FILLRUN pixels and
+    more go to fill(word, pixels); literals and short runs are merged and
+    passed to data(buf) in blocks of up to chunk bytes. """
+    buf = bytearray(chunk)
+    mv = memoryview(buf)
+    head = bytearray(4)
+    hmv = memoryview(head)
+    pos = 0
+    while f.readinto(hmv[:2]) == 2:
+        n = (head[0] << 8) | head[1]
+        if n & 0x8000:
+            n &= 0x7FFF
+            f.readinto(hmv[2:])
+            word = bytes(head[2:])
+            if n >= FILLRUN:
+                if pos:
+                    data(mv[:pos])
+                    pos = 0
+                fill(word, n)
+                continue
+            n *= 2
+            while n:
+                if pos == chunk:
+                    data(mv)
+                    pos = 0
+                k = min(n, chunk-pos)
+                mv[pos:pos+k] = word * (k//2)
+                pos += k
+                n -= k
+        else:
+            n *= 2
+            while n:
+                if pos == chunk:
+                    data(mv)
+                    pos = 0
+                k = f.readinto(mv[pos:pos+min(n, chunk-pos)])
+                if not k:
+                    n = 0
+                    break
+                pos += k
+                n -= k
+    if pos:
+        data(mv[:pos])
@@ -0,0 +1,114 @@
+# spibus.py - SPI bus shared by several devices
+#
+# Displays and a touch controller may sit on the same SPI port, each with
+# its own chip select, baudrate and SPI mode. A Bus owns the pyb.SPI object
+# and gives it to one Device at a time:
+#
+#    bus = Bus.get(1)
+#    dev = Device(bus, Pin('X4', Pin.OUT_PP), 42000000)
+#    dev.begin()         # CS low, SPI set up for dev (nested calls allowed)
+#    try:
+#        bus.spi.send(...)
+#    finally:
+#        dev.end()       # CS high once the outermost transaction ends
+#
+# The bus is re-initialised only when the next device needs another
+# baudrate or mode. begin() on a bus held by another device raises OSError:
+# code running from an interrupt (micropython.schedule) checks bus.busy()
+# first and hands its work to bus.defer(), which schedules it again as soon
+# as the transaction in progress ends.
+#
+# Proxies of the SPI object (stats.py counts the traffic, recorder.py saves
+# it) stack on bus.spi with bus.wrap() and come off in reverse order.
+
+import micropython
+from pyb import SPI
+
+class Bus:
+    _buses = dict()     # port -> Bus
+
+    def __init__(self, port):
+        self.port  = port
+        self.spi   = SPI(port, SPI.MASTER, polarity=1, phase=1)
+        self.conf  = None           # (baudrate, polarity, phase) set up now
+        self.owner = None           # device in a transaction
+        self.waiting = list()       # callbacks deferred until release
+        self.proxies = list()       # SPI proxies, the last one is bus.spi
+
+    @staticmethod
+    def get(port):
+        bus = Bus._buses.get(port)
+        if bus is None:
+            bus = Bus._buses[port] = Bus(port)
+        return bus
+
+    def configure(self, dev):
+        conf = (dev.baudrate, dev.polarity, dev.phase)
+        if conf != self.conf:
+            self.spi.init(SPI.MASTER, baudrate=dev.baudrate,
+                          polarity=dev.polarity, phase=dev.phase)
+            self.conf = conf
+
+    def busy(self, dev=None):
+        return self.owner is not None and self.owner is not dev
+
+    def acquire(self, dev):
+        if self.busy(dev):
+            raise OSError('SPI bus busy')
+        self.configure(dev)
+        self.owner = dev
+        dev.cs.low()
+
+    def release(self, dev):
+        dev.cs.high()
+        self.owner = None
+        while self.waiting:
+            micropython.schedule(self.waiting.pop(0), None)
+
+    # proxy holds the object it wraps (bus.spi when wrapped) in proxy._spi
+    def wrap(self, proxy):
+        self.proxies.append(proxy)
+        self.spi = proxy
+
+    def unwrapped(self, proxy):
+        # True when proxy can come off: nothing was wrapped over it
+        return bool(self.proxies) and self.proxies[-1] is proxy
+
+    def unwrap(self, proxy):
+        if not self.unwrapped(proxy):
+            raise OSError('SPI proxy wrapped over, unwrap the last one first')
+        self.proxies.pop()
+        self.spi = proxy._spi
+
+    def defer(self, func):
+        # func(None) runs (scheduled) when the bus is released
+        if func not in self.waiting:
+            self.waiting.append(func)
+
+
+class Device:
+    __slots__ = ('bus', 'cs', 'baudrate', 'polarity', 'phase', 'depth')
+
+    def __init__(self, bus, cs, baudrate, polarity=1, phase=1):
+        self.bus      = bus
+        self.cs       = cs
+        self.baudrate = baudrate
+        self.polarity = polarity
+        self.phase    = phase
+        self.depth    = 0           # nested begin() calls
+        cs.high()
+
+    def begin(self):
+        if not self.depth:
+            self.bus.acquire(self)
+        self.depth += 1
+
+    def end(self):
+        self.depth -= 1
+        if not self.depth:
+            self.bus.release(self)
+
+    def set_rate(self, baudrate):
+        self.baudrate = baudrate
+        if self.bus.owner is self:
+            self.bus.configure(self)
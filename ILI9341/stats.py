@@ -0,0 +1,168 @@
+# stats.py - bus instrumentation of the display driver
+#
+# Counts commands, data bytes, CS cycles, windows and MADCTL switches sent to
+# the panels, and times the drawing primitives. lcd.py knows nothing of it:
+# enable() swaps the SPI objects and CS pins of the panels for counting
+# proxies and wraps the primitives listed in `profiled`, disable() puts them
+# back, so there is no cost when it is off.
+#
+#    from lcd import *
+#    import stats
+#
+#    lcd = LCD()
+#    stats.enable()
+#    ... drawing ...
+#    stats.report()              # per primitive calls, bytes, us, bytes/pixel
+#    counters = stats.disable()  # the counters, as a dict
+#
+# Panels made after enable() are not counted. The counting proxies stack on
+# the SPI objects (see spibus.py): with a recording (recorder.py) also on, the
+# last one turned on has to go off first.
+
+import pyb
+
+from lcd import ILI, BaseDraw, BaseChars, Console, BaseImages
+
+# primitives timed by the instrumentation
+profiled = (
+    (BaseDraw, ('drawPixel', 'drawVline', 'drawHline', 'drawLine', 'drawLineAA',
+                'drawRect', 'fillMonocolor', 'drawCircleFilled', 'drawCircle',
+                'drawOvalFilled', 'drawPolygon', 'fillPolygon', 'fillTriangle',
+                'drawPixels', 'drawHlines', 'drawRects', 'fillGradient',
+                'fillPattern', 'readRect', 'writeRect', 'copyRect', 'scrollRect')),
+    (BaseChars, ('printChar', 'printLn')),
+    (Console, ('write',)),
+    (BaseImages, ('renderBmp', 'blitSprite', 'screenshot')),
+)
+
+_counters = None    # while the instrumentation is on
+_proxies = list()   # (bus, _StatsSPI) wrapped by enable()
+
+class _StatsSPI:
+    def __init__(self, bus, spi):
+        self._bus = bus
+        self._spi = spi
+        if hasattr(spi, 'send_async'):
+            self.send_async = self._send_async
+
+    def __getattr__(self, name):
+        return getattr(self._spi, name)
+
+    def _count(self, data):
+        stats = _counters
+        n = 1 if isinstance(data, int) else len(data)
+        dev = self._bus.owner
+        dc = getattr(dev, 'dc', None)
+        if dc is None:
+            return                      # not a display
+        if dc.value():
+            stats['data'] += n
+            if stats['lastcmd'] == dev.regs['RAMWR']:
+                stats['pixels'] += n // 2
+        else:
+            cmd = data if isinstance(data, int) else data[n-1]
+            stats['cmds'] += n
+            stats['lastcmd'] = cmd
+            if cmd == dev.regs['RAMWR']:
+                stats['windows'] += 1
+            elif cmd == dev.regs['MADCTL']:
+                stats['madctl'] += 1
+
+    def send(self, data, *args, **kwargs):
+        self._count(data)
+        return self._spi.send(data, *args, **kwargs)
+
+    def _send_async(self, data):
+        self._count(data)
+        return self._spi.send_async(data)
+
+    def recv(self, recv, *args, **kwargs):
+        _counters['read'] += recv if isinstance(recv, int) else len(recv)
+        return self._spi.recv(recv, *args, **kwargs)
+
+class _StatsPin:
+    def __init__(self, pin):
+        self._pin = pin
+
+    def __getattr__(self, name):
+        return getattr(self._pin, name)
+
+    def low(self):
+        _counters['cs'] += 1
+        self._pin.low()
+
+    def high(self):
+        self._pin.high()
+
+def _profile(name, func):
+    # time and bus traffic of the outermost primitive only: nested calls
+    # (drawRect -> drawHline) are part of their caller
+    def wrapper(self, *args, **kwargs):
+        stats = _counters
+        if stats is None or stats['depth']:
+            return func(self, *args, **kwargs)
+        stats['depth'] = 1
+        nbytes = stats['cmds'] + stats['data'] + stats['read']
+        pixels = stats['pixels']
+        start = pyb.micros()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            us = pyb.elapsed_micros(start)
+            prim = stats['prims'].setdefault(name, [0, 0, 0, 0])
+            prim[0] += 1
+            prim[1] += stats['cmds'] + stats['data'] + stats['read'] - nbytes
+            prim[2] += us
+            prim[3] += stats['pixels'] - pixels
+            stats['depth'] = 0
+    return wrapper
+
+def enable():
+    global _counters
+    if _counters is not None:
+        return
+    _counters = dict(cmds=0, data=0, read=0, cs=0, windows=0, madctl=0,
+                     pixels=0, depth=0, lastcmd=0, prims=dict(), saved=list())
+    for dev in ILI._devices.values():
+        bus = dev.bus
+        if not any(b is bus for b, proxy in _proxies):
+            proxy = _StatsSPI(bus, bus.spi)
+            bus.wrap(proxy)
+            _proxies.append((bus, proxy))
+        dev.cs = _StatsPin(dev.cs)
+    for cls, names in profiled:
+        for name in names:
+            func = getattr(cls, name)
+            _counters['saved'].append((cls, name, func))
+            setattr(cls, name, _profile(name, func))
+
+def disable():
+    global _counters
+    stats = _counters
+    if stats is None:
+        return None
+    for bus, proxy in _proxies:
+        if not bus.unwrapped(proxy):
+            raise OSError('SPI proxy wrapped over the instrumentation (recording?), stop that first')
+    for bus, proxy in _proxies:
+        bus.unwrap(proxy)
+    del _proxies[:]
+    for cls, name, func in stats['saved']:
+        setattr(cls, name, func)
+    for dev in ILI._devices.values():
+        dev.cs = dev.cs._pin
+    _counters = None
+    return stats
+
+def report(stats=None):
+    stats = stats or _counters
+    if stats is None:
+        print('Instrumentation is off, see stats.enable()')
+        return
+    print('{:<16}{:>7}{:>10}{:>10}{:>8}'.format('primitive', 'calls', 'bytes', 'us', 'B/px'))
+    for name in sorted(stats['prims']):
+        calls, nbytes, us, pixels = stats['prims'][name]
+        bpp = '{:.2f}'.format(nbytes / pixels) if pixels else '-'
+        print('{:<16}{:>7}{:>10}{:>10}{:>8}'.format(name, calls, nbytes, us, bpp))
+    print('commands {cmds}, data bytes {data}, read bytes {read}, CS cycles {cs}, '
+          'windows {windows}, MADCTL {madctl}, pixels {pixels}'.format(**stats))
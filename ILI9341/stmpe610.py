@@ -0,0 +1,293 @@
+# stmpe610.py - STMPE610 resistive touch controller (Adafruit TFT Touch Shield)
+#
+# The controller shares SPI(1) with the display (see spibus.py) and runs in
+# SPI mode 0 at 1 MHz at most. It samples on its own and keeps the samples
+# in its FIFO; its interrupt pin rises as soon as the FIFO holds `threshold`
+# samples, and the whole FIFO is then read in one burst.
+#
+#    from lcd import *
+#    from stmpe610 import Touch
+#
+#    lcd = LCD()
+#    def touched(x, y, event):          # event: 'down', 'move' or 'up'
+#        ...
+#    touch = Touch(lcd, callback=touched)
+#    ...
+#    touch.read()                       # (x, y) of the current touch or None
+#
+# The callback runs from micropython.schedule, never from the hard interrupt:
+# keep it short, a drawing call on the panel is fine. With the display idle
+# an event comes 2 to 3 ms after the touch (sampling included); when the
+# interrupt comes in the middle of a display transaction the burst is read as
+# soon as the bus is released (a full screen fill holds it about 30 ms).
+#
+# Without an interrupt pin (irqPin=None) call touch.poll() regularly.
+#
+# Raw readings go through a median of 3 and a first order IIR filter (new =
+# old + (median - old) >> smoothing) kept in preallocated arrays, then are
+# mapped to screen coordinates for the orientation the display has now (see
+# LCD.setPortrait). The calibration holds the raw readings of the portrait
+# screen edges; touch.calibrate() measures them.
+
+import array
+import pyb, micropython
+from pyb import Pin, ExtInt
+from micropython import const
+
+from spibus import Bus, Device
+from colors import WHITE, BLACK
+
+# registers
+CHIP_ID      = const(0x00)  # 2 bytes: 0x0811
+SYS_CTRL1    = const(0x03)
+SYS_CTRL2    = const(0x04)
+INT_CTRL     = const(0x09)
+INT_EN       = const(0x0A)
+INT_STA      = const(0x0B)
+ADC_CTRL1    = const(0x20)
+ADC_CTRL2    = const(0x21)
+TSC_CTRL     = const(0x40)
+TSC_CFG      = const(0x41)
+FIFO_TH      = const(0x4A)
+FIFO_STA     = const(0x4B)
+FIFO_SIZE    = const(0x4C)
+TSC_FRACTION_Z = const(0x56)
+TSC_DATA     = const(0x57)  # x, y, z packed in 4 bytes, no address increment
+TSC_I_DRIVE  = const(0x58)
+
+READ         = const(0x80)  # address bit: read access
+INT_TOUCHDET = const(0x01)
+INT_FIFO_TH  = const(0x02)
+TSC_TOUCHED  = const(0x80)  # TSC_CTRL status bit
+FIFO_DEPTH   = const(128)   # samples
+
+# (register, value, ms) written at start up, after a soft reset
+init_table = (
+    (SYS_CTRL2,      0x0C,  0),   # clocks on: ADC and touch screen only
+    (ADC_CTRL1,      0x48,  0),   # 12 bit ADC, 80 clocks per conversion
+    (ADC_CTRL2,      0x01,  2),   # ADC clock 3.25 MHz
+    (TSC_CFG,        0x9A,  0),   # 4 samples average, 500 us touch delay, 500 us settling
+    (TSC_FRACTION_Z, 0x06,  0),
+    (TSC_I_DRIVE,    0x01,  0),   # 50 mA
+    (FIFO_STA,       0x01,  0),   # FIFO reset...
+    (FIFO_STA,       0x00,  0),   # ...and release
+    (TSC_CTRL,       0x01,  0),   # X, Y, Z acquisition, enabled
+    (INT_STA,        0xFF,  0),   # clear pending interrupts
+    (INT_EN,         INT_TOUCHDET | INT_FIFO_TH, 0),
+    (INT_CTRL,       0x05,  0),   # level active high, global enable
+)
+
+# INT_STA, FIFO_SIZE and TSC_CTRL read in one transfer (each address byte
+# clocks out the register asked by the byte before)
+_status_request = bytes((READ | INT_STA, READ | FIFO_SIZE, READ | TSC_CTRL, 0))
+
+class Touch(Device):
+    __slots__ = ('lcd', 'callback', 'calibration', 'smoothing', 'x', 'y',
+                 'down', '_count', '_rawx', '_rawy', '_pos', '_fx', '_fy',
+                 '_tx', '_rx', '_txmv', '_rxmv', '_status', '_ack', '_service_ref',
+                 '_irq')
+
+    def __init__(self, lcd, csPin='X2', irqPin='X1', port=1, baudrate=1000000,
+                 threshold=1, calibration=(150, 3800, 130, 4000), smoothing=1,
+                 callback=None):
+        super(Touch, self).__init__(Bus.get(port), Pin(csPin, Pin.OUT_PP),
+                                    baudrate, polarity=0, phase=0)
+        self.lcd = lcd
+        self.callback = callback
+        self.calibration = calibration  # raw x at screen x 0 and 239,
+                                        # raw y at screen y 0 and 319 (portrait)
+        self.smoothing = smoothing      # IIR shift, 0: median only
+        self.x = self.y = 0
+        self.down = False
+        self._count = 0                 # samples since the touch began
+        self._rawx = array.array('H', (0, 0, 0))    # ring of raw samples
+        self._rawy = array.array('H', (0, 0, 0))
+        self._pos = 0
+        self._fx = self._fy = 0         # IIR state
+        # FIFO burst: every address byte reads the next data byte back
+        self._tx = bytearray([READ | TSC_DATA]) * (FIFO_DEPTH * 4 + 1)
+        self._rx = bytearray(FIFO_DEPTH * 4 + 1)
+        self._txmv = memoryview(self._tx)
+        self._rxmv = memoryview(self._rx)
+        self._status = bytearray(4)
+        self._ack = bytearray((INT_STA, 0))
+        self._service_ref = self._service   # bound once: no allocation in the IRQ
+        self._setup(threshold)
+        self._irq = None
+        if irqPin is not None:
+            self._irq = ExtInt(irqPin, ExtInt.IRQ_RISING, Pin.PULL_NONE, self._interrupt)
+
+    # -- registers -------------------------------------------------------
+
+    # One access per transaction: the controller takes the byte following a
+    # read as the next address until its CS goes high.
+    def _transfer(self, send, recv=None):
+        self.begin()
+        try:
+            if recv is None:
+                self.bus.spi.send(send)
+            else:
+                self.bus.spi.send_recv(send, recv)
+        finally:
+            self.end()
+
+    def _write_reg(self, reg, value):
+        self._transfer(bytes((reg, value)))
+
+    def _read_reg(self, reg):
+        buf = bytearray(2)
+        self._transfer(bytes((READ | reg, 0)), buf)
+        return buf[1]
+
+    def _setup(self, threshold):
+        self._write_reg(SYS_CTRL1, 0x02)    # soft reset
+        pyb.delay(10)
+        chip = self._read_reg(CHIP_ID) << 8 | self._read_reg(CHIP_ID + 1)
+        if chip != 0x0811:
+            raise OSError('STMPE610 not found (chip id 0x{:04x})'.format(chip))
+        self._write_reg(FIFO_TH, threshold)
+        for reg, value, ms in init_table:
+            self._write_reg(reg, value)
+            if ms:
+                pyb.delay(ms)
+
+    # -- sampling --------------------------------------------------------
+
+    def _interrupt(self, line):
+        # hard interrupt: no SPI, no allocation
+        micropython.schedule(self._service_ref, None)
+
+    def poll(self):
+        """ Reads the samples waiting in the FIFO (no interrupt pin). """
+        self._service(None)
+
+    def _service(self, arg):
+        bus = self.bus
+        if bus.busy(self):
+            bus.defer(self._service_ref)
+            return
+        status = self._status
+        moved = False
+        # until the FIFO is empty: samples may come in during the burst
+        while True:
+            self._transfer(_status_request, status)
+            self._ack[1] = status[1]
+            self._transfer(self._ack)
+            n = min(status[2], FIFO_DEPTH) * 4
+            if not n:
+                break
+            self._tx[n] = 0                 # the last byte only clocks data out
+            self._transfer(self._txmv[:n + 1], self._rxmv[:n + 1])
+            self._tx[n] = READ | TSC_DATA
+            rx = self._rx
+            for i in range(1, n + 1, 4):
+                self._sample(rx[i] << 4 | rx[i+1] >> 4,
+                             (rx[i+1] & 0x0F) << 8 | rx[i+2])
+            moved = True
+        if moved:
+            self._update()
+        if self.down and not status[3] & TSC_TOUCHED:
+            self.down = False
+            self._count = 0
+            if self.callback:
+                self.callback(self.x, self.y, 'up')
+
+    @staticmethod
+    @micropython.native
+    def _median(a, b, c):
+        if a > b:
+            a, b = b, a
+        return b if b < c else (a if a > c else c)
+
+    def _sample(self, rx, ry):
+        pos = self._pos
+        self._rawx[pos] = rx
+        self._rawy[pos] = ry
+        self._pos = (pos + 1) % 3
+        self._count += 1
+        if self._count < 3:
+            mx, my = rx, ry
+        else:
+            x, y = self._rawx, self._rawy
+            mx = self._median(x[0], x[1], x[2])
+            my = self._median(y[0], y[1], y[2])
+        if self._count == 1:
+            self._fx, self._fy = mx, my
+        else:
+            self._fx += (mx - self._fx) >> self.smoothing
+            self._fy += (my - self._fy) >> self.smoothing
+
+    def _update(self):
+        x, y = self._to_screen(self._fx, self._fy)
+        self.x, self.y = x, y
+        event = 'move' if self.down else 'down'
+        self.down = True
+        if self.callback:
+            self.callback(x, y, event)
+
+    # -- coordinates -----------------------------------------------------
+
+    @staticmethod
+    def _scale(raw, low, high, size):
+        v = (raw - low) * (size - 1) // (high - low)
+        return 0 if v < 0 else (size - 1 if v >= size else v)
+
+    def _to_screen(self, rx, ry):
+        xmin, xmax, ymin, ymax = self.calibration
+        x = self._scale(rx, xmin, xmax, 240)
+        y = self._scale(ry, ymin, ymax, 320)
+        if self.lcd.TFTWIDTH > self.lcd.TFTHEIGHT:
+            return y, 239 - x                   # landscape
+        return x, y
+
+    def read(self):
+        """ (x, y) of the current touch on screen, None when not touched. """
+        return (self.x, self.y) if self.down else None
+
+    def raw(self):
+        """ Filtered raw (x, y) of the current touch, None when not touched. """
+        return (self._fx, self._fy) if self.down else None
+
+    def _wait_touch(self):
+        # filtered raw position once the touch has settled, after release
+        while not (self.down and self._count >= 8):
+            if self._irq is None:
+                self.poll()
+            pyb.delay(5)
+        rx, ry = self._fx, self._fy
+        while self.down:
+            if self._irq is None:
+                self.poll()
+            pyb.delay(5)
+        return rx, ry
+
+    def calibrate(self, color=WHITE, bgcolor=BLACK, margin=20):
+        """ Asks for touches on two crosses and sets the calibration, which
+        is returned (store it and pass it to Touch() next time). """
+        lcd = self.lcd
+        portrait = lcd.TFTWIDTH < lcd.TFTHEIGHT
+        if not portrait:
+            lcd.setPortrait(True)
+        points = ((margin, margin), (239 - margin, 319 - margin))
+        raws = list()
+        callback, self.callback = self.callback, None
+        try:
+            for x, y in points:
+                lcd.fillMonocolor(bgcolor)
+                lcd.drawHline(x - 10, y, 21, color)
+                lcd.drawVline(x, y - 10, 21, color)
+                raws.append(self._wait_touch())
+        finally:
+            self.callback = callback
+            lcd.fillMonocolor(bgcolor)
+            if not portrait:
+                lcd.setPortrait(False)
+        (x0, y0), (x1, y1) = points
+        (rx0, ry0), (rx1, ry1) = raws
+        # extend the two readings to the screen edges
+        xmin = rx0 - (rx1 - rx0) * x0 // (x1 - x0)
+        xmax = rx0 + (rx1 - rx0) * (239 - x0) // (x1 - x0)
+        ymin = ry0 - (ry1 - ry0) * y0 // (y1 - y0)
+        ymax = ry0 + (ry1 - ry0) * (319 - y0) // (y1 - y0)
+        self.calibration = (xmin, xmax, ymin, ymax)
+        return self.calibration
@@ -0,0 +1,25 @@
+# Runs the driver on the host stand-in (see ../host): the pyb and micropython
+# modules come from host/, the driver and its images and fonts from the
+# ILI9341 directory, which is also the working directory (paths like
+# 'images/' are relative).
+
+import os
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(root, 'host'), root]
+os.chdir(root)
+
+import pytest
+
+@pytest.fixture
+def lcd():
+    import lcd
+    d = lcd.LCD()
+    d.setPortrait(True)
+    return d
+
+@pytest.fixture
+def panel():
+    from pyb import SPI
+    return SPI.devices(1)[0]
@@ -0,0 +1,39 @@
+import pytest
+
+from lcd import *
+from animation import Animator, Sprite
+
+
+def background(d):
+    d.fillMonocolor(BLACK)
+    for i in range(8):
+        d.drawRect(i * 25, i * 20, 60, 40, RED, border=2,
+                   fillcolor=(i * 3, 63 - i * 7, 10))
+
+
+def screen(d):
+    # the panel read back in the orientation d draws in
+    return bytes(d.readRect(0, 0, d.TFTWIDTH, d.TFTHEIGHT))
+
+
+@pytest.mark.parametrize('portrait', (True, False))
+def test_moves_restore_the_background(lcd, portrait):
+    lcd.setPortrait(portrait)
+    background(lcd)
+    reference = screen(lcd)
+    frame = bytes(lcd._get_Npix_monoword(BLUE)) * (20 * 16)
+    sprite = Sprite([frame], 20, 16, x=30, y=25)
+    other = Sprite([frame], 20, 16, x=100, y=100)
+    anim = Animator(lcd)
+    anim.add(sprite)
+    anim.add(other)
+    anim.tick()
+    for x, y in ((35, 28), (90, 95), (150, 40), (lcd.TFTWIDTH, lcd.TFTHEIGHT)):
+        sprite.move(x, y)               # overlaps itself, then other, then clamped
+        anim.tick()
+        assert lcd.readRect(sprite.x, sprite.y, 20, 16) == frame
+    sprite.hide()
+    anim.tick()
+    anim.remove(other)
+    assert screen(lcd) == reference
+    lcd.setPortrait(True)
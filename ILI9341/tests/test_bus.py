@@ -0,0 +1,74 @@
+import pytest
+
+from lcd import *
+
+
+def released(d):
+    dev = d._dev
+    return dev.bus.owner is None and dev.depth == 0 and dev.cs.value() == 1
+
+
+def test_read_error_releases_bus(lcd):
+    with pytest.raises(IndexError):
+        lcd.readRect(0, 0, 10, 10, bytearray(10))     # buffer too small
+    assert released(lcd)
+    assert lcd._dev.baudrate == lcd._dev.rate       # back from the read rate
+    lcd.drawPixel(0, 0, RED)
+    assert lcd._dev.bus.conf == (lcd._dev.rate, 1, 1)
+
+
+def test_write_error_releases_bus(lcd, monkeypatch):
+    spi = lcd._dev.bus.spi
+    def fail(*args, **kwargs):
+        raise OSError(5)
+    monkeypatch.setattr(spi, 'send', fail)
+    with pytest.raises(OSError):
+        lcd.fillMonocolor(RED)
+    monkeypatch.undo()
+    assert released(lcd)
+    lcd.drawRect(0, 0, 10, 10, RED, fillcolor=RED)
+    assert released(lcd)
+
+
+def test_stream_error_releases_bus(lcd):
+    class Broken:
+        def readinto(self, buf):
+            raise OSError(5)
+    with pytest.raises(OSError):
+        lcd._stream_file(Broken())
+    assert released(lcd)
+
+
+def test_panels_keep_their_own_state(lcd):
+    other = LCD(csxPin='Y5', rstPin='Y6', dcxPin='Y7', portrait=False)
+    assert other._dev is not lcd._dev and other._dev.bus is lcd._dev.bus
+    lcd._dev.fillchunk = 100
+    assert other._dev.fillchunk != 100
+    lcd.setRamCache(4096)
+    assert other._ramcache_budget == 0
+    assert (lcd.TFTWIDTH, other.TFTWIDTH) == (240, 320)
+
+
+def test_new_object_keeps_orientation(lcd):
+    lcd.setPortrait(False)
+    LCD()                                   # same panel, portrait not given
+    assert not lcd._dev.portrait and lcd.TFTWIDTH == 320
+    LCD(portrait=True)
+    assert lcd._dev.portrait
+
+
+def cold_start(cs, sleeping):
+    import pyb
+    from panel import Panel
+    panel = Panel(cs=cs[0], dc=cs[1], rst=cs[2])
+    panel.sleeping = sleeping
+    pyb.SPI.attach(1, panel)
+    start = pyb.millis()
+    LCD(csxPin=cs[0], dcxPin=cs[1], rstPin=cs[2])
+    assert not panel.sleeping and panel.displayon
+    return pyb.elapsed_millis(start)
+
+
+def test_cold_start_waits_for_slpout_only_when_awake():
+    assert cold_start(('Y1', 'Y2', 'Y3'), sleeping=True) < 20     # power on
+    assert cold_start(('Y9', 'Y10', 'Y11'), sleeping=False) >= 120
@@ -0,0 +1,75 @@
+from lcd import *
+
+
+def word(color):
+    R, G, B = color
+    return (R << 11) | (G << 5) | B
+
+
+def test_thick_hline_is_a_rect(lcd, panel):
+    lcd.fillMonocolor(BLACK)
+    lcd.drawHline(10, 20, 30, RED, width=3)
+    drawn = [(x, y) for y in range(15, 30) for x in range(0, 50)
+             if panel.pixel(x, y) == word(RED)]
+    assert drawn == [(x, y) for y in range(20, 23) for x in range(10, 40)]
+
+
+def test_glyph_colors_with_ascii_bytes(lcd, panel):
+    # (27, 17, 17) packs to b'\xda1': the '1' byte must not be read as a set bit
+    from fonts.arial_14 import Arial_14
+    color, bgcolor = (4, 58, 16), (27, 17, 17)
+    lcd.fillMonocolor(BLACK)
+    lcd.initCh(color=color, bgcolor=bgcolor, font=Arial_14).printChar('H', 10, 10)
+    colors = set(panel.pixel(x, y) for y in range(10, 24) for x in range(10, 20))
+    assert colors <= {word(color), word(bgcolor), word(BLACK)}
+    assert word(color) in colors and word(bgcolor) in colors
+
+
+def test_butt_line_includes_both_ends(lcd, panel):
+    for x0, x1 in ((10, 40), (40, 10)):
+        lcd.fillMonocolor(BLACK)
+        lcd.drawLine(x0, 50, x1, 50, RED, width=4)
+        cols = [x for x in range(0, 60) if panel.pixel(x, 50) == word(RED)]
+        assert cols == list(range(10, 41))
+
+
+def test_circle_border_is_not_capped(lcd, panel):
+    def ring(border):
+        lcd.fillMonocolor(BLACK)
+        lcd.drawCircle(120, 160, 50, RED, border=border)
+        return [y for y in range(100, 170) if panel.pixel(120, y) == word(RED)]
+    assert len(ring(10)) > len(ring(5))
+
+
+def painted(panel, color, width=240, height=320):
+    return {(x, y) for y in range(height) for x in range(width)
+            if panel.pixel(x, y) == word(color)}
+
+
+def test_draw_pixels_matches_draw_pixel(lcd, panel):
+    from array import array
+    points = [(10, 10), (11, 10), (50, 60), (239, 319), (0, 0), (100, 10)]
+    for pixels in (4, 1):
+        lcd.fillMonocolor(BLACK)
+        for x, y in points:
+            lcd.drawPixel(x, y, RED, pixels=pixels)
+        single = painted(panel, RED)
+        lcd.fillMonocolor(BLACK)
+        lcd.drawPixels(array('h', [c for p in points for c in p]), RED, pixels=pixels)
+        assert painted(panel, RED) == single
+        side = 2 if pixels == 4 else 1
+        assert single == {(x + dx, y + dy) for x, y in points
+                          for dx in range(side) for dy in range(side)
+                          if x + dx < 240 and y + dy < 320}
+
+
+def test_draw_hlines_and_rects(lcd, panel):
+    lcd.fillMonocolor(BLACK)
+    lcd.drawHlines([5, 7, 10, 12, 7, 10, -3, 30, 8, 230, 31, 20], RED)
+    assert painted(panel, RED) == ({(x, 7) for x in range(5, 22)} |
+                                    {(x, 30) for x in range(0, 5)} |
+                                    {(x, 31) for x in range(230, 240)})
+    lcd.fillMonocolor(BLACK)
+    lcd.drawRects([10, 100, 5, 40, 15, 100, 5, 40, 30, 300, 10, 30], GREEN)
+    assert painted(panel, GREEN) == ({(x, y) for y in range(100, 140) for x in range(10, 20)} |
+                                      {(x, y) for y in range(300, 320) for x in range(30, 40)})
@@ -0,0 +1,115 @@
+import os
+
+from lcd import *
+import lcd as driver
+
+
+def rendered(d, panel, image, **kwargs):
+    d.fillMonocolor(BLACK)
+    d.renderBmp(image, (0, 0), **kwargs)
+    d.setPortrait(True)
+    return bytes(panel.mem)
+
+
+def remove_cache(image):
+    for ext in ('.cache', '.rle'):
+        try:
+            os.remove(driver._cache_dir() + '/' + image + ext)
+        except OSError:
+            pass
+
+
+def test_cache_image_rle(lcd, panel):
+    remove_cache('test.bmp')
+    reference = rendered(lcd, panel, 'test.bmp', cached=False)
+    lcd.cacheImage('test.bmp', compress=True)
+    assert os.path.exists(driver._cache_dir() + '/test.bmp.rle')
+    assert rendered(lcd, panel, 'test.bmp') == reference
+    remove_cache('test.bmp')
+
+
+def test_cache_image_matches_warm_cache(lcd, panel):
+    remove_cache('test.bmp')
+    reference = rendered(lcd, panel, 'test.bmp', cached=False)
+    lcd.cacheImage('test.bmp')
+    path = driver._cache_dir() + '/test.bmp.cache'
+    with open(path, 'rb') as f:
+        cached = f.read()
+    assert rendered(lcd, panel, 'test.bmp') == reference
+    os.remove(path)
+    for image in lcd.warmCache():
+        pass
+    with open(path, 'rb') as f:
+        assert f.read() == cached
+
+
+def test_failed_conversion_leaves_no_file(lcd):
+    try:
+        for progress in lcd._convert_image('missing.bmp'):
+            pass
+    except OSError:
+        pass
+    assert not os.path.exists(driver._cache_dir() + '/missing.bmp.tmp')
+
+
+def test_ram_cache_bypass_and_invalidation(lcd, panel):
+    remove_cache('test.bmp')
+    reference = rendered(lcd, panel, 'test.bmp', cached=False)
+    lcd.setRamCache(120 * 160 * 2, maxsize=120 * 160 * 2)
+    try:
+        assert rendered(lcd, panel, 'test.bmp') == reference
+        assert 'test.bmp' in lcd._ramcache
+        stats = lcd.ramCacheStats()
+        for cached in (False, 0, None):
+            assert rendered(lcd, panel, 'test.bmp', cached=cached) == reference
+        assert lcd.ramCacheStats() == stats
+        lcd.cacheImage('test.bmp')
+        assert 'test.bmp' not in lcd._ramcache
+        assert rendered(lcd, panel, 'test.bmp') == reference
+        lcd.clearImageCache(driver._cache_dir())
+        assert 'test.bmp' not in lcd._ramcache
+        assert lcd.ramCacheStats()['used'] == 0
+    finally:
+        lcd.setRamCache(0)
+        remove_cache('test.bmp')
+
+
+def test_ram_cache_skips_large_images(lcd, panel, monkeypatch):
+    loads = []
+    load = driver.BaseImages._load_image
+    def counted(self, filename, maxsize, stamp=None):
+        loads.append(filename)
+        return load(self, filename, maxsize, stamp)
+    monkeypatch.setattr(driver.BaseImages, '_load_image', counted)
+    reference = rendered(lcd, panel, 'test.bmp', cached=False)
+    lcd.setRamCache(4096)
+    try:
+        for i in range(3):
+            assert rendered(lcd, panel, 'test.bmp') == reference
+        assert loads == ['test.bmp']
+    finally:
+        lcd.setRamCache(0)
+
+
+def test_ram_cache_reloads_changed_image(lcd, panel):
+    path = 'images/ramtest.bmp'
+    with open('images/test.bmp', 'rb') as f:
+        bmp = bytearray(f.read())
+    with open(path, 'wb') as f:
+        f.write(bmp)
+    lcd.setRamCache(120 * 160 * 2, maxsize=120 * 160 * 2)
+    try:
+        before = rendered(lcd, panel, 'ramtest.bmp')
+        assert 'ramtest.bmp' in lcd._ramcache
+        start = bmp[10] | bmp[11] << 8          # pixel data offset
+        bmp[start:] = bytes(b ^ 0xFF for b in bmp[start:])
+        with open(path, 'wb') as f:
+            f.write(bmp)
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime + 10))
+        after = rendered(lcd, panel, 'ramtest.bmp')
+        assert after != before
+        assert after == rendered(lcd, panel, 'ramtest.bmp', cached=False)
+    finally:
+        lcd.setRamCache(0)
+        os.remove(path)
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from lcd import *
+import lcd as driver
+import recorder
+import stats
+
+
+def remove_recording(name):
+    try:
+        os.remove(driver._cache_dir() + '/' + name + '.rec')
+    except OSError:
+        pass
+
+
+def draw(d):
+    d.fillMonocolor(BLUE)
+    d.drawRect(10, 20, 50, 30, RED, border=2, fillcolor=GREEN)
+
+
+def test_replay_matches_drawing(lcd, panel):
+    remove_recording('test')
+    lcd.fillMonocolor(BLACK)
+    assert not recorder.drawRecorded(lcd, 'test', draw)
+    reference = bytes(panel.mem)
+    lcd.fillMonocolor(BLACK)
+    assert recorder.drawRecorded(lcd, 'test', draw)
+    assert bytes(panel.mem) == reference
+    remove_recording('test')
+
+
+def test_failed_drawing_is_not_recorded(lcd):
+    remove_recording('test')
+    spi = lcd._dev.bus.spi
+    def broken(d):
+        d.fillMonocolor(RED)
+        raise ValueError
+    with pytest.raises(ValueError):
+        recorder.drawRecorded(lcd, 'test', broken)
+    assert lcd._dev.recording is None and lcd._dev.bus.spi is spi
+    assert not os.path.exists(driver._cache_dir() + '/test.rec.tmp')
+
+
+def test_stats_and_recording_stack(lcd):
+    remove_recording('test')
+    spi = lcd._dev.bus.spi
+    recorder.start(lcd, 'test')
+    stats.enable()
+    lcd.fillMonocolor(RED)
+    with pytest.raises(OSError):
+        recorder.stop(lcd)             # the counting proxy is on top
+    assert lcd._dev.recording is not None
+    assert stats.disable()['windows'] == 1
+    assert recorder.stop(lcd)
+    assert lcd._dev.bus.spi is spi
+
+    stats.enable()
+    recorder.start(lcd, 'test')
+    with pytest.raises(OSError):
+        stats.disable()
+    recorder.stop(lcd)
+    assert stats.disable() is not None
+    assert lcd._dev.bus.spi is spi
+    remove_recording('test')
@@ -0,0 +1,31 @@
+import asyncio
+
+import pyb
+from lcd import *
+from fonts.arial_14 import Arial_14
+from renderqueue import RenderQueue
+
+
+def test_carriage_does_not_block(lcd):
+    ch = lcd.initCh(font=Arial_14, color=RED, bgcolor=WHITE)
+    start = pyb.millis()
+    ch.printLn('Hello', 10, 10, bc=True)
+    assert pyb.elapsed_millis(start) < 100
+
+
+def test_records_and_room(lcd, panel):
+    rq = RenderQueue(lcd, size=2)
+    assert rq.fillMonocolor(BLUE) and rq.drawPixel(5, 5, RED)
+    assert rq.drawPixel is rq.drawPixel    # made once per name
+    assert rq._ring[0] == (lcd.fillMonocolor, (BLUE,), None)
+    assert not rq.drawPixel(6, 6, RED) and rq.dropped == 1
+
+    async def main():
+        task = asyncio.create_task(rq.run())
+        await rq.put(lcd.drawPixel, 7, 7, GREEN)    # waits for the task
+        while len(rq):
+            await asyncio.sleep(0)
+        task.cancel()
+    asyncio.run(main())
+    blue, red, green = (panel.pixel(x, x) for x in (100, 5, 7))
+    assert len({blue, red, green}) == 3
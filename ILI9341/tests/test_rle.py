@@ -0,0 +1,72 @@
+import io
+import random
+import struct
+
+import pytest
+
+import rle
+
+
+def words(*values):
+    return b''.join(struct.pack('>H', v) for v in values)
+
+
+def sample():
+    rnd = random.Random(1)
+    parts = [
+        words(1, 2, 3),                                 # literals
+        words(7) * (rle.MAXLEN + 10),                   # run split at MAXLEN
+        words(8) * (rle.FILLRUN - 1),                   # run sent as data
+        words(9) * rle.FILLRUN,                         # run sent to fill
+        words(10) * (rle.MINRUN - 1),                   # too short for a run
+        words(*(rnd.randrange(0x10000) for i in range(rle.LITERALS * 3 + 5))),
+        words(11) * rle.MINRUN,
+        words(0xFFFF),
+    ]
+    return b''.join(parts)
+
+
+def encode(pixels, step):
+    f = io.BytesIO()
+    enc = rle.Encoder(f)
+    for i in range(0, len(pixels), step):
+        enc.write(pixels[i:i+step])
+    enc.close()
+    assert enc.written == len(f.getvalue())
+    return f.getvalue()
+
+
+def packets(body):
+    i = 0
+    while i < len(body):
+        n = body[i] << 8 | body[i+1]
+        yield n
+        i += 4 if n & 0x8000 else 2 + (n & 0x7FFF) * 2
+
+
+def expand(body, chunk):
+    out, fills = [], []
+    def fill(word, n):
+        fills.append(n)
+        out.append(bytes(word) * n)
+    def data(buf):
+        assert 0 < len(buf) <= chunk
+        out.append(bytes(buf))
+    rle.expand(io.BytesIO(body), fill, data, chunk)
+    return b''.join(out), fills
+
+
+@pytest.mark.parametrize('step, chunk', ((2, 6), (64, 512), (1000, 510), (1 << 20, 4096)))
+def test_roundtrip(step, chunk):
+    pixels = sample()
+    body = encode(pixels, step)
+    assert all(0 < n & 0x7FFF <= rle.MAXLEN for n in packets(body))
+    assert body == encode(pixels, len(pixels))      # whatever the write sizes
+    out, fills = expand(body, chunk)
+    assert out == pixels
+    assert fills == [rle.MAXLEN, rle.FILLRUN]        # the 10 left are data
+
+
+def test_empty_and_short_input():
+    assert encode(b'', 2) == b''
+    assert expand(encode(words(5), 2), 8) == (words(5), [])
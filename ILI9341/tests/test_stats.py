@@ -0,0 +1,17 @@
+from lcd import *
+import lcd as driver
+import stats
+
+
+def test_stats_count_and_restore(lcd):
+    dev = lcd._dev
+    spi, cs, fill = dev.bus.spi, dev.cs, driver.BaseDraw.fillMonocolor
+    stats.enable()
+    lcd.fillMonocolor(RED)
+    counters = stats.disable()
+    calls, nbytes, us, pixels = counters['prims']['fillMonocolor']
+    assert calls == 1 and pixels >= 240 * 320
+    assert counters['cs'] and counters['windows'] == 1
+    assert dev.bus.spi is spi and dev.cs is cs
+    assert driver.BaseDraw.fillMonocolor is fill
+    assert stats.disable() is None
@@ -0,0 +1,73 @@
+import pytest
+from pyb import SPI
+
+from stmpe610 import Touch, FIFO_DEPTH
+
+
+@pytest.fixture
+def chip():
+    return SPI.devices(1)[1]
+
+
+def test_burst_reads_the_whole_fifo(lcd, chip, monkeypatch):
+    transfers = []
+    transfer = Touch._transfer
+    def counted(self, send, recv=None):
+        transfers.append(len(send))
+        transfer(self, send, recv)
+    monkeypatch.setattr(Touch, '_transfer', counted)
+    touch = Touch(lcd, irqPin=None)
+    del transfers[:]
+    chip.press(120, 160, samples=10)
+    touch.poll()
+    assert transfers.count(10 * 4 + 1) == 1     # one burst for the 10 samples
+    assert not chip.fifo and touch._count == 10
+    chip.press(120, 160, samples=FIFO_DEPTH + 5)   # FIFO overrun: 128 kept
+    touch.poll()
+    assert transfers.count(FIFO_DEPTH * 4 + 1) == 1
+    chip.release()
+
+
+def test_median_and_iir(lcd):
+    touch = Touch(lcd, irqPin=None, smoothing=0)
+    for rx in (1000, 1002, 3900, 1004):     # a spike among steady samples
+        touch._sample(rx, 2000)
+    assert touch._fx == 1004                # median of (1002, 3900, 1004)
+    touch = Touch(lcd, irqPin=None, smoothing=2)
+    touch._sample(1000, 2000)
+    touch._sample(1100, 2000)
+    assert touch._fx == 1000 + 100 // 4 and touch._fy == 2000
+
+
+def test_coordinates_follow_orientation(lcd, chip):
+    events = []
+    touch = Touch(lcd, callback=lambda x, y, e: events.append((x, y, e)))
+    chip.press(20, 300, samples=3)
+    x, y = touch.read()
+    assert abs(x - 20) <= 1 and abs(y - 300) <= 1
+    chip.release()
+    assert events[0][2] == 'down' and events[-1][2] == 'up'
+    assert touch.read() is None
+    lcd.setPortrait(False)
+    chip.press(20, 300, samples=3)
+    x, y = touch.read()
+    assert abs(x - 300) <= 1 and abs(y - (239 - 20)) <= 1
+    chip.release()
+    lcd.setPortrait(True)
+
+
+def test_deferred_while_display_holds_the_bus(lcd, chip):
+    events = []
+    touch = Touch(lcd, callback=lambda x, y, e: events.append(e))
+    dev = lcd._dev
+    dev.begin()
+    try:
+        chip.press(100, 100, samples=2)     # interrupt in a display transaction
+        assert not events and chip.fifo
+        assert touch._service_ref in dev.bus.waiting
+    finally:
+        dev.end()                           # the burst runs on release
+    assert events == ['down'] and not chip.fifo
+    assert dev.bus.owner is None
+    chip.release()
+    assert events == ['down', 'up']
@@ -0,0 +1,40 @@
+import math
+
+import trig
+
+
+def test_sine_table():
+    for degrees in range(-360, 721):
+        exact = math.sin(math.radians(degrees)) * trig.SCALE
+        assert abs(trig.isin(degrees) - exact) <= 0.5
+        assert trig.icos(degrees) == trig.isin(degrees + 90)
+    assert (trig.isin(90), trig.isin(270), trig.icos(180)) == (trig.SCALE, -trig.SCALE, -trig.SCALE)
+
+
+def test_arc_point():
+    # 0 degrees points up, angles grow clockwise
+    assert trig.arcPoint(100, 100, 50, 0) == (100, 50)
+    assert trig.arcPoint(100, 100, 50, 90) == (150, 100)
+    assert trig.arcPoint(100, 100, 50, 180) == (100, 150)
+    assert trig.arcPoint(100, 100, 50, 270) == (50, 100)
+    for degrees in range(0, 360, 7):
+        x, y = trig.arcPoint(120, 160, 100, degrees)
+        a = math.radians(degrees)
+        assert abs(x - (120 + 100 * math.sin(a))) < 1.01
+        assert abs(y - (160 - 100 * math.cos(a))) < 1.01
+
+
+def test_rotate_point():
+    assert trig.rotatePoint(100, 50, 100, 100, 90) == (150, 100)
+    assert trig.rotatePoint(100, 50, 100, 100, 360) == (100, 50)
+    for degrees in range(0, 360, 11):
+        # (130, 70) is at 45 degrees, sqrt(1800) from the center
+        x, y = trig.rotatePoint(130, 70, 100, 100, degrees)
+        a = math.radians(45 + degrees)
+        assert abs(x - (100 + math.sqrt(1800) * math.sin(a))) < 1.01
+        assert abs(y - (100 - math.sqrt(1800) * math.cos(a))) < 1.01
+
+
+def test_isqrt():
+    for n in list(range(2000)) + [2**29 - 1, 2**29, 160000 << 12, 10**12]:
+        assert trig.isqrt(n) == math.isqrt(n)
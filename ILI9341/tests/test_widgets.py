@@ -0,0 +1,35 @@
+from lcd import LCD
+from widgets import Widgets
+
+
+def test_dispatch_follows_orientation(lcd):
+    events = []
+    ui = lcd.widgets
+    low = ui.addWidget(10, 10, 50, 50, lambda w, x, y, e: events.append(('low', e)))
+    top = ui.addWidget(40, 40, 50, 50, lambda w, x, y, e: events.append(('top', e)))
+    assert ui.hitTest(45, 45) is top
+    ui.raiseWidget(low)
+    assert ui.hitTest(45, 45) is low
+    ui.dispatch(45, 45, 'down')
+    ui.dispatch(200, 200, 'move')       # captured by the widget pressed
+    ui.dispatch(200, 200, 'up')
+    assert events == [('low', 'down'), ('low', 'move'), ('low', 'up')]
+    assert ui.dispatch(200, 200, 'down') is None
+    # landscape: setPortrait drops the grid, rebuilt for 320 x 240
+    ui.moveWidget(top, 280, 200, 30, 30)
+    lcd.setPortrait(False)
+    assert ui._grid is None
+    ui.moveWidget(top, 280, 200)
+    assert ui.hitTest(300, 220) is top
+    ui.removeWidget(top)
+    assert ui.hitTest(300, 220) is None
+    lcd.setPortrait(True)
+
+
+def test_grid_follows_other_objects(lcd):
+    ui = Widgets(lcd)
+    button = ui.addWidget(250, 10, 40, 40, lambda w, x, y, e: None)
+    assert ui.hitTest(260, 20) is None      # off the portrait screen
+    LCD(portrait=False)                     # same panel, turned by another object
+    assert ui.hitTest(260, 20) is button
+    lcd.setPortrait(True)
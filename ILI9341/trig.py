@@ -0,0 +1,66 @@
+# trig.py - integer sine/cosine for angle based drawing
+#
+# Angles are whole degrees, results are scaled by SCALE (1.0 == 16384), so
+# no float is ever allocated. Screen convention, as in lcd.py: 0 degrees
+# points up and angles grow clockwise.
+#
+#    x = cx + (radius * isin(a) >> SHIFT)
+#    y = cy - (radius * icos(a) >> SHIFT)
+#    x, y = arcPoint(cx, cy, radius, a)      # the same
+#
+# isqrt() gives integer lengths (thick lines in lcd.py).
+
+from micropython import const
+
+SHIFT = const(14)
+SCALE = const(16384)
+
+# sin(0..90 degrees) * SCALE, rounded
+_QUARTER = (
+        0,   286,   572,   857,  1143,  1428,  1713,  1997,  2280,  2563,
+     2845,  3126,  3406,  3686,  3964,  4240,  4516,  4790,  5063,  5334,
+     5604,  5872,  6138,  6402,  6664,  6924,  7182,  7438,  7692,  7943,
+     8192,  8438,  8682,  8923,  9162,  9397,  9630,  9860, 10087, 10311,
+    10531, 10749, 10963, 11174, 11381, 11585, 11786, 11982, 12176, 12365,
+    12551, 12733, 12911, 13085, 13255, 13421, 13583, 13741, 13894, 14044,
+    14189, 14330, 14466, 14598, 14726, 14849, 14968, 15082, 15191, 15296,
+    15396, 15491, 15582, 15668, 15749, 15826, 15897, 15964, 16026, 16083,
+    16135, 16182, 16225, 16262, 16294, 16322, 16344, 16362, 16374, 16382,
+    16384,
+)
+
+def isin(degrees):
+    degrees %= 360
+    if degrees < 90:
+        return _QUARTER[degrees]
+    if degrees < 180:
+        return _QUARTER[180 - degrees]
+    if degrees < 270:
+        return -_QUARTER[degrees - 180]
+    return -_QUARTER[360 - degrees]
+
+def icos(degrees):
+    return isin(degrees + 90)
+
+def arcPoint(cx, cy, radius, degrees):
+    """ Point at radius from (cx, cy) in direction degrees (0 is up). """
+    return (cx + (radius * isin(degrees) >> SHIFT),
+            cy - (radius * icos(degrees) >> SHIFT))
+
+def rotatePoint(x, y, cx, cy, degrees):
+    """ Rotates (x, y) clockwise around (cx, cy), e.g. a gauge needle tip. """
+    s, c = isin(degrees), icos(degrees)
+    dx, dy = x - cx, y - cy
+    return (cx + ((dx * c - dy * s) >> SHIFT),
+            cy + ((dx * s + dy * c) >> SHIFT))
+
+def isqrt(n):
+    """ floor(sqrt(n)) of an integer n >= 0, with integers only. """
+    if n < 2:
+        return n
+    x = n
+    y = (x + 1) >> 1
+    while y < x:
+        x = y
+        y = (x + n // x) >> 1
+    return x
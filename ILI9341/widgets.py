@@ -0,0 +1,144 @@
+# widgets.py - touch targets and touch dispatch
+#
+# A widget is a screen rect (in the orientation the display has now) and the
+# function called with (widget, x, y, event) for the touch events inside it.
+# Widgets are indexed in a uniform grid of `cell` x `cell` pixels: every
+# cell lists the widgets overlapping it, so a hit test only looks at the few
+# widgets of one cell. Moves update the cells of one widget; the grid is
+# rebuilt after the display orientation changed (LCD.setPortrait drops the
+# grid of lcd.widgets, and a grid of the wrong width is rebuilt whoever
+# turned the panel).
+#
+#    from lcd import *
+#    from stmpe610 import Touch
+#
+#    lcd = LCD()
+#    ui = lcd.widgets                    # or Widgets(lcd, cell=16)
+#    def pressed(widget, x, y, event):  # event: 'down', 'move' or 'up'
+#        ...
+#    button = ui.addWidget(10, 10, 100, 40, pressed)
+#    touch = Touch(lcd, callback=ui.dispatch)
+#
+# The latest widget added (or raised) is on top of the others. Hit tests
+# and dispatch do not allocate.
+
+class Widget:
+    __slots__ = ('x', 'y', 'width', 'height', 'handler', 'z', 'cells')
+
+    def __init__(self, x, y, width, height, handler, z):
+        self.x, self.y = x, y
+        self.width, self.height = width, height
+        self.handler = handler
+        self.z = z              # stacking order: the highest one is on top
+        self.cells = None       # (col0, row0, col1, row1) indexed in the grid
+
+
+class Widgets:
+
+    def __init__(self, lcd, cell=32):
+        self.lcd = lcd
+        self.cell = cell
+        self._widgets = list()
+        self._grid = None
+        self._gridsize = None   # (width, height) the grid was built for
+        self._zorder = 0
+        self._pressed = None    # widget receiving the move and up events
+
+    def _build_index(self):
+        width, height = self.lcd.TFTWIDTH, self.lcd.TFTHEIGHT
+        cell = self.cell
+        self._gridcols = (width + cell - 1) // cell
+        self._grid = [list() for i in range(self._gridcols * ((height + cell - 1) // cell))]
+        self._gridsize = (width, height)
+        for widget in self._widgets:
+            widget.cells = None
+            self._index_add(widget)
+
+    # the grid follows the orientation of the display, whoever changed it
+    def _check_index(self):
+        if self._gridsize is None or self._gridsize[0] != self.lcd.TFTWIDTH:
+            self._build_index()
+
+    def invalidate(self):
+        """ Drops the grid, built again on the next use. """
+        self._grid = self._gridsize = None
+
+    def _index_add(self, widget):
+        cell = self.cell
+        x0, y0 = max(widget.x, 0), max(widget.y, 0)
+        x1 = min(widget.x + widget.width, self._gridsize[0]) - 1
+        y1 = min(widget.y + widget.height, self._gridsize[1]) - 1
+        if x1 < x0 or y1 < y0:
+            return                  # off screen
+        widget.cells = (x0 // cell, y0 // cell, x1 // cell, y1 // cell)
+        for row in range(y0 // cell, y1 // cell + 1):
+            start = row * self._gridcols
+            for col in range(x0 // cell, x1 // cell + 1):
+                self._grid[start + col].append(widget)
+
+    def _index_remove(self, widget):
+        if widget.cells is None:
+            return
+        col0, row0, col1, row1 = widget.cells
+        for row in range(row0, row1 + 1):
+            start = row * self._gridcols
+            for col in range(col0, col1 + 1):
+                self._grid[start + col].remove(widget)
+        widget.cells = None
+
+    def addWidget(self, x, y, width, height, handler):
+        """ Returns the new widget, on top of the others. """
+        self._check_index()
+        widget = Widget(x, y, width, height, handler, self._zorder)
+        self._zorder += 1
+        self._widgets.append(widget)
+        self._index_add(widget)
+        return widget
+
+    def moveWidget(self, widget, x, y, width=None, height=None):
+        self._check_index()
+        self._index_remove(widget)
+        widget.x, widget.y = x, y
+        if width is not None:
+            widget.width = width
+        if height is not None:
+            widget.height = height
+        self._index_add(widget)
+
+    def removeWidget(self, widget):
+        self._check_index()
+        self._index_remove(widget)
+        self._widgets.remove(widget)
+        if self._pressed is widget:
+            self._pressed = None
+
+    def raiseWidget(self, widget):
+        widget.z = self._zorder
+        self._zorder += 1
+
+    def hitTest(self, x, y):
+        """ Topmost widget at (x, y), None when there is none. """
+        self._check_index()
+        if x < 0 or y < 0 or x >= self._gridsize[0] or y >= self._gridsize[1]:
+            return None
+        cell = self.cell
+        found = None
+        for widget in self._grid[(y // cell) * self._gridcols + x // cell]:
+            if (widget.x <= x < widget.x + widget.width and
+                    widget.y <= y < widget.y + widget.height and
+                    (found is None or widget.z > found.z)):
+                found = widget
+        return found
+
+    # Signature of the touch callback (see stmpe610.py): the widget under a
+    # 'down' gets the following 'move' and 'up' events, even outside it.
+    def dispatch(self, x, y, event):
+        """ Calls the handler of the widget touched, returns the widget. """
+        if event == 'down':
+            self._pressed = self.hitTest(x, y)
+        widget = self._pressed
+        if event == 'up':
+            self._pressed = None
+        if widget is not None:
+            widget.handler(widget, x, y, event)
+        return widget